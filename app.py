@@ -2,8 +2,6 @@ import streamlit as st
 from streamlit import session_state as ss
 import utilities
 import pandas as pd
-import pint_pandas
-from timezonefinder import TimezoneFinder
 import unified
 import itertools
 import streamlit_current_location
@@ -16,9 +14,6 @@ for v in utilities.hourly_variables + utilities.daily_variables:
     if v not in ss:
         ss[v] = False
 
-# set up tzwhere
-tf = TimezoneFinder()
-
 # set plotly as graphing backend
 pd.options.plotting.backend = 'plotly'
 
@@ -37,7 +32,10 @@ tab1, tab2, tab3 = st.tabs(["Weather Overview", "Time-Series View", "Data Downlo
 units = st.sidebar.selectbox('Units Preference',
                      ('U.S. Customary', 'Metric'))
 
-ureg = utilities.ureg
+# opt-in render profiling (see utilities.RenderProfiler)
+profile_enabled = st.sidebar.toggle('Profile rendering', value=utilities.profile_default)
+profiler = utilities.RenderProfiler(profile_enabled, utilities.profile_dir)
+
 if units == 'Metric':
     preferred_units = {
         'temperature_2m': 'degC',
@@ -94,33 +92,38 @@ else:
         'diffuse_radiation': 'BTU/(hr*ft**2)'
     }
     temperature_string = "\N{DEGREE SIGN}F"
-pint_pandas.PintType.ureg = ureg
 
 # input location as address, zip code, etc.
-try:
-    # get user position
-    user_position = streamlit_current_location.current_position()
-    user_position = SimpleNamespace(latitude=user_position['latitude'], 
-                                    longitude=user_position['longitude'])
-    print(f'user current position is: {user_position}')
-    default_location = utilities.reverse_geocode(user_position, geocoder)
-except:
-    default_location = "275 Ferst Dr NW, Atlanta, GA 30313"
-location = st.sidebar.text_input('Location (Street Address, Zip Code, etc.):', 
-                         value=default_location, 
-                         autocomplete="street-address postal-code address-level2", 
-                         icon=':material/home:',
-                         label_visibility='hidden')
-
-# decode input location information
-coordinates = utilities.get_location(location, geocoder)
+with profiler.section('geocoding'):
+    try:
+        # get user position
+        user_position = streamlit_current_location.current_position()
+        user_position = SimpleNamespace(latitude=user_position['latitude'], 
+                                        longitude=user_position['longitude'])
+        print(f'user current position is: {user_position}')
+        default_location = utilities.reverse_geocode(user_position, geocoder)
+    except:
+        default_location = "275 Ferst Dr NW, Atlanta, GA 30313"
+    location = st.sidebar.text_input('Location (Street Address, Zip Code, etc.):', 
+                             value=default_location, 
+                             autocomplete="street-address postal-code address-level2", 
+                             icon=':material/home:',
+                             label_visibility='hidden')
+
+    # decode input location information
+    coordinates = utilities.get_location(location, geocoder)
+
+    # snap to a shared point so nearby users hit the same cached data
+    coordinates = utilities.snap_coordinates(coordinates)
 coordinates_df = pd.DataFrame([[coordinates.latitude, coordinates.longitude]], columns=['LAT', 'LON'])
 
 # get time zone from coordinates
-user_timezone = tf.timezone_at(lng=coordinates.longitude, lat=coordinates.latitude)
+with profiler.section('timezone lookup'):
+    user_timezone = utilities.get_timezone(coordinates.latitude, coordinates.longitude)
 
 # plot location on map
 st.sidebar.map(coordinates_df)
+st.sidebar.caption(f"Weather data for {coordinates.latitude:.4f}, {coordinates.longitude:.4f}")
 
 # determine useful times
 current_time_utc = pd.Timestamp.utcnow()
@@ -138,7 +141,15 @@ tomorrow_date_local = (current_time_local + day_delta).floor('d')
 past_limit_local = current_date_local - 7 * day_delta
 future_limit_local = current_date_local + 3 * day_delta
 
-with tab1:
+# plan every data need of this render together, so the page costs one request per endpoint
+location_string = f"{coordinates.latitude},{coordinates.longitude}"
+utilities.track_location(location_string)
+if utilities.prefetch_enabled:
+    utilities.start_prefetcher()
+with profiler.section('page data fetch'):
+    page_data = utilities.get_page_data(location_string, utilities.page_needs(current_time_utc))
+
+with tab1, profiler.section('Weather Overview'):
     # insert picker for date
     selected_date = pd.to_datetime(st.date_input("Select Date", 
                   value=current_date_local, 
@@ -147,18 +158,17 @@ with tab1:
                   format="MM/DD/YYYY")).tz_localize(user_timezone)
 
     # get sun data
-    sunrise_sunset_data = utilities.get_sunrise_sunset(f"{coordinates.latitude},{coordinates.longitude}",
-                                                utilities.to_timestamp(yesterday_date_utc),
-                                                utilities.to_timestamp(future_limit_utc))
+    with profiler.section('sun data'):
+        sunrise_sunset_data = utilities.sunrise_sunset_frame(page_data['sun'])
     
-    # get sunrise and sunset times for current local time
-    sunrise_data = sunrise_sunset_data['sunrise']
-    sunrise_time = sunrise_data[(sunrise_data >= selected_date) 
-                                & (sunrise_data < selected_date + day_delta)].dt.tz_convert(tz=user_timezone).iloc[0]
+        # get sunrise and sunset times for current local time
+        sunrise_data = sunrise_sunset_data['sunrise']
+        sunrise_time = sunrise_data[(sunrise_data >= selected_date) 
+                                    & (sunrise_data < selected_date + day_delta)].dt.tz_convert(tz=user_timezone).iloc[0]
 
-    sunset_data = sunrise_sunset_data['sunset']
-    sunset_time = sunset_data[(sunset_data >= selected_date) 
-                            & (sunset_data < selected_date + day_delta)].dt.tz_convert(tz=user_timezone).iloc[0]
+        sunset_data = sunrise_sunset_data['sunset']
+        sunset_time = sunset_data[(sunset_data >= selected_date) 
+                                & (sunset_data < selected_date + day_delta)].dt.tz_convert(tz=user_timezone).iloc[0]
 
     # Display sunrise and sunset information
     sunrise_col, sunset_col = st.columns(2)
@@ -172,223 +182,235 @@ with tab1:
         utilities.write_centered(utilities.to_12_hr_format(sunset_time), header='p')
 
     # get all weather data
-    hourly_weather_data, hourly_weather_units, daily_weather_data, daily_weather_units = utilities.get_all_weather_data(
-                                                f"{coordinates.latitude},{coordinates.longitude}",
-                                                utilities.to_timestamp(yesterday_date_utc),
-                                                utilities.to_timestamp(future_limit_utc))
+    hourly_weather_data, hourly_weather_units, daily_weather_data, daily_weather_units = utilities.all_weather_frames(
+                                                page_data['overview'])
 
     # get daily weather data
-    weather_data_daily = utilities.convert_weather_data(daily_weather_data, 
-                                                        daily_weather_units, 
-                                                        preferred_units,
-                                                        tz=user_timezone)
+    with profiler.section('convert_weather_data (daily)'):
+        weather_data_daily = utilities.convert_weather_data(daily_weather_data, 
+                                                            daily_weather_units, 
+                                                            preferred_units,
+                                                            tz=user_timezone)
 
     # separate weather data between today and tomorrow
     today_daily_weather = weather_data_daily[(weather_data_daily['date'] >= selected_date) 
                             & (weather_data_daily['date'] < selected_date + day_delta)].iloc[0]
 
     # display weather for today
-    utilities.write_centered('Overview', header='h1')
-    utilities.write_centered(
-        f"Forecast is {utilities.translate_weather_code(today_daily_weather['weather_code_daily'].magnitude)}",
-        header='h2')
+    with profiler.section('daily summary'):
+        utilities.write_centered('Overview', header='h1')
+        utilities.write_centered(
+            f"Forecast is {utilities.translate_weather_code(today_daily_weather['weather_code_daily'])}",
+            header='h2')
 
 
-    utilities.generate_daily_summary(today_daily_weather)
+        utilities.generate_daily_summary(today_daily_weather, weather_data_daily.attrs['units'])
 
     # get hourly weather data
-    weather_data = utilities.convert_weather_data(hourly_weather_data, 
-                                                hourly_weather_units, 
-                                                preferred_units,
-                                                tz=user_timezone)
-
-    for hour_offset in range(24):
-        this_hour = selected_date + one_hour_delta * hour_offset
-        next_hour = this_hour + one_hour_delta
-
-        this_hour_data = weather_data[(weather_data['timestamp_utc'] >= this_hour) & 
-                                    (weather_data['timestamp_utc'] < next_hour)]
-
-        # weird stuff is happening with this slice, so enforce a pandas series
-        if len(this_hour_data) > 1:
-            raise RuntimeError("Error in retrieving this hour's data")
-        else:
-            this_hour_data = this_hour_data.T.squeeze()
-
-        is_expanded = (this_hour == current_time_local.floor('h'))
-        with st.expander(utilities.to_12_hr_format(this_hour) + ' -- ' + utilities.generate_hour_short_summary(this_hour_data), expanded=is_expanded):
-            utilities.write_centered(
-                f"{utilities.translate_weather_code(this_hour_data['weather_code'].magnitude)}",
-                header='h2')
-
-            utilities.generate_current_summary(this_hour_data)
-
-            # generate air quality information
-            utilities.write_centered('Air Quality', header='h1')
-            st.plotly_chart(utilities.create_aqi_plot(this_hour_data['us_aqi'].magnitude, 'AQI'), key=f"AQI_{this_hour}")
-
-            air_quality_subindices = [
-                ["us_aqi_pm2_5", "PM 2.5"],
-                ["us_aqi_pm10", "PM 10"],
-                ["us_aqi_nitrogen_dioxide", "Nitrogen Dioxide"],
-                ["us_aqi_ozone", "Ozone"],
-                ["us_aqi_sulphur_dioxide", "Sulphur Dioxide"],
-                ["us_aqi_carbon_monoxide", "Carbon Monoxide"]
-            ]
-            aqi_row1 = st.columns(3)
-            aqi_row2 = st.columns(3)
-            for col, (var, natural_name) in zip((aqi_row1 + aqi_row2), air_quality_subindices):
-                tile = col.container(gap=None)
-                tile.plotly_chart(utilities.create_aqi_plot(this_hour_data[var].magnitude, natural_name), key=f"{var}_{this_hour}")
-
-            with st.expander('Detailed Air Quality Data'):
-                air_quality_info = pd.DataFrame([
-                    ["PM 2.5", f"{this_hour_data['pm2_5'].magnitude} {utilities.pretty_print_unit(this_hour_data['pm2_5'])}"],
-                    ["PM 10", f"{this_hour_data['pm10'].magnitude} {utilities.pretty_print_unit(this_hour_data['pm10'])}"],
-                    ["Nitrogen Dioxide", f"{this_hour_data['nitrogen_dioxide'].magnitude} {utilities.pretty_print_unit(this_hour_data['nitrogen_dioxide'])}"],
-                    ["Carbon Monoxide", f"{this_hour_data['carbon_monoxide'].magnitude} {utilities.pretty_print_unit(this_hour_data['carbon_monoxide'])}"],
-                    ["Ozone", f"{this_hour_data['ozone'].magnitude} {utilities.pretty_print_unit(this_hour_data['ozone'])}"],
-                    ["Sulphur Dioxide", f"{this_hour_data['sulphur_dioxide'].magnitude} {utilities.pretty_print_unit(this_hour_data['sulphur_dioxide'])}"],
-                    ["Carbon Dioxide", f"{this_hour_data['carbon_dioxide'].magnitude} {utilities.pretty_print_unit(this_hour_data['carbon_dioxide'])}"],
-                ])
-                st.dataframe(air_quality_info)
-
-with tab2:
+    with profiler.section('convert_weather_data (hourly)'):
+        weather_data = utilities.convert_weather_data(hourly_weather_data, 
+                                                    hourly_weather_units, 
+                                                    preferred_units,
+                                                    tz=user_timezone)
+
+    with profiler.section('hourly loop'):
+        for hour_offset in range(24):
+            this_hour = selected_date + one_hour_delta * hour_offset
+            next_hour = this_hour + one_hour_delta
+
+            this_hour_data = weather_data[(weather_data['timestamp_utc'] >= this_hour) & 
+                                        (weather_data['timestamp_utc'] < next_hour)]
+
+            # weird stuff is happening with this slice, so enforce a pandas series
+            if len(this_hour_data) > 1:
+                raise RuntimeError("Error in retrieving this hour's data")
+            else:
+                this_hour_data = this_hour_data.T.squeeze()
+
+            is_expanded = (this_hour == current_time_local.floor('h'))
+            with st.expander(utilities.to_12_hr_format(this_hour) + ' -- ' + utilities.generate_hour_short_summary(this_hour_data, weather_data.attrs['units']), expanded=is_expanded):
+                utilities.write_centered(
+                    f"{utilities.translate_weather_code(this_hour_data['weather_code'])}",
+                    header='h2')
+
+                utilities.generate_current_summary(this_hour_data, weather_data.attrs['units'])
+
+                # generate air quality information
+                utilities.write_centered('Air Quality', header='h1')
+                st.plotly_chart(utilities.create_aqi_plot(this_hour_data['us_aqi'], 'AQI'), key=f"AQI_{this_hour}")
+
+                air_quality_subindices = [
+                    ["us_aqi_pm2_5", "PM 2.5"],
+                    ["us_aqi_pm10", "PM 10"],
+                    ["us_aqi_nitrogen_dioxide", "Nitrogen Dioxide"],
+                    ["us_aqi_ozone", "Ozone"],
+                    ["us_aqi_sulphur_dioxide", "Sulphur Dioxide"],
+                    ["us_aqi_carbon_monoxide", "Carbon Monoxide"]
+                ]
+                aqi_row1 = st.columns(3)
+                aqi_row2 = st.columns(3)
+                for col, (var, natural_name) in zip((aqi_row1 + aqi_row2), air_quality_subindices):
+                    tile = col.container(gap=None)
+                    tile.plotly_chart(utilities.create_aqi_plot(this_hour_data[var], natural_name), key=f"{var}_{this_hour}")
+
+                with st.expander('Detailed Air Quality Data'):
+                    air_quality_info = pd.DataFrame([
+                        ["PM 2.5", f"{this_hour_data['pm2_5']} {utilities.pretty_print_unit(weather_data.attrs['units']['pm2_5'])}"],
+                        ["PM 10", f"{this_hour_data['pm10']} {utilities.pretty_print_unit(weather_data.attrs['units']['pm10'])}"],
+                        ["Nitrogen Dioxide", f"{this_hour_data['nitrogen_dioxide']} {utilities.pretty_print_unit(weather_data.attrs['units']['nitrogen_dioxide'])}"],
+                        ["Carbon Monoxide", f"{this_hour_data['carbon_monoxide']} {utilities.pretty_print_unit(weather_data.attrs['units']['carbon_monoxide'])}"],
+                        ["Ozone", f"{this_hour_data['ozone']} {utilities.pretty_print_unit(weather_data.attrs['units']['ozone'])}"],
+                        ["Sulphur Dioxide", f"{this_hour_data['sulphur_dioxide']} {utilities.pretty_print_unit(weather_data.attrs['units']['sulphur_dioxide'])}"],
+                        ["Carbon Dioxide", f"{this_hour_data['carbon_dioxide']} {utilities.pretty_print_unit(weather_data.attrs['units']['carbon_dioxide'])}"],
+                    ])
+                    st.dataframe(air_quality_info)
+
+with tab2, profiler.section('Time-Series View'):
 
     # get all weather data for plotting
-    hourly_weather_data, hourly_weather_units, _, _ = utilities.get_all_weather_data(
-                                                f"{coordinates.latitude},{coordinates.longitude}",
-                                                utilities.to_timestamp(past_limit_utc),
-                                                utilities.to_timestamp(future_limit_utc))
-    hourly_weather_data = utilities.convert_weather_data(hourly_weather_data, 
-                                                         hourly_weather_units,
-                                                         preferred_units,
-                                                         user_timezone)
+    hourly_weather_data, hourly_weather_units = utilities.weather_frame(page_data['time_series'],
+                                                                        utilities.hourly_variables,
+                                                                        'hourly')
+    with profiler.section('convert_weather_data (time series)'):
+        hourly_weather_data = utilities.convert_weather_data(hourly_weather_data, 
+                                                             hourly_weather_units,
+                                                             preferred_units,
+                                                             user_timezone)
     
     filtered_weather_data = hourly_weather_data[(hourly_weather_data['timestamp_utc'] >= past_limit_local) & 
                                                 (hourly_weather_data['timestamp_utc'] <= future_limit_local)]
     
     # create temperature plot
-    temperature_plot = utilities.create_forecast_plot(
-        hourly_data=filtered_weather_data,
-        weather_keys=['temperature_2m', 'apparent_temperature'],
-        weather_names=['Temperature', 'Apparent Temperature'],
-        unit_name=utilities.pretty_print_unit(ureg(preferred_units['temperature_2m'])),
-        title='Temperature',
-        current_time=current_time_local,
-        future_time_limit=future_limit_local
-    )
-    st.plotly_chart(temperature_plot)
+    with profiler.section('figure: Temperature'):
+        temperature_plot = utilities.create_forecast_plot(
+            hourly_data=filtered_weather_data,
+            weather_keys=['temperature_2m', 'apparent_temperature'],
+            weather_names=['Temperature', 'Apparent Temperature'],
+            unit_name=utilities.pretty_print_unit(preferred_units['temperature_2m']),
+            title='Temperature',
+            current_time=current_time_local,
+            future_time_limit=future_limit_local
+        )
+        st.plotly_chart(temperature_plot)
 
     # create rain plot
-    rain_plot = utilities.create_forecast_plot(
-        hourly_data=filtered_weather_data,
-        weather_keys=['precipitation'],
-        weather_names=['Precipitation'],
-        unit_name=utilities.pretty_print_unit(ureg(preferred_units['precipitation'])),
-        title='Precipitation',
-        current_time=current_time_local,
-        future_time_limit=future_limit_local
-    )
-    st.plotly_chart(rain_plot)
+    with profiler.section('figure: Precipitation'):
+        rain_plot = utilities.create_forecast_plot(
+            hourly_data=filtered_weather_data,
+            weather_keys=['precipitation'],
+            weather_names=['Precipitation'],
+            unit_name=utilities.pretty_print_unit(preferred_units['precipitation']),
+            title='Precipitation',
+            current_time=current_time_local,
+            future_time_limit=future_limit_local
+        )
+        st.plotly_chart(rain_plot)
 
     # create snow plot
-    snow_plot = utilities.create_forecast_plot(
-        hourly_data=filtered_weather_data,
-        weather_keys=['snowfall'],
-        weather_names=['Snowfall'],
-        unit_name=utilities.pretty_print_unit(ureg(preferred_units['snowfall'])),
-        title='Snowfall',
-        current_time=current_time_local,
-        future_time_limit=future_limit_local
-    )
-    st.plotly_chart(snow_plot)
+    with profiler.section('figure: Snowfall'):
+        snow_plot = utilities.create_forecast_plot(
+            hourly_data=filtered_weather_data,
+            weather_keys=['snowfall'],
+            weather_names=['Snowfall'],
+            unit_name=utilities.pretty_print_unit(preferred_units['snowfall']),
+            title='Snowfall',
+            current_time=current_time_local,
+            future_time_limit=future_limit_local
+        )
+        st.plotly_chart(snow_plot)
 
     # create humidity plot
-    humidity_plot = utilities.create_forecast_plot(
-        hourly_data=filtered_weather_data,
-        weather_keys=['relative_humidity_2m'],
-        weather_names=['Relative Humidity'],
-        unit_name='%',
-        title='Relative Humidity',
-        current_time=current_time_local,
-        future_time_limit=future_limit_local
-    )
-    st.plotly_chart(humidity_plot)
+    with profiler.section('figure: Relative Humidity'):
+        humidity_plot = utilities.create_forecast_plot(
+            hourly_data=filtered_weather_data,
+            weather_keys=['relative_humidity_2m'],
+            weather_names=['Relative Humidity'],
+            unit_name='%',
+            title='Relative Humidity',
+            current_time=current_time_local,
+            future_time_limit=future_limit_local
+        )
+        st.plotly_chart(humidity_plot)
 
     # create dew point plot
-    dewpoint_plot = utilities.create_forecast_plot(
-        hourly_data=filtered_weather_data,
-        weather_keys=['dew_point_2m'],
-        weather_names=['Dew Point'],
-        unit_name=utilities.pretty_print_unit(ureg(preferred_units['dew_point_2m'])),
-        title='Dew Point',
-        current_time=current_time_local,
-        future_time_limit=future_limit_local
-    )
-    st.plotly_chart(dewpoint_plot)
+    with profiler.section('figure: Dew Point'):
+        dewpoint_plot = utilities.create_forecast_plot(
+            hourly_data=filtered_weather_data,
+            weather_keys=['dew_point_2m'],
+            weather_names=['Dew Point'],
+            unit_name=utilities.pretty_print_unit(preferred_units['dew_point_2m']),
+            title='Dew Point',
+            current_time=current_time_local,
+            future_time_limit=future_limit_local
+        )
+        st.plotly_chart(dewpoint_plot)
 
     # create pressure plot
-    pressure_plot = utilities.create_forecast_plot(
-        hourly_data=filtered_weather_data,
-        weather_keys=['pressure_msl'],
-        weather_names=['Pressure'],
-        unit_name=utilities.pretty_print_unit(ureg(preferred_units['pressure_msl'])),
-        title='Pressure',
-        current_time=current_time_local,
-        future_time_limit=future_limit_local
-    )
-    st.plotly_chart(pressure_plot)
+    with profiler.section('figure: Pressure'):
+        pressure_plot = utilities.create_forecast_plot(
+            hourly_data=filtered_weather_data,
+            weather_keys=['pressure_msl'],
+            weather_names=['Pressure'],
+            unit_name=utilities.pretty_print_unit(preferred_units['pressure_msl']),
+            title='Pressure',
+            current_time=current_time_local,
+            future_time_limit=future_limit_local
+        )
+        st.plotly_chart(pressure_plot)
 
     # create windspeed plot
-    windspeed_plot = utilities.create_forecast_plot(
-        hourly_data=filtered_weather_data,
-        weather_keys=['wind_speed_10m', 'wind_gusts_10m'],
-        weather_names=['Wind Speed', 'Wind Gusts'],
-        unit_name=utilities.pretty_print_unit(ureg(preferred_units['wind_speed_10m'])),
-        title='Wind Speed',
-        current_time=current_time_local,
-        future_time_limit=future_limit_local
-    )
-    st.plotly_chart(windspeed_plot)
+    with profiler.section('figure: Wind Speed'):
+        windspeed_plot = utilities.create_forecast_plot(
+            hourly_data=filtered_weather_data,
+            weather_keys=['wind_speed_10m', 'wind_gusts_10m'],
+            weather_names=['Wind Speed', 'Wind Gusts'],
+            unit_name=utilities.pretty_print_unit(preferred_units['wind_speed_10m']),
+            title='Wind Speed',
+            current_time=current_time_local,
+            future_time_limit=future_limit_local
+        )
+        st.plotly_chart(windspeed_plot)
 
     # create uv plot
-    uv_plot = utilities.create_forecast_plot(
-        hourly_data=filtered_weather_data,
-        weather_keys=['direct_radiation', 'direct_normal_irradiance', 'diffuse_radiation'],
-        weather_names=['Direct Radiation', 'Direct Normal Irradiance', 'Diffuse Radiation'],
-        unit_name=utilities.pretty_print_unit(ureg(preferred_units['direct_radiation'])),
-        title='Solar Radiation',
-        current_time=current_time_local,
-        future_time_limit=future_limit_local
-    )
-    st.plotly_chart(uv_plot)
+    with profiler.section('figure: Solar Radiation'):
+        uv_plot = utilities.create_forecast_plot(
+            hourly_data=filtered_weather_data,
+            weather_keys=['direct_radiation', 'direct_normal_irradiance', 'diffuse_radiation'],
+            weather_names=['Direct Radiation', 'Direct Normal Irradiance', 'Diffuse Radiation'],
+            unit_name=utilities.pretty_print_unit(preferred_units['direct_radiation']),
+            title='Solar Radiation',
+            current_time=current_time_local,
+            future_time_limit=future_limit_local
+        )
+        st.plotly_chart(uv_plot)
 
     # create air quality plot
-    air_quality_plot = utilities.create_forecast_plot(
-        hourly_data=filtered_weather_data,
-        weather_keys=['pm2_5', 'pm10', 'nitrogen_dioxide', 'carbon_monoxide', 'ozone', 'sulphur_dioxide'],
-        weather_names=['PM 2.5', 'PM 10', 'Nitrogen Dioxide', 'Carbon Monoxide', 'Ozone', 'Sulphur Dioxide'],
-        unit_name=utilities.pretty_print_unit(filtered_weather_data['pm2_5'].pint),
-        title='Air Quality',
-        current_time=current_time_local,
-        future_time_limit=future_limit_local
-    )
-    st.plotly_chart(air_quality_plot)
+    with profiler.section('figure: Air Quality'):
+        air_quality_plot = utilities.create_forecast_plot(
+            hourly_data=filtered_weather_data,
+            weather_keys=['pm2_5', 'pm10', 'nitrogen_dioxide', 'carbon_monoxide', 'ozone', 'sulphur_dioxide'],
+            weather_names=['PM 2.5', 'PM 10', 'Nitrogen Dioxide', 'Carbon Monoxide', 'Ozone', 'Sulphur Dioxide'],
+            unit_name=utilities.pretty_print_unit(hourly_weather_data.attrs['units']['pm2_5']),
+            title='Air Quality',
+            current_time=current_time_local,
+            future_time_limit=future_limit_local
+        )
+        st.plotly_chart(air_quality_plot)
 
     # create carbon dioxide plot
-    co2_plot = utilities.create_forecast_plot(
-        hourly_data=filtered_weather_data,
-        weather_keys=['carbon_dioxide'],
-        weather_names=['Carbon Dioxide'],
-        unit_name=utilities.pretty_print_unit(filtered_weather_data['carbon_dioxide'].pint),
-        title='Carbon Dioxide',
-        current_time=current_time_local,
-        future_time_limit=future_limit_local
-    )
-    st.plotly_chart(co2_plot)
-
-with tab3:
+    with profiler.section('figure: Carbon Dioxide'):
+        co2_plot = utilities.create_forecast_plot(
+            hourly_data=filtered_weather_data,
+            weather_keys=['carbon_dioxide'],
+            weather_names=['Carbon Dioxide'],
+            unit_name=utilities.pretty_print_unit(hourly_weather_data.attrs['units']['carbon_dioxide']),
+            title='Carbon Dioxide',
+            current_time=current_time_local,
+            future_time_limit=future_limit_local
+        )
+        st.plotly_chart(co2_plot)
+
+with tab3, profiler.section('Data Downloader'):
     # define selector utilities
     col1, col2 = st.columns(2)
     if col1.button('Select All Hourly Variables'):
@@ -429,113 +451,121 @@ with tab3:
         submitted = st.form_submit_button("Fetch Data")
 
     if submitted:
-        # get variables
-        hourly_vars = []
-        for i, truth in enumerate(hourly_checkboxes):
-            if truth:
-                hourly_vars.append(utilities.hourly_variables[i])
-
-        daily_vars = []
-        for i, truth in enumerate(daily_checkboxes):
-            if truth:
-                daily_vars.append(utilities.daily_variables[i])
-
-        variables = ",".join(hourly_vars + daily_vars)
-        location_str = f"{coordinates.latitude},{coordinates.longitude}"
-        data = unified.fetch_unified(variables, 
-                                     location_str,
-                                     'both',
-                                     utilities.to_timestamp(begin_date),
-                                     utilities.to_timestamp(end_date))
-        hourly_data = data['data']['hourly']
-        daily_data = data['data']['daily']
-        units = data['units']
-
-        # convert units
-        for r in hourly_data:
-            for k in r.keys():
-                if r[k] == None:
-                    r[k] = np.nan
+        with profiler.section('downloader fetch and export'):
+            # get variables
+            hourly_vars = []
+            for i, truth in enumerate(hourly_checkboxes):
+                if truth:
+                    hourly_vars.append(utilities.hourly_variables[i])
+
+            daily_vars = []
+            for i, truth in enumerate(daily_checkboxes):
+                if truth:
+                    daily_vars.append(utilities.daily_variables[i])
+
+            variables = ",".join(hourly_vars + daily_vars)
+            location_str = f"{coordinates.latitude},{coordinates.longitude}"
+            data = unified.fetch_unified(variables, 
+                                         location_str,
+                                         'both',
+                                         utilities.to_timestamp(begin_date),
+                                         utilities.to_timestamp(end_date))
+            hourly_data = data['data']['hourly']
+            daily_data = data['data']['daily']
+            units = data['units']
+
+            # convert units with the same compiled plan as the page frames
+            plan_columns, plan_scales, plan_offsets, _ = utilities.conversion_plan(
+                {k: units[k].strip().replace(' ', '_') for k in units if k in preferred_units}, preferred_units)
+            conversions = dict(zip(plan_columns, zip(plan_scales, plan_offsets)))
+            for r in hourly_data:
+                for k in r.keys():
+                    if r[k] == None:
+                        r[k] = np.nan
+                    if k in conversions:
+                        scale, offset = conversions[k]
+                        r[k] = r[k] * scale + offset
+            for r in daily_data:
+                for k in r.keys():
+                    if r[k] == None:
+                        r[k] = np.nan
+                    if k in conversions:
+                        scale, offset = conversions[k]
+                        r[k] = r[k] * scale + offset
+            for k in units.keys():
                 if k in preferred_units:
-                    r[k] = ureg.Quantity(r[k], ureg(units[k])).to(preferred_units[k]).magnitude
-        for r in daily_data:
-            for k in r.keys():
-                if r[k] == None:
-                    r[k] = np.nan
-                if k in preferred_units:
-                    r[k] = ureg.Quantity(r[k], ureg(units[k])).to(preferred_units[k]).magnitude
-        for k in units.keys():
-            if k in preferred_units:
-                units[k] = preferred_units[k]
-            # convert to pint-style units
-            utmp = ureg(units[k].strip().replace(' ', '_'))
-            utmp = f"{utmp.units}"
-            units[k] = utmp
-
-        # create hourly and daily pandas files
-        try:
-            hourly_keys = list(hourly_data[0].keys())
-            hourly_units = {x: units['time'] if x=='timestamp_utc' else units[x] for x in hourly_keys}
-            header_units = [x + '_units' for x in hourly_keys]
-            header_row = list(itertools.chain(*zip(hourly_keys, header_units)))
-
-            hd_pd = []
-            for hd in hourly_data:
-                ld = []
-                for k in hourly_keys:
-                    ld.append(hd[k])
-                    ld.append(hourly_units[k])
-                hd_pd.append(ld)
-                hd_pd.append(ld)
-            hd_pd = pd.DataFrame(hd_pd, columns=header_row)
-            hd_pd = hd_pd.fillna(value=np.nan)
-        except IndexError:
-            hd_pd = pd.DataFrame()
-
-        try:
-            daily_keys = list(daily_data[0].keys())
-            daily_units = {x: units['time'] if x=='date' else units[x] for x in daily_keys}
-            header_units = [x + '_units' for x in daily_keys]
-            header_row = list(itertools.chain(*zip(daily_keys, header_units)))
-
-            dd_pd = []
-            for hd in daily_data:
-                ld = []
-                for k in daily_keys:
-                    ld.append(hd[k])
-                    ld.append(daily_units[k])
-                dd_pd.append(ld)
-            dd_pd = pd.DataFrame(dd_pd, columns=header_row)
-        except IndexError:
-            dd_pd = pd.DataFrame()
+                    units[k] = preferred_units[k]
+                # convert to pint-style units
+                utmp = utilities.get_ureg()(units[k].strip().replace(' ', '_'))
+                utmp = f"{utmp.units}"
+                units[k] = utmp
+
+            # create hourly and daily pandas files
+            try:
+                hourly_keys = list(hourly_data[0].keys())
+                hourly_units = {x: units['time'] if x=='timestamp_utc' else units[x] for x in hourly_keys}
+                header_units = [x + '_units' for x in hourly_keys]
+                header_row = list(itertools.chain(*zip(hourly_keys, header_units)))
+
+                hd_pd = []
+                for hd in hourly_data:
+                    ld = []
+                    for k in hourly_keys:
+                        ld.append(hd[k])
+                        ld.append(hourly_units[k])
+                    hd_pd.append(ld)
+                    hd_pd.append(ld)
+                hd_pd = pd.DataFrame(hd_pd, columns=header_row)
+                hd_pd = hd_pd.fillna(value=np.nan)
+            except IndexError:
+                hd_pd = pd.DataFrame()
+
+            try:
+                daily_keys = list(daily_data[0].keys())
+                daily_units = {x: units['time'] if x=='date' else units[x] for x in daily_keys}
+                header_units = [x + '_units' for x in daily_keys]
+                header_row = list(itertools.chain(*zip(daily_keys, header_units)))
+
+                dd_pd = []
+                for hd in daily_data:
+                    ld = []
+                    for k in daily_keys:
+                        ld.append(hd[k])
+                        ld.append(daily_units[k])
+                    dd_pd.append(ld)
+                dd_pd = pd.DataFrame(dd_pd, columns=header_row)
+            except IndexError:
+                dd_pd = pd.DataFrame()
         
-        if format_radio == 'JSON':
-            # generate houly data file
-            st.download_button('Download Data', 
-                               data=json.dumps(data), 
-                               file_name='weather_data_download.json', 
-                               on_click='ignore')
+            if format_radio == 'JSON':
+                # generate houly data file
+                st.download_button('Download Data', 
+                                   data=json.dumps(data), 
+                                   file_name='weather_data_download.json', 
+                                   on_click='ignore')
         
-        elif format_radio == 'CSV':
-            # generate houly data file
-            st.download_button('Download Hourly Data', 
-                               data=hd_pd.to_csv().encode('utf-8'), 
-                               file_name='hourly_weather_data_download.csv', 
-                               on_click='ignore')
-            # generate daily data file
-            st.download_button('Download Daily Data', 
-                               data=dd_pd.to_csv().encode('utf-8'), 
-                               file_name='daily_weather_data_download.csv', 
-                               on_click='ignore')
-        elif format_radio == 'Parquet':
-            # generate houly data file
-            st.download_button('Download Hourly Data', 
-                               data=hd_pd.to_parquet(), 
-                               file_name='hourly_weather_data_download.parquet', 
-                               on_click='ignore')
-            # generate daily data file
-            st.download_button('Download Daily Data', 
-                               data=dd_pd.to_parquet(), 
-                               file_name='daily_weather_data_download.parquet', 
-                               on_click='ignore')
-
+            elif format_radio == 'CSV':
+                # generate houly data file
+                st.download_button('Download Hourly Data', 
+                                   data=hd_pd.to_csv().encode('utf-8'), 
+                                   file_name='hourly_weather_data_download.csv', 
+                                   on_click='ignore')
+                # generate daily data file
+                st.download_button('Download Daily Data', 
+                                   data=dd_pd.to_csv().encode('utf-8'), 
+                                   file_name='daily_weather_data_download.csv', 
+                                   on_click='ignore')
+            elif format_radio == 'Parquet':
+                # generate houly data file
+                st.download_button('Download Hourly Data', 
+                                   data=hd_pd.to_parquet(), 
+                                   file_name='hourly_weather_data_download.parquet', 
+                                   on_click='ignore')
+                # generate daily data file
+                st.download_button('Download Daily Data', 
+                                   data=dd_pd.to_parquet(), 
+                                   file_name='daily_weather_data_download.parquet', 
+                                   on_click='ignore')
+
+# show the timing waterfall (and write cProfile stats) when profiling is on
+profiler.render(st.sidebar)
@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta, UTC
+from typing import Dict, List, Optional, Tuple
+
+import h3
+import numpy as np
+import platformdirs
+
+import unified
+
+
+# ------------------------------------------------------------
+# Memory-mapped history store: one fixed-stride array per location and variable
+# Layout: <root>/<kind>/cell=<h3 cell>/<lat>_<lon>/<variable>.bin (+ <variable>.json)
+# Slot i of a .bin file is hour (hourly) or day (daily) base + i counted from
+# ORIGIN; values are float32 (NaN gaps), iso8601 variables datetime64[s] (NaT gaps).
+# The .json sidecar holds base, dtype, unit, the decimals values were written with
+# and the inclusive day ranges stored, so a window read is a memmap slice and new
+# hours are a tail write.
+# ------------------------------------------------------------
+
+
+# Start of the Open-Meteo archive (ERA5); slot indexes count from here
+ORIGIN = np.datetime64("1940-01-01T00:00", "s")
+STEPS = {"hourly": np.timedelta64(1, "h"), "daily": np.timedelta64(1, "D")}
+CELL_RESOLUTION = unified.H3_RESOLUTION
+# Most decimals looked for when recording how values were rounded upstream
+MAX_DECIMALS = 4
+
+
+def default_array_dir() -> str:
+    return os.environ.get("WEATHERAPP_ARRAY_DIR") or os.path.join(platformdirs.user_data_dir("weatherapp"), "arrays")
+
+
+def _day(text: str) -> datetime:
+    return datetime.strptime(text, "%Y-%m-%d").replace(tzinfo=UTC)
+
+
+def _dtype(spec: unified.VariableSpec) -> np.dtype:
+    return np.dtype("datetime64[s]") if spec.default_unit == "iso8601" else np.dtype(np.float32)
+
+
+def _fill(dtype: np.dtype):
+    return np.datetime64("NaT") if dtype.kind == "M" else np.nan
+
+
+def _slot(times: np.ndarray, kind: str) -> np.ndarray:
+    return ((times - ORIGIN) // STEPS[kind]).astype(np.int64)
+
+
+def _bounds(start: datetime, end: datetime) -> Tuple[np.datetime64, np.datetime64]:
+    # [first instant of start's day, first instant after end's day)
+    lo = start.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    return np.datetime64(lo, "s"), np.datetime64(lo + timedelta(days=(end.date() - start.date()).days + 1), "s")
+
+
+def _decimals(values: np.ndarray) -> Optional[int]:
+    # Fewest decimals that reproduce every value, or None if more than MAX_DECIMALS are needed
+    finite = values[np.isfinite(values)]
+    for d in range(MAX_DECIMALS + 1):
+        if np.array_equal(np.round(finite, d), finite):
+            return d
+    return None
+
+
+def _add_range(ranges: List[List[str]], lo: str, hi: str) -> List[List[str]]:
+    # Insert [lo, hi] and fold ranges that overlap or touch
+    out: List[List[str]] = []
+    for a, b in sorted(ranges + [[lo, hi]]):
+        if out and _day(a) <= _day(out[-1][1]) + timedelta(days=1):
+            out[-1][1] = max(out[-1][1], b)
+        else:
+            out.append([a, b])
+    return out
+
+
+class HistoryArrayStore:
+    def __init__(self, root: Optional[str] = None, cell_resolution: int = CELL_RESOLUTION):
+        self.root = root or default_array_dir()
+        self.cell_resolution = cell_resolution
+        self._lock = threading.Lock()
+
+    def _paths(self, lat: float, lon: float, spec: unified.VariableSpec) -> Tuple[str, str]:
+        cell = h3.latlng_to_cell(lat, lon, self.cell_resolution)
+        base = os.path.join(self.root, spec.param_kind, f"cell={cell}", f"{lat}_{lon}", spec.api_var_name)
+        return f"{base}.bin", f"{base}.json"
+
+    def _meta(self, path: str) -> Optional[Dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, path: str, meta: Dict):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    def _open(self, lat: float, lon: float, spec: unified.VariableSpec) -> Tuple[Optional[Dict], Optional[np.ndarray]]:
+        # (sidecar, read-only memmap), read together so a concurrent rebase is never seen half done
+        data_path, meta_path = self._paths(lat, lon, spec)
+        with self._lock:
+            meta = self._meta(meta_path)
+            if meta is None or not os.path.getsize(data_path):
+                return meta, None
+            return meta, np.memmap(data_path, dtype=np.dtype(meta["dtype"]), mode="r")
+
+    def coverage(self, lat: float, lon: float, spec: unified.VariableSpec,
+                 start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        # Inclusive day ranges stored for one variable that overlap [start, end]
+        meta = self._meta(self._paths(lat, lon, spec)[1])
+        if meta is None:
+            return []
+        ranges = [(_day(a), _day(b)) for a, b in meta["ranges"]]
+        return [(a, b) for a, b in ranges if b >= start.replace(hour=0, minute=0, second=0, microsecond=0)
+                and a <= end]
+
+    def window(self, lat: float, lon: float, spec: unified.VariableSpec,
+               start: datetime, end: datetime) -> Tuple[np.ndarray, np.ndarray]:
+        # (times, values) for the stored slots within [start, end] days; values is a
+        # zero-copy view of the memmap in the stored dtype, NaN/NaT where nothing was written
+        kind = spec.param_kind
+        lo, hi = _bounds(start, end)
+        meta, arr = self._open(lat, lon, spec)
+        if arr is None:
+            return np.array([], dtype="datetime64[s]"), np.array([], dtype=_dtype(spec))
+        base = meta["base"]
+        first = max(int(_slot(lo, kind)), base) - base
+        stop = min(int(_slot(hi, kind)), base + len(arr)) - base
+        if stop <= first:
+            return np.array([], dtype="datetime64[s]"), arr[:0]
+        times = ORIGIN + (np.arange(first, stop) + base) * STEPS[kind]
+        return times, arr[first:stop]
+
+    def read(self, lat: float, lon: float, specs: List[unified.VariableSpec],
+             start: datetime, end: datetime) -> List[Dict]:
+        # One part per kind in the shape of a decoded API response, rows for every slot in [start, end]
+        parts = []
+        for kind in unified.TIME_COLUMNS:
+            kind_specs = [s for s in specs if s.param_kind == kind]
+            if not kind_specs:
+                continue
+            lo, hi = _bounds(start, end)
+            times = np.arange(lo, hi, STEPS[kind]).astype("datetime64[s]")
+            block: Dict = {"time": times}
+            units: Dict[str, str] = {"time": "iso8601"}
+            for s in kind_specs:
+                meta, arr = self._open(lat, lon, s)
+                if meta is None:
+                    continue
+                out = np.full(len(times), _fill(np.dtype(meta["dtype"])), dtype=np.dtype(meta["dtype"]))
+                if arr is not None:
+                    idx = _slot(times, kind) - meta["base"]
+                    ok = (idx >= 0) & (idx < len(arr))
+                    out[ok] = arr[idx[ok]]
+                if s.default_unit == "iso8601":
+                    text = np.datetime_as_string(out, unit="m").astype(object)
+                    text[np.isnat(out)] = None
+                    block[s.api_var_name] = text
+                else:
+                    values = out.astype(np.float64)
+                    # float32 storage: round back to the decimals the values arrived with
+                    block[s.api_var_name] = values if meta["decimals"] is None else np.round(values, meta["decimals"])
+                units[s.api_var_name] = meta["unit"]
+            if len(units) > 1:
+                parts.append({kind: block, f"{kind}_units": units})
+        return parts
+
+    def write(self, lat: float, lon: float, specs: List[unified.VariableSpec],
+              start: datetime, end: datetime, payload: Dict):
+        # Store one fetched archive segment (a decoded response covering [start, end])
+        for s in specs:
+            block = payload.get(s.param_kind)
+            if not block or s.api_var_name not in block:
+                continue
+            times = np.asarray(block["time"], dtype="datetime64[s]")
+            if not len(times):
+                continue
+            dtype = _dtype(s)
+            if dtype.kind == "M":
+                values = np.asarray([v if v is not None else "NaT" for v in block[s.api_var_name]], dtype=dtype)
+                decimals = None
+            else:
+                values = np.asarray(block[s.api_var_name], dtype=np.float64)
+                decimals = _decimals(values)
+            unit = (payload.get(f"{s.param_kind}_units") or {}).get(s.api_var_name, s.default_unit)
+            with self._lock:
+                self._append(lat, lon, s, _slot(times, s.param_kind), values.astype(dtype), dtype,
+                             decimals, unit, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+
+    def _append(self, lat: float, lon: float, spec: unified.VariableSpec, idx: np.ndarray,
+                values: np.ndarray, dtype: np.dtype, decimals: Optional[int], unit: str, lo: str, hi: str):
+        data_path, meta_path = self._paths(lat, lon, spec)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        meta = self._meta(meta_path)
+        if meta is None:
+            meta = {"base": int(idx.min()), "dtype": dtype.str, "unit": unit, "decimals": decimals, "ranges": []}
+            open(data_path, "wb").close()
+        elif meta["decimals"] is not None:
+            meta["decimals"] = None if decimals is None else max(meta["decimals"], decimals)
+
+        if idx.min() < meta["base"]:
+            # Older history than anything stored: rewrite with the new base in front
+            pad = np.full(meta["base"] - int(idx.min()), _fill(dtype), dtype=dtype)
+            tmp = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as out, open(data_path, "rb") as old:
+                out.write(pad.tobytes())
+                out.write(old.read())
+            os.replace(tmp, data_path)
+            meta["base"] = int(idx.min())
+
+        slots = idx - meta["base"]
+        contiguous = bool((np.diff(slots) == 1).all())
+        length = os.path.getsize(data_path) // dtype.itemsize
+        with open(data_path, "r+b") as f:
+            if int(slots.max()) >= length:
+                # Grow with gaps, so the slots written below all exist
+                f.seek(length * dtype.itemsize)
+                f.write(np.full(int(slots.max()) + 1 - length, _fill(dtype), dtype=dtype).tobytes())
+            if contiguous:
+                # The usual case: one positioned write, a tail append for new hours
+                f.seek(int(slots[0]) * dtype.itemsize)
+                f.write(values.tobytes())
+        if not contiguous:
+            arr = np.memmap(data_path, dtype=dtype, mode="r+")
+            arr[slots] = values
+            arr.flush()
+            del arr
+
+        # Sidecar last, so coverage never claims slots that were not written
+        meta["unit"] = unit
+        meta["ranges"] = _add_range(meta["ranges"], lo, hi)
+        self._write_meta(meta_path, meta)
@@ -0,0 +1,253 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, UTC
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+import segment_cache
+import unified
+from benchmarks.stub_server import StubAsyncTransport, StubOpenMeteo, StubTransport
+
+
+# ------------------------------------------------------------
+# Offline benchmarks for unified.fetch_* against the local stub server
+# Usage: python -m benchmarks.run [--iterations N] [--latency S] [--out results.json]
+#        [--compare previous.json]
+# Each scenario is timed over N runs; peak memory comes from one extra run under
+# tracemalloc so tracing does not skew the latencies.
+# ------------------------------------------------------------
+
+
+HOURLY = ["temperature_2m", "relative_humidity_2m", "precipitation", "wind_speed_10m", "cloud_cover",
+          "pm2_5", "pm10", "ozone", "us_aqi", "direct_radiation"]
+DAILY = ["temperature_2m_max", "temperature_2m_min", "precipitation_sum", "sunrise", "sunset"]
+BATCH_LOCATIONS = 500
+ASYNC_FETCHES = 1000
+
+
+def _day(offset: int) -> str:
+    return (datetime.now(UTC) + timedelta(days=offset)).strftime("%Y-%m-%d")
+
+
+def _rows(result: Dict) -> int:
+    data = result.get("data") or {}
+    total = 0
+    for kind in unified.TIME_COLUMNS:
+        block = data.get(kind)
+        if isinstance(block, list):
+            total += len(block)
+        elif isinstance(block, dict) and block:
+            total += len(next(iter(block.values())))
+    return total
+
+
+def page_load() -> int:
+    # The Weather Overview + Time-Series needs of one app render
+    needs = [
+        unified.DataNeed("sunrise,sunset", _day(-1), _day(5)),
+        unified.DataNeed(",".join(HOURLY + DAILY), _day(-1), _day(5)),
+        unified.DataNeed(",".join(HOURLY), _day(-8), _day(5)),
+    ]
+    results = unified.fetch_planned("33.7756,-84.3963", needs, output="columns")
+    return sum(_rows(r) for r in results)
+
+
+def history_10y() -> int:
+    end = datetime.now(UTC) - timedelta(days=30)
+    start = end.replace(year=end.year - 10)
+    result = unified.fetch_unified(",".join(HOURLY), "33.7756,-84.3963", "history",
+                                   start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), output="columns")
+    return _rows(result)
+
+
+def batch_500() -> int:
+    rng = np.random.default_rng(0)
+    locations = [f"{lat:.4f},{lon:.4f}" for lat, lon in
+                 zip(rng.uniform(25, 49, BATCH_LOCATIONS), rng.uniform(-124, -67, BATCH_LOCATIONS))]
+    results = unified.fetch_unified_many("temperature_2m,precipitation,pm2_5", locations, "history",
+                                         _day(-37), _day(-8), output="columns")
+    return sum(_rows(r) for r in results)
+
+
+def async_1000() -> int:
+    # Single-location fetches for many points at once on one event loop
+    rng = np.random.default_rng(1)
+    locations = [f"{lat:.4f},{lon:.4f}" for lat, lon in
+                 zip(rng.uniform(25, 49, ASYNC_FETCHES), rng.uniform(-124, -67, ASYNC_FETCHES))]
+
+    async def run() -> List[Dict]:
+        return await asyncio.gather(*(
+            unified.fetch_unified_async("temperature_2m,precipitation", location, "history",
+                                        _day(-37), _day(-8), output="columns")
+            for location in locations))
+
+    return sum(_rows(r) for r in asyncio.run(run()))
+
+
+SCENARIOS: Dict[str, Callable[[], int]] = {
+    "page_load": page_load,
+    "history_10y": history_10y,
+    "batch_500": batch_500,
+    "async_1000": async_1000,
+}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def _isolate(cache_mode: str, workdir: str):
+    # "off": every run goes to the stub; "warm": runs share a fresh cache and lake
+    if cache_mode == "off":
+        unified.CACHE_ENABLED = False
+        unified.set_segment_cache(None)
+        unified.LAKE_ENABLED = False
+        unified.set_history_store(None)
+    else:
+        import lake
+
+        unified.set_segment_cache(segment_cache.SegmentCache(os.path.join(workdir, "segments.sqlite")))
+        unified.set_history_store(lake.HistoryLake(os.path.join(workdir, "lake")))
+
+
+def run_scenario(name: str, stub: StubOpenMeteo, iterations: int, cache_mode: str) -> Dict:
+    scenario = SCENARIOS[name]
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+        _isolate(cache_mode, workdir)
+        stub.reset_counters()
+        latencies, rows, failed = [], 0, 0
+        started = time.perf_counter()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            try:
+                rows += scenario()
+            except Exception as exc:
+                # retries exhausted under error injection; count it and keep going
+                failed += 1
+                print(f"{name} run failed: {exc}", file=sys.stderr)
+                continue
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - started
+        counters = stub.counters()
+
+        tracemalloc.start()
+        try:
+            scenario()
+        except Exception:
+            pass  # a failed run still reports the memory it reached
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        unified.set_segment_cache(None)
+        unified.set_history_store(None)
+
+    ms = [t * 1000 for t in latencies] or [0.0]
+    done = max(1, iterations - failed)
+    return {
+        "iterations": iterations,
+        "failed_runs": failed,
+        "latency_ms": {
+            "p50": round(_percentile(ms, 50), 2),
+            "p95": round(_percentile(ms, 95), 2),
+            "p99": round(_percentile(ms, 99), 2),
+            "mean": round(float(np.mean(ms)), 2),
+            "max": round(max(ms), 2),
+        },
+        "throughput": {
+            "runs_per_s": round(iterations / elapsed, 3),
+            "rows_per_s": round(rows / elapsed, 1),
+            "requests_per_s": round(counters["requests"] / elapsed, 2),
+        },
+        "rows_per_run": rows // done,
+        "upstream_requests_per_run": counters["requests"] / iterations,
+        "upstream_errors": counters["errors"],
+        "bytes_per_run": counters["bytes"] // iterations,
+        "peak_memory_mb": round(peak / 2 ** 20, 2),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, previous: Dict) -> List[str]:
+    lines = []
+    for name, now in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for metric in ("p50", "p95"):
+            old, new = before["latency_ms"][metric], now["latency_ms"][metric]
+            change = (new - old) / old * 100 if old else 0.0
+            lines.append(f"{name} {metric}: {old:.1f} -> {new:.1f} ms ({change:+.1f}%)")
+        old, new = before["peak_memory_mb"], now["peak_memory_mb"]
+        lines.append(f"{name} peak memory: {old:.1f} -> {new:.1f} MB")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Benchmark unified.fetch_* against a local Open-Meteo stub")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default all)")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed runs per scenario")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub latency per response, seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Extra uniform random stub latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub responses that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="Status code for injected failures")
+    parser.add_argument("--cache", choices=("off", "warm"), default="off",
+                        help="off: every run is cold; warm: runs share a fresh cache and lake")
+    parser.add_argument("--out", type=str, default=None, help="Write results JSON here")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier results JSON to compare against")
+
+    args = parser.parse_args(argv)
+
+    names = args.scenario or list(SCENARIOS)
+    with StubOpenMeteo(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       error_status=args.error_status) as stub:
+        previous = unified.set_transport(StubTransport(stub.base_url, backoff_base=0.01, backoff_max=0.1))
+        previous_async = unified.set_async_transport(
+            StubAsyncTransport(stub.base_url, backoff_base=0.01, backoff_max=0.1))
+        try:
+            scenarios = {}
+            for name in names:
+                print(f"running {name} x{args.iterations}", file=sys.stderr)
+                scenarios[name] = run_scenario(name, stub, args.iterations, args.cache)
+        finally:
+            unified.set_transport(previous).close()
+            unified.set_async_transport(previous_async).close()
+
+    results = {
+        "generated_at": datetime.now(UTC).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "scenarios": scenarios,
+    }
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            for line in compare(results, json.load(f)):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
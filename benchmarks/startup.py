@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, UTC
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.run import _git_commit
+
+
+# ------------------------------------------------------------
+# Startup benchmarks: cold imports and CLI start in fresh interpreters
+# Usage: python -m benchmarks.startup [--runs N] [--out results.json] [--compare previous.json]
+# Every run is a new process started outside the repo (PYTHONPATH points at it), so
+# nothing may depend on the working directory. Wall time covers the whole process;
+# inner time is what the snippet measured around its own work. The slowest imports
+# come from one extra run under -X importtime.
+# ------------------------------------------------------------
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = "startup-elapsed="
+SLOWEST = 10
+
+TARGETS: Dict[str, str] = {
+    "import_unified": "import unified",
+    "import_utilities": "import utilities",
+    # pint cache dir is fresh for the first run of a pass only; see run_target
+    "unit_registry": "import utilities\nutilities.get_ureg()",
+    "unified_cli_help": "import sys\nimport unified\nsys.argv = ['unified.py', '--help']\n"
+                        "try:\n    unified.main()\nexcept SystemExit:\n    pass",
+}
+
+
+def _snippet(code: str) -> str:
+    body = "\n".join("    " + line for line in code.splitlines())
+    return (f"import sys, time\nt0 = time.perf_counter()\nif True:\n{body}\n"
+            f"sys.stderr.write('\\n{MARKER}%.6f\\n' % (time.perf_counter() - t0))\n")
+
+
+def _run(code: str, env: Dict[str, str], cwd: str, importtime: bool = False) -> Tuple[float, float, str]:
+    # (process wall seconds, inner seconds, stderr)
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", _snippet(code)]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if proc.returncode:
+        raise RuntimeError(f"startup snippet failed:\n{proc.stderr[-2000:]}")
+    inner = [line for line in proc.stderr.splitlines() if line.startswith(MARKER)]
+    return wall, float(inner[-1][len(MARKER):]), proc.stderr
+
+
+def _slowest(stderr: str, n: int = SLOWEST) -> List[Dict]:
+    # Modules imported directly by a top-level import, by cumulative time (-X importtime;
+    # nesting is two spaces per level)
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and len(name) - len(name.lstrip()) == 3:
+            rows.append((int(cumulative), name.strip()))
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in sorted(rows, reverse=True)[:n]]
+
+
+def _summary(seconds: List[float]) -> Dict[str, float]:
+    ms = [s * 1000 for s in seconds]
+    return {"p50": round(float(np.percentile(ms, 50)), 1), "min": round(min(ms), 1), "max": round(max(ms), 1)}
+
+
+def run_target(name: str, runs: int) -> Dict:
+    code = TARGETS[name]
+    with tempfile.TemporaryDirectory(prefix=f"startup-{name}-") as workdir:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")]))
+        # fresh caches: the first run starts cold, later runs find what it wrote
+        env["WEATHERAPP_CACHE_DIR"] = os.path.join(workdir, "cache")
+        env.pop("WEATHERAPP_PREFETCH", None)
+        first_wall, first_inner, _ = _run(code, env, workdir)
+        walls, inners = [], []
+        for _ in range(runs):
+            wall, inner, _ = _run(code, env, workdir)
+            walls.append(wall)
+            inners.append(inner)
+        _, _, stderr = _run(code, env, workdir, importtime=True)
+    return {
+        "runs": runs,
+        "cold_ms": {"wall": round(first_wall * 1000, 1), "inner": round(first_inner * 1000, 1)},
+        "wall_ms": _summary(walls),
+        "inner_ms": _summary(inners),
+        "slowest_imports": _slowest(stderr),
+    }
+
+
+def compare(current: Dict, previous: Dict) -> List[str]:
+    lines = []
+    for name, now in current["targets"].items():
+        before = previous.get("targets", {}).get(name)
+        if not before:
+            continue
+        for metric in ("wall_ms", "inner_ms"):
+            old, new = before[metric]["p50"], now[metric]["p50"]
+            change = (new - old) / old * 100 if old else 0.0
+            lines.append(f"{name} {metric} p50: {old:.1f} -> {new:.1f} ms ({change:+.1f}%)")
+    return lines
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup",
+                                     description="Benchmark cold imports and CLI startup in fresh interpreters")
+    parser.add_argument("--target", action="append", choices=sorted(TARGETS),
+                        help="Target to run (repeatable, default all)")
+    parser.add_argument("--runs", type=int, default=10, help="Warm runs per target, after one cold run")
+    parser.add_argument("--out", type=str, default=None, help="Write results JSON here")
+    parser.add_argument("--compare", type=str, default=None, help="Earlier results JSON to compare against")
+
+    args = parser.parse_args(argv)
+
+    targets = {}
+    for name in args.target or list(TARGETS):
+        print(f"running {name} x{args.runs}", file=sys.stderr)
+        targets[name] = run_target(name, args.runs)
+
+    results = {
+        "generated_at": datetime.now(UTC).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"runs": args.runs},
+        "targets": targets,
+    }
+    text = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            for line in compare(results, json.load(f)):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
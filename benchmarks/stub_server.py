@@ -0,0 +1,261 @@
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import unified
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# ------------------------------------------------------------
+# Local stand-in for the Open-Meteo forecast, archive and air-quality APIs
+# Serves synthetic responses shaped and sized like the real ones (one decimal
+# values, occasional nulls, multi-coordinate lists, gzip) with configurable
+# latency and injected throttle/server errors. Counts requests and bytes sent.
+# ------------------------------------------------------------
+
+
+PATHS = {urlsplit(url).path for url in (unified.OPEN_METEO_WEATHER_FORECAST,
+                                        unified.OPEN_METEO_WEATHER_ARCHIVE,
+                                        unified.OPEN_METEO_AIR_QUALITY)}
+UNITS = {s.api_var_name: s.default_unit for s in unified.VARIABLES.values()}
+# Share of values served as null, like gaps in real archive series
+NULL_FRACTION = 0.01
+
+
+def _seed(*parts) -> int:
+    return int.from_bytes(hashlib.sha1("|".join(map(str, parts)).encode("utf-8")).digest()[:4], "little")
+
+
+def _series(name: str, lat: str, lon: str, start: np.datetime64, n: int) -> np.ndarray:
+    # Smooth daily cycle plus a random walk, stable for the same location/variable/start
+    rng = np.random.default_rng(_seed(name, lat, lon, start))
+    base = 10 + 10 * np.sin(np.arange(n) * (2 * np.pi / 24)) + np.cumsum(rng.normal(0, 0.3, n))
+    values = np.round(base, 1)
+    values[rng.random(n) < NULL_FRACTION] = np.nan
+    return values
+
+
+def _block(kind: str, names: List[str], lat: str, lon: str, start: str, end: str) -> Tuple[Dict, Dict]:
+    unit = "h" if kind == "hourly" else "D"
+    lo = np.datetime64(start, unit)
+    hi = np.datetime64(end, "D") + np.timedelta64(1, "D")
+    times = np.arange(lo, hi.astype(f"datetime64[{unit}]"), dtype=f"datetime64[{unit}]")
+    block: Dict = {"time": np.datetime_as_string(times, unit="m" if kind == "hourly" else "D").tolist()}
+    units = {"time": "iso8601"}
+    for name in names:
+        if UNITS.get(name) == "iso8601":
+            offset = np.timedelta64(_seed(name) % 720 + 300, "m")
+            block[name] = np.datetime_as_string(times.astype("datetime64[m]") + offset, unit="m").tolist()
+        else:
+            block[name] = _series(name, lat, lon, lo, len(times))
+        units[name] = UNITS.get(name, "undefined")
+    return block, units
+
+
+def _location(params: Dict[str, List[str]], lat: str, lon: str) -> Dict:
+    payload: Dict = {"latitude": float(lat), "longitude": float(lon), "generationtime_ms": 0.5,
+                     "utc_offset_seconds": 0, "timezone": "UTC", "timezone_abbreviation": "UTC"}
+    start, end = params["start_date"][0], params["end_date"][0]
+    for kind in ("hourly", "daily"):
+        names = [n for value in params.get(kind, []) for n in value.split(",") if n]
+        if names:
+            payload[kind], payload[f"{kind}_units"] = _block(kind, names, lat, lon, start, end)
+    return payload
+
+
+def _dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    def plain(value):
+        if isinstance(value, np.ndarray):
+            out = value.astype(object)
+            out[np.isnan(value)] = None
+            return out.tolist()
+        if isinstance(value, dict):
+            return {k: plain(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [plain(v) for v in value]
+        return value
+
+    return json.dumps(plain(payload), separators=(",", ":")).encode("utf-8")
+
+
+@lru_cache(maxsize=512)
+def render(query: str) -> Tuple[bytes, bytes]:
+    # (plain, gzip) body for one query string; cached so repeated runs measure the client
+    params = parse_qs(query)
+    lats, lons = params["latitude"][0].split(","), params["longitude"][0].split(",")
+    payloads = [_location(params, lat, lon) for lat, lon in zip(lats, lons)]
+    body = _dumps(payloads[0] if len(payloads) == 1 else payloads)
+    return body, gzip.compress(body, compresslevel=1)
+
+
+class StubOpenMeteo:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, error_rate: float = 0.0, error_status: int = 503,
+                 seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = self.errors = self.bytes_sent = 0
+
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "bytes": self.bytes_sent}
+
+    def _draw(self) -> Tuple[float, bool]:
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate > 0 and self._random.random() < self.error_rate
+            self.requests += 1
+            self.errors += int(fail)
+            return delay, fail
+
+    def _sent(self, n: int):
+        with self._lock:
+            self.bytes_sent += n
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes, headers: Dict[str, str]):
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                stub._sent(len(body))
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                delay, fail = stub._draw()
+                if delay:
+                    time.sleep(delay)
+                if url.path not in PATHS:
+                    self._reply(404, b'{"error":true,"reason":"Not Found"}', {"Content-Type": "application/json"})
+                    return
+                if fail:
+                    headers = {"Content-Type": "application/json"}
+                    if stub.error_status in unified.THROTTLE_STATUS:
+                        headers["Retry-After"] = "0"
+                    self._reply(stub.error_status, b'{"error":true,"reason":"injected"}', headers)
+                    return
+                try:
+                    plain, packed = render(url.query)
+                except (KeyError, ValueError) as exc:
+                    self._reply(400, json.dumps({"error": True, "reason": str(exc)}).encode("utf-8"),
+                                {"Content-Type": "application/json"})
+                    return
+                headers = {"Content-Type": "application/json"}
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    headers["Content-Encoding"] = "gzip"
+                    self._reply(200, packed, headers)
+                else:
+                    self._reply(200, plain, headers)
+
+        return Handler
+
+    def start(self) -> "StubOpenMeteo":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-open-meteo", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubOpenMeteo":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class StubTransport(unified.HTTPTransport):
+    # HTTPTransport that sends every Open-Meteo request to the stub instead
+    def __init__(self, base_url: str, **kwargs):
+        kwargs.setdefault("limits", None)
+        super().__init__(**kwargs)
+        self.base_url = base_url.rstrip("/")
+
+    def fetch(self, url: str, params: Dict) -> bytes:
+        return super().fetch(self.base_url + urlsplit(url).path, params)
+
+
+class StubAsyncTransport(unified.AsyncHTTPTransport):
+    # AsyncHTTPTransport counterpart of StubTransport
+    def __init__(self, base_url: str, **kwargs):
+        kwargs.setdefault("limits", None)
+        super().__init__(**kwargs)
+        self.base_url = base_url.rstrip("/")
+
+    async def fetch(self, url: str, params: Dict) -> bytes:
+        return await super().fetch(self.base_url + urlsplit(url).path, params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve synthetic Open-Meteo responses locally")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra uniform random latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="Status code for injected failures")
+
+    args = parser.parse_args()
+
+    stub = StubOpenMeteo(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                         error_rate=args.error_rate, error_status=args.error_status)
+    print(f"Serving at {stub.base_url} ({datetime.now():%H:%M:%S}); Ctrl+C to stop")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
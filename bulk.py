@@ -0,0 +1,158 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import unified
+
+
+# ------------------------------------------------------------
+# Bulk job runner: many locations x variables x ranges -> partitioned Parquet
+# Job file: CSV (header row) or JSON list with location, variables, mode, start, end
+# Output:   <out>/kind=<hourly|daily>/location=<lat>_<lon>/year=<YYYY>/<job_id>.parquet
+# A job is finished once <out>/_done/<job_id>.json exists; reruns skip it.
+# ------------------------------------------------------------
+
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_SEGMENT_WORKERS = 2
+
+
+@dataclass(frozen=True)
+class Job:
+    location: str
+    variables: str
+    mode: str
+    start: str
+    end: str
+
+    @property
+    def job_id(self) -> str:
+        blob = json.dumps(asdict(self), sort_keys=True)
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def location_key(self) -> str:
+        lat, lon = unified._parse_location(self.location)
+        return f"{lat}_{lon}"
+
+
+def _job_from_record(record: dict) -> Job:
+    variables = record["variables"]
+    if isinstance(variables, (list, tuple)):
+        variables = ",".join(variables)
+    return Job(
+        location=str(record["location"]).strip(),
+        variables=str(variables).replace(" ", ""),
+        mode=str(record.get("mode") or "history").strip(),
+        start=str(record["start"]).strip(),
+        end=str(record["end"]).strip(),
+    )
+
+
+def load_jobs(path: str) -> List[Job]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".json"):
+            records = json.load(f)
+        else:
+            records = list(csv.DictReader(f))
+    # Same job listed twice would write the same partitions twice
+    return list(dict.fromkeys(_job_from_record(r) for r in records))
+
+
+def _done_path(out_dir: str, job: Job) -> str:
+    return os.path.join(out_dir, "_done", f"{job.job_id}.json")
+
+
+def is_done(out_dir: str, job: Job) -> bool:
+    return os.path.exists(_done_path(out_dir, job))
+
+
+def _write_atomic(table: pa.Table, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def _write_partitions(out_dir: str, job: Job, kind: str, table: pa.Table) -> int:
+    if table.num_rows == 0:
+        return 0
+    time_name = unified.TIME_COLUMNS[kind]
+    years = pc.year(table[time_name])
+    written = 0
+    for year in pc.unique(years).to_pylist():
+        part = table.filter(pc.equal(years, year))
+        path = os.path.join(out_dir, f"kind={kind}", f"location={job.location_key}",
+                            f"year={year}", f"{job.job_id}.parquet")
+        _write_atomic(part, path)
+        written += part.num_rows
+    return written
+
+
+def run_job(out_dir: str, job: Job, segment_workers: Optional[int] = DEFAULT_SEGMENT_WORKERS) -> dict:
+    res = unified.fetch_unified(job.variables, job.location, job.mode, job.start, job.end,
+                                max_workers=segment_workers, output="arrow")
+    if "error" in res:
+        raise RuntimeError(res["error"])
+    rows = {kind: _write_partitions(out_dir, job, kind, res["data"][kind]) for kind in unified.TIME_COLUMNS}
+    summary = {"job": asdict(job), "job_id": job.job_id, "rows": rows, "units": res["units"]}
+    # Marker last: a crash before this point leaves the job to be redone (files are overwritten)
+    marker = _done_path(out_dir, job)
+    os.makedirs(os.path.dirname(marker), exist_ok=True)
+    with open(f"{marker}.tmp", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(f"{marker}.tmp", marker)
+    return summary
+
+
+def run_jobs(out_dir: str, jobs: List[Job], concurrency: int = DEFAULT_CONCURRENCY,
+             segment_workers: Optional[int] = DEFAULT_SEGMENT_WORKERS) -> int:
+    todo = [job for job in jobs if not is_done(out_dir, job)]
+    print(f"{len(jobs) - len(todo)} of {len(jobs)} jobs already done, running {len(todo)}", file=sys.stderr)
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(run_job, out_dir, job, segment_workers): job for job in todo}
+        for fut in as_completed(futures):
+            job = futures[fut]
+            try:
+                summary = fut.result()
+                print(f"done {job.job_id} {job.location} {job.start}..{job.end} rows={summary['rows']}",
+                      file=sys.stderr)
+            except Exception as exc:
+                failed += 1
+                print(f"FAILED {job.job_id} {job.location} {job.start}..{job.end}: {exc}", file=sys.stderr)
+    return failed
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        prog="unified.py bulk",
+        description="Run a job file of locations x variables x ranges into partitioned Parquet",
+    )
+    parser.add_argument("jobs", type=str, help="CSV or JSON job file (location, variables, mode, start, end)")
+    parser.add_argument("--out-dir", type=str, required=True, help="Root directory for Parquet partitions")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Jobs run at once")
+    parser.add_argument("--segment-workers", type=int, default=DEFAULT_SEGMENT_WORKERS,
+                        help="Concurrent segment requests within each job")
+
+    args = parser.parse_args(argv)
+
+    jobs = load_jobs(args.jobs)
+    failed = run_jobs(args.out_dir, jobs, concurrency=args.concurrency, segment_workers=args.segment_workers)
+    if failed:
+        print(f"{failed} job(s) failed; rerun to retry them", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
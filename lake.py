@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta, UTC
+from typing import Dict, List, Optional, Tuple
+
+import h3
+import numpy as np
+import platformdirs
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import unified
+
+
+# ------------------------------------------------------------
+# Local Parquet lake of settled archive data
+# Layout: <root>/group=<category>_<kind>/cell=<h3 cell>/year=<YYYY>/<lat>_<lon>_<start>_<end>_<vars>.parquet
+# Every file holds one location's time, latitude, longitude and variable columns;
+# its footer records the location, the covered date range and the units, so
+# coverage is answered from footers and reads touch only matching partitions.
+# ------------------------------------------------------------
+
+
+# Coarse cells (~250 km^2) keep partitions few; exact points are a column filter
+CELL_RESOLUTION = 5
+META_PREFIX = b"lake."
+
+
+def default_lake_dir() -> str:
+    return os.environ.get("WEATHERAPP_LAKE_DIR") or os.path.join(platformdirs.user_data_dir("weatherapp"), "lake")
+
+
+def _group(spec: unified.VariableSpec) -> str:
+    return f"{spec.category}_{spec.param_kind}"
+
+
+def _day(text: str) -> datetime:
+    return datetime.strptime(text, "%Y-%m-%d").replace(tzinfo=UTC)
+
+
+def _column(spec: unified.VariableSpec, values) -> pa.Array:
+    if spec.default_unit == "iso8601":
+        arr = np.asarray([v if v is not None else "NaT" for v in values], dtype="datetime64[s]")
+        return pa.array(arr).cast(pa.timestamp("s", tz="UTC"))
+    return pa.array(np.asarray(values, dtype=np.float64), from_pandas=True)
+
+
+def _field(spec: unified.VariableSpec) -> pa.Field:
+    if spec.default_unit == "iso8601":
+        return pa.field(spec.api_var_name, pa.timestamp("s", tz="UTC"))
+    return pa.field(spec.api_var_name, pa.float64())
+
+
+def _block_values(spec: unified.VariableSpec, column: pa.ChunkedArray):
+    # Back to the API's shapes: floats with NaN gaps, iso8601 strings with None gaps
+    if spec.default_unit == "iso8601":
+        arr = column.cast(pa.timestamp("s")).to_numpy(zero_copy_only=False)
+        text = np.datetime_as_string(arr, unit="m").astype(object)
+        text[np.isnat(arr)] = None
+        return text
+    return column.to_numpy(zero_copy_only=False).astype(np.float64, copy=False)
+
+
+class HistoryLake:
+    def __init__(self, root: Optional[str] = None, cell_resolution: int = CELL_RESOLUTION):
+        self.root = root or default_lake_dir()
+        self.cell_resolution = cell_resolution
+        self._lock = threading.Lock()
+        # path -> (mtime, footer info); footers are re-read only when a file changes
+        self._footers: Dict[str, Tuple[float, Dict]] = {}
+
+    def _cell(self, lat: float, lon: float) -> str:
+        return h3.latlng_to_cell(lat, lon, self.cell_resolution)
+
+    def _partition(self, group: str, cell: str, year: int) -> str:
+        return os.path.join(self.root, f"group={group}", f"cell={cell}", f"year={year}")
+
+    def _footer(self, path: str) -> Optional[Dict]:
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            hit = self._footers.get(path)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+        schema = pq.read_schema(path)
+        meta = {k[len(META_PREFIX):].decode(): v.decode() for k, v in (schema.metadata or {}).items()
+                if k.startswith(META_PREFIX)}
+        info = {
+            "latitude": float(meta["latitude"]),
+            "longitude": float(meta["longitude"]),
+            "start": _day(meta["start"]),
+            "end": _day(meta["end"]),
+            "units": json.loads(meta["units"]),
+            "columns": set(schema.names),
+        }
+        with self._lock:
+            self._footers[path] = (mtime, info)
+        return info
+
+    def _files(self, lat: float, lon: float, group: str,
+               start: datetime, end: datetime) -> List[Tuple[str, Dict]]:
+        # Files for this exact point overlapping [start, end], from the partitions that can hold them
+        cell = self._cell(lat, lon)
+        found = []
+        for year in range(start.year, end.year + 1):
+            part = self._partition(group, cell, year)
+            try:
+                names = sorted(os.listdir(part))
+            except FileNotFoundError:
+                continue
+            for name in names:
+                if not name.endswith(".parquet"):
+                    continue
+                path = os.path.join(part, name)
+                info = self._footer(path)
+                if (info is None or info["latitude"] != lat or info["longitude"] != lon
+                        or info["end"] < start or info["start"] > end):
+                    continue
+                found.append((path, info))
+        return found
+
+    def coverage(self, lat: float, lon: float, spec: unified.VariableSpec,
+                 start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        # Inclusive day ranges of [start, end] already stored for one variable
+        return [(info["start"], info["end"])
+                for _, info in self._files(lat, lon, _group(spec), start, end)
+                if spec.api_var_name in info["columns"]]
+
+    def read(self, lat: float, lon: float, specs: List[unified.VariableSpec],
+             start: datetime, end: datetime) -> List[Dict]:
+        # One part per variable group, in the shape of a decoded API response
+        groups: Dict[str, List[unified.VariableSpec]] = {}
+        for s in specs:
+            groups.setdefault(_group(s), []).append(s)
+
+        parts = []
+        for group, group_specs in groups.items():
+            files = self._files(lat, lon, group, start, end)
+            if not files:
+                continue
+            kind = group_specs[0].param_kind
+            columns = ["time"] + [s.api_var_name for s in group_specs]
+            lo = pa.scalar(start.replace(tzinfo=None), pa.timestamp("s", tz="UTC"))
+            hi = pa.scalar((end + timedelta(days=1)).replace(tzinfo=None), pa.timestamp("s", tz="UTC"))
+            # _files matched the exact point already, so each file is read directly (a dataset scan
+            # costs ~1 ms of setup per call) and cut to the window; absent columns become nulls
+            tables = []
+            for path, info in files:
+                with pq.ParquetFile(path) as f:
+                    table = f.read(columns=[c for c in columns if c in info["columns"]])
+                tables.append(table.filter(pc.and_(pc.greater_equal(table["time"], lo), pc.less(table["time"], hi))))
+            table = pa.concat_tables(tables, promote_options="default")
+            names = {s.api_var_name for s in group_specs}
+            units = {"time": "iso8601"}
+            for _, info in files:
+                units |= {n: u for n, u in info["units"].items() if n in names}
+            block = {"time": table["time"].cast(pa.timestamp("s")).to_numpy()}
+            for s in group_specs:
+                column = (table[s.api_var_name] if s.api_var_name in table.column_names
+                          else pa.chunked_array([pa.nulls(table.num_rows, _field(s).type)]))
+                block[s.api_var_name] = _block_values(s, column)
+            parts.append({kind: block, f"{kind}_units": units})
+        return parts
+
+    def write(self, lat: float, lon: float, specs: List[unified.VariableSpec],
+              start: datetime, end: datetime, payload: Dict):
+        # Store one fetched archive segment (a decoded response covering [start, end]), split by year
+        groups: Dict[str, List[unified.VariableSpec]] = {}
+        for s in specs:
+            groups.setdefault(_group(s), []).append(s)
+
+        cell = self._cell(lat, lon)
+        for group, group_specs in groups.items():
+            kind = group_specs[0].param_kind
+            block = payload.get(kind)
+            if not block:
+                continue
+            names = [s.api_var_name for s in group_specs if s.api_var_name in block]
+            if not names:
+                continue
+            times = np.asarray(block["time"], dtype="datetime64[s]")
+            units = {n: u for n, u in (payload.get(f"{kind}_units") or {}).items() if n in names}
+            digest = hashlib.sha1(",".join(sorted(names)).encode("utf-8")).hexdigest()[:10]
+            years = times.astype("datetime64[Y]").astype(int) + 1970
+            for year in range(start.year, end.year + 1):
+                rows = years == year
+                lo = max(start, datetime(year, 1, 1, tzinfo=UTC))
+                hi = min(end, datetime(year, 12, 31, tzinfo=UTC))
+                arrays = {
+                    "time": pa.array(times[rows]).cast(pa.timestamp("s", tz="UTC")),
+                    "latitude": pa.array(np.full(rows.sum(), lat)),
+                    "longitude": pa.array(np.full(rows.sum(), lon)),
+                }
+                for s in group_specs:
+                    if s.api_var_name in names:
+                        arrays[s.api_var_name] = _column(s, np.asarray(block[s.api_var_name], dtype=object)[rows])
+                table = pa.table(arrays).replace_schema_metadata({
+                    META_PREFIX + b"latitude": repr(lat).encode(),
+                    META_PREFIX + b"longitude": repr(lon).encode(),
+                    META_PREFIX + b"start": lo.strftime("%Y-%m-%d").encode(),
+                    META_PREFIX + b"end": hi.strftime("%Y-%m-%d").encode(),
+                    META_PREFIX + b"units": json.dumps(units).encode(),
+                })
+                part = self._partition(group, cell, year)
+                os.makedirs(part, exist_ok=True)
+                path = os.path.join(part, f"{lat}_{lon}_{lo:%Y%m%d}_{hi:%Y%m%d}_{digest}.parquet")
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                pq.write_table(table, tmp)
+                os.replace(tmp, path)
+
+    def query(self, variables: str, location: str, start_date: str, end_date: str) -> Dict:
+        # Stored history only, no network: units, data as a pyarrow.Table per kind,
+        # and per variable the inclusive date ranges the lake does not hold yet
+        var, spec = unified._resolve_spec(variables)
+        lat, lon = unified._parse_location(location)
+        s, e = unified._parse_dates(start_date, end_date)
+        parts = self.read(lat, lon, spec, s, e)
+        merged = unified._merge_results(spec, parts, window=(s, e + timedelta(days=1)))
+        if not merged:
+            merged = {"sources": {}} | {kind: {} for kind in unified.TIME_COLUMNS}
+        units = {}
+        for kind in unified.TIME_COLUMNS:
+            if merged[kind]:
+                units |= merged.get(f"{kind}_units", {})
+        missing = {v.api_var_name: [(a.strftime("%Y-%m-%d"), b.strftime("%Y-%m-%d")) for a, b in
+                                    unified._subtract_intervals(s, e, self.coverage(lat, lon, v, s, e))]
+                   for v in spec}
+        return {
+            "units": units,
+            "data": unified._to_columns(merged, spec, arrow=True),
+            "missing": missing,
+        }
+
+
+def query_history(variables: str, location: str, start_date: str, end_date: str,
+                  root: Optional[str] = None) -> Dict:
+    # Uses the lake fetch_unified writes to unless another root is given
+    store = HistoryLake(root) if root is not None else unified.get_history_store()
+    if not isinstance(store, HistoryLake):
+        store = HistoryLake()
+    return store.query(variables, location, start_date, end_date)
@@ -0,0 +1,167 @@
+import json
+import threading
+from collections import deque
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import unified
+
+
+# ------------------------------------------------------------
+# Fetch metrics built from unified's segment and merge traces
+# install() subscribes a FetchMetrics to unified.add_trace_listener; dump it with
+# to_prometheus() (text exposition format) or to_json() (same numbers plus the
+# most recent traces, for finding the slow endpoint / year chunk / cache layer).
+# ------------------------------------------------------------
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PHASES = ("wait", "connect", "tls", "ttfb", "transfer", "decode", "total")
+RECENT_TRACES = 200
+PREFIX = "weatherapp"
+
+
+def _endpoint(url: str) -> str:
+    return urlsplit(url).netloc or url
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Upper bucket bound holding the q-th observation (Prometheus-style estimate)
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, n in zip(BUCKETS, self.counts):
+            if n >= rank:
+                return bound
+        return float("inf")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs: Tuple[Tuple[str, str], ...]) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class FetchMetrics:
+    def __init__(self, recent: int = RECENT_TRACES):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], _Histogram] = {}
+        self._recent = deque(maxlen=recent)
+
+    def _inc(self, name: str, labels: Tuple, value: float = 1.0):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def _observe(self, name: str, labels: Tuple, value: float):
+        key = (name, labels)
+        hist = self._histograms.get(key)
+        if hist is None:
+            hist = self._histograms[key] = _Histogram()
+        hist.observe(value)
+
+    def record(self, event: Union[unified.SegmentTrace, unified.MergeTrace]):
+        with self._lock:
+            if isinstance(event, unified.MergeTrace):
+                self._inc("merges_total", ())
+                self._inc("merge_rows_total", (), event.rows)
+                self._observe("merge_seconds", (), event.seconds)
+                return
+            endpoint = (("endpoint", _endpoint(event.url)),)
+            outcome = "error" if event.error else "ok"
+            self._inc("segment_requests_total", endpoint + (("cache", event.cache), ("outcome", outcome)))
+            self._inc("segment_bytes_total", endpoint, event.bytes)
+            self._inc("segment_rows_total", endpoint, event.rows)
+            self._inc("segment_retries_total", endpoint, max(0, event.attempts - 1))
+            for phase in PHASES:
+                value = getattr(event, f"{phase}_s")
+                # Network phases only exist when the request went upstream
+                if phase in ("wait", "connect", "tls", "ttfb", "transfer") and not event.attempts:
+                    continue
+                self._observe("segment_seconds", endpoint + (("phase", phase),), value)
+            self._recent.append(asdict(event))
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._recent.clear()
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            seen = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {PREFIX}_{name} counter")
+                    seen.add(name)
+                lines.append(f"{PREFIX}_{name}{_labels(labels) if labels else ''} {value:g}")
+            for (name, labels), hist in sorted(self._histograms.items(), key=lambda item: item[0]):
+                if name not in seen:
+                    lines.append(f"# TYPE {PREFIX}_{name} histogram")
+                    seen.add(name)
+                for bound, n in zip(BUCKETS, hist.counts):
+                    lines.append(f"{PREFIX}_{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {n}")
+                lines.append(f"{PREFIX}_{name}_bucket{_labels(labels + (('le', '+Inf'),))} {hist.count}")
+                lines.append(f"{PREFIX}_{name}_sum{_labels(labels) if labels else ''} {hist.sum:.6f}")
+                lines.append(f"{PREFIX}_{name}_count{_labels(labels) if labels else ''} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> Dict:
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{"name": name, "labels": dict(labels), "count": hist.count,
+                           "sum": round(hist.sum, 6), "p50": hist.quantile(0.5),
+                           "p95": hist.quantile(0.95), "p99": hist.quantile(0.99)}
+                          for (name, labels), hist in sorted(self._histograms.items(), key=lambda item: item[0])]
+            return {"counters": counters, "histograms": histograms, "recent": list(self._recent)}
+
+    def write(self, path: str):
+        # .json gets the JSON dump, anything else the Prometheus text format
+        with open(path, "w", encoding="utf-8") as f:
+            if path.lower().endswith(".json"):
+                json.dump(self.to_json(), f, indent=2)
+            else:
+                f.write(self.to_prometheus())
+
+
+_default: Optional[FetchMetrics] = None
+_default_lock = threading.Lock()
+
+
+def install(metrics: Optional[FetchMetrics] = None) -> FetchMetrics:
+    # Subscribe metrics, or the shared default (created once), to unified's traces
+    global _default
+    with _default_lock:
+        if metrics is None:
+            if _default is None:
+                _default = FetchMetrics()
+                unified.add_trace_listener(_default.record)
+            return _default
+    unified.add_trace_listener(metrics.record)
+    return metrics
+
+
+def uninstall(metrics: FetchMetrics):
+    global _default
+    with _default_lock:
+        unified.remove_trace_listener(metrics.record)
+        if metrics is _default:
+            _default = None
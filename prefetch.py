@@ -0,0 +1,210 @@
+import argparse
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, UTC
+from typing import Callable, List, Optional, Tuple
+
+import segment_cache
+import unified
+
+
+# ------------------------------------------------------------
+# Background warm-up of popular locations
+# PopularityTracker keeps an exponentially decayed request count per location
+# (SQLite, shared by the app and a separate worker). PrefetchScheduler plans the
+# app's page needs for the top locations every interval and refreshes the
+# forecast / air-quality segments whose cache entries are missing or expiring,
+# soonest first, within a request budget per hour and a concurrency limit.
+# Usage (worker): python prefetch.py [--top N] [--interval S] [--budget R] [--once]
+# ------------------------------------------------------------
+
+
+HALF_LIFE_DAYS = 7.0
+MAX_TRACKED = 10_000
+DEFAULT_TOP = 20
+DEFAULT_INTERVAL = 60.0
+DEFAULT_CONCURRENCY = 2
+# Upstream requests per rolling hour
+DEFAULT_BUDGET = 300
+# Expiries follow model updates, so refreshing before one would fetch the run being
+# replaced; a lead > 0 only pays off for hosts on a plain TTL
+DEFAULT_LEAD = 0.0
+
+
+def default_tracker_path() -> str:
+    return os.path.join(segment_cache.default_cache_dir(), "popular.sqlite")
+
+
+class PopularityTracker:
+    # Ranks by count * 2^-(age / half-life). Stored as log2(count) + updated / half-life,
+    # which orders the same at any later time, so ranking needs no rescoring.
+    def __init__(self, path: Optional[str] = None, half_life_days: float = HALF_LIFE_DAYS):
+        path = path or default_tracker_path()
+        outdir = os.path.dirname(path)
+        if outdir:
+            os.makedirs(outdir, exist_ok=True)
+        self.path = path
+        self.half_life = half_life_days * 86400.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS locations ("
+            " location TEXT PRIMARY KEY,"
+            " rank REAL NOT NULL,"
+            " hits INTEGER NOT NULL,"
+            " last_seen REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS locations_rank ON locations (rank)")
+
+    def record(self, location: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._conn.execute("SELECT rank FROM locations WHERE location = ?", (location,)).fetchone()
+            # decayed count so far, plus this request
+            count = 1.0 + (2.0 ** (row[0] - now / self.half_life) if row else 0.0)
+            self._conn.execute(
+                "INSERT INTO locations (location, rank, hits, last_seen) VALUES (?, ?, 1, ?)"
+                " ON CONFLICT (location) DO UPDATE SET rank = excluded.rank, hits = hits + 1,"
+                " last_seen = excluded.last_seen",
+                (location, math.log2(count) + now / self.half_life, now),
+            )
+            if row is None:
+                self._conn.execute(
+                    "DELETE FROM locations WHERE location IN"
+                    " (SELECT location FROM locations ORDER BY rank DESC LIMIT -1 OFFSET ?)", (MAX_TRACKED,))
+
+    def top(self, n: int, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        # (location, decayed request count), most popular first
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT location, rank FROM locations ORDER BY rank DESC LIMIT ?", (n,)).fetchall()
+        return [(location, 2.0 ** (rank - now / self.half_life)) for location, rank in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def app_needs(now: datetime) -> List[unified.DataNeed]:
+    # The needs of one app render (utilities.page_needs); imports the app's utilities lazily
+    import utilities
+
+    return [unified.DataNeed(*need) for need in utilities.page_needs(now).values()]
+
+
+class PrefetchScheduler:
+    def __init__(self, tracker: Optional[PopularityTracker] = None,
+                 needs: Callable[[datetime], List[unified.DataNeed]] = app_needs,
+                 top: int = DEFAULT_TOP, interval: float = DEFAULT_INTERVAL,
+                 concurrency: int = DEFAULT_CONCURRENCY, budget: int = DEFAULT_BUDGET,
+                 lead: float = DEFAULT_LEAD):
+        self.tracker = tracker or PopularityTracker()
+        self.needs = needs
+        self.top = top
+        self.interval = interval
+        self.concurrency = concurrency
+        self.budget = budget
+        self.lead = lead
+        self._spent: deque = deque()  # monotonic times of refreshes in the last hour
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _allowance(self) -> int:
+        cutoff = time.monotonic() - 3600.0
+        while self._spent and self._spent[0] < cutoff:
+            self._spent.popleft()
+        return max(0, self.budget - len(self._spent))
+
+    def due(self, now: Optional[datetime] = None) -> List[Tuple[float, str, unified.Segment]]:
+        # (due time, location, segment) over the top locations, soonest first
+        now = now or datetime.now(UTC)
+        segments = unified.plan_requests(self.needs(now), today=now)
+        due = []
+        for location, _ in self.tracker.top(self.top):
+            for when, seg in unified.refresh_due(location, segments, within=self.lead, now=now.timestamp()):
+                due.append((when, location, seg))
+        return sorted(due, key=lambda item: item[0])
+
+    def run_once(self, now: Optional[datetime] = None) -> Tuple[int, int]:
+        # One pass; returns (segments refreshed, segments that failed)
+        jobs = self.due(now)[:self._allowance()]
+        if not jobs:
+            return 0, 0
+
+        def refresh(job) -> bool:
+            _, location, seg = job
+            try:
+                unified.refresh_segment(location, seg)
+                return True
+            except Exception as exc:
+                print(f"prefetch {location} {seg.url} failed: {exc}", file=sys.stderr)
+                return False
+
+        with ThreadPoolExecutor(max_workers=max(1, self.concurrency), thread_name_prefix="prefetch") as pool:
+            done = list(pool.map(refresh, jobs))
+        # failed attempts still cost upstream requests
+        self._spent.extend([time.monotonic()] * len(done))
+        return sum(done), len(done) - sum(done)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as exc:
+                print(f"prefetch pass failed: {exc}", file=sys.stderr)
+            self._stop.wait(self.interval)
+
+    def start(self) -> "PrefetchScheduler":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="prefetch-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="prefetch.py",
+                                     description="Keep the segment cache warm for the most requested locations")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Locations kept warm")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Seconds between passes")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Refreshes run at once")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="Upstream requests per hour")
+    parser.add_argument("--lead", type=float, default=DEFAULT_LEAD,
+                        help="Refresh entries expiring within this many seconds")
+    parser.add_argument("--tracker", type=str, default=None, help="Popularity database (default in the cache dir)")
+    parser.add_argument("--once", action="store_true", help="Run one pass and exit")
+
+    args = parser.parse_args(argv)
+
+    scheduler = PrefetchScheduler(PopularityTracker(args.tracker), top=args.top, interval=args.interval,
+                                  concurrency=args.concurrency, budget=args.budget, lead=args.lead)
+    if args.once:
+        refreshed, failed = scheduler.run_once()
+        print(f"refreshed {refreshed} segment(s), {failed} failed", file=sys.stderr)
+        raise SystemExit(1 if failed else 0)
+    try:
+        while True:
+            refreshed, failed = scheduler.run_once()
+            if refreshed or failed:
+                print(f"{datetime.now():%H:%M:%S} refreshed {refreshed} segment(s), {failed} failed",
+                      file=sys.stderr)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import platformdirs
+
+
+# ------------------------------------------------------------
+# Persistent response cache for Open-Meteo segments
+# Stores raw (compressed) response bodies in SQLite, keyed by request.
+# Entries with expires_at NULL never expire (settled archive data);
+# the whole store is bounded by size with least-recently-used eviction.
+# Never-expiring entries are also indexed by (url, location, variable)
+# date coverage so callers can ask which history is already on disk.
+# ------------------------------------------------------------
+
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Evict down to this fraction of max_bytes so every put does not trigger eviction
+EVICT_TO = 0.9
+
+
+def default_cache_dir() -> str:
+    return os.environ.get("WEATHERAPP_CACHE_DIR") or platformdirs.user_cache_dir("weatherapp")
+
+
+def make_key(url: str, params: Dict) -> str:
+    # params already carry lat, lon, variables, date range and domains;
+    # variable order does not change the response, so it does not change the key
+    norm = {k: sorted(v) if isinstance(v, list) else v for k, v in params.items()}
+    blob = json.dumps([url, norm], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def coverage_variables(params: Dict) -> List[str]:
+    # Multi-location requests (comma separated coordinates) are not indexed
+    if "," in str(params.get("latitude", "")):
+        return []
+    return [f"{kind}:{v}" for kind in ("hourly", "daily") for v in params.get(kind, [])]
+
+
+class SegmentCache:
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        if path is None:
+            path = os.path.join(default_cache_dir(), "segments.sqlite")
+        outdir = os.path.dirname(path)
+        if outdir:
+            os.makedirs(outdir, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " body BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS coverage ("
+            " key TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " latitude TEXT NOT NULL,"
+            " longitude TEXT NOT NULL,"
+            " variable TEXT NOT NULL,"
+            " start_date TEXT NOT NULL,"
+            " end_date TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS coverage_lookup ON coverage (url, latitude, longitude, variable)"
+        )
+        self._size = self._total_size()
+
+    def _total_size(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self.lookup(key)
+        if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+            return None
+        return entry[0]
+
+    def expiry(self, key: str) -> Tuple[bool, Optional[float]]:
+        # (stored, expires_at) without reading the body or counting as an access
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+        return (False, None) if row is None else (True, row[0])
+
+    def lookup(self, key: str) -> Optional[Tuple[bytes, Optional[float]]]:
+        # (body, expires_at) even when expired, for serving stale data while it is refreshed;
+        # expired entries stay until they are replaced or evicted
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            body, expires_at = row
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        return zlib.decompress(body), expires_at
+
+    def put(self, key: str, body: bytes, expires_at: Optional[float] = None,
+            url: Optional[str] = None, params: Optional[Dict] = None):
+        # url/params describe the request; permanent single-location entries are indexed for coverage
+        packed = zlib.compress(body, 6)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, body, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, packed, len(packed), expires_at, now),
+            )
+            self._conn.execute("DELETE FROM coverage WHERE key = ?", (key,))
+            if expires_at is None and url is not None and params is not None:
+                self._conn.executemany(
+                    "INSERT INTO coverage (key, url, latitude, longitude, variable, start_date, end_date)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(key, url, params["latitude"], params["longitude"], v,
+                      params["start_date"], params["end_date"]) for v in coverage_variables(params)],
+                )
+            self._conn.execute("COMMIT")
+            self._size += len(packed) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def coverage(self, url: str, latitude: str, longitude: str, variable: str,
+                 start_date: str, end_date: str) -> List[Tuple[str, str, str]]:
+        # (start_date, end_date, key) of stored entries overlapping [start_date, end_date], oldest first
+        with self._lock:
+            return self._conn.execute(
+                "SELECT start_date, end_date, key FROM coverage"
+                " WHERE url = ? AND latitude = ? AND longitude = ? AND variable = ?"
+                " AND start_date <= ? AND end_date >= ? ORDER BY start_date",
+                (url, latitude, longitude, variable, end_date, start_date),
+            ).fetchall()
+
+    def _evict(self):
+        # Caller holds the lock. Re-read the size since other processes may share the file.
+        self._size = self._total_size()
+        target = int(self.max_bytes * EVICT_TO)
+        while self._size > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            freed = 0
+            for key, size in rows:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.execute("DELETE FROM coverage WHERE key = ?", (key,))
+                freed += size
+                if self._size - freed <= target:
+                    break
+            self._size -= freed
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM coverage")
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
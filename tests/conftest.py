@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import unified  # noqa: E402
+
+
+def synth_payload(params: Dict, values: Optional[Callable[[str, int], object]] = None) -> Dict:
+    # One location's response for params; values(name, i) gives the i-th value of a variable
+    values = values or (lambda name, i: float((i + len(name)) % 50))
+    start = datetime.strptime(params["start_date"], "%Y-%m-%d")
+    end = datetime.strptime(params["end_date"], "%Y-%m-%d")
+    payload: Dict = {"latitude": float(params["latitude"]), "longitude": float(params["longitude"])}
+    for kind, step, fmt in (("hourly", timedelta(hours=1), "%Y-%m-%dT%H:%M"), ("daily", timedelta(days=1), "%Y-%m-%d")):
+        names = params.get(kind)
+        if not names:
+            continue
+        names = names.split(",") if isinstance(names, str) else list(names)
+        n = int((end - start + timedelta(days=1)) / step)
+        payload[kind] = {"time": [(start + step * i).strftime(fmt) for i in range(n)]}
+        payload[f"{kind}_units"] = {"time": "iso8601"}
+        for name in names:
+            payload[kind][name] = [values(name, i) for i in range(n)]
+            payload[f"{kind}_units"][name] = unified.VARIABLES[name].default_unit if name in unified.VARIABLES else "undefined"
+    return payload
+
+
+class FakeTransport:
+    # Stands in for unified.HTTPTransport: answers every request from synth_payload
+    def __init__(self, values: Optional[Callable[[str, int], object]] = None):
+        self.values = values
+        self.calls: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def fetch(self, url: str, params: Dict) -> bytes:
+        with self._lock:
+            self.calls.append(dict(params, url=url))
+        lats, lons = str(params["latitude"]).split(","), str(params["longitude"]).split(",")
+        if len(lats) == 1:
+            return json.dumps(synth_payload(params, self.values)).encode("utf-8")
+        # several coordinates are answered with a list, as Open-Meteo does
+        return json.dumps([synth_payload(dict(params, latitude=lat, longitude=lon), self.values)
+                           for lat, lon in zip(lats, lons)]).encode("utf-8")
+
+    def close(self):
+        pass
+
+
+class AsyncFakeTransport(FakeTransport):
+    # unified.AsyncHTTPTransport counterpart of FakeTransport
+    async def fetch(self, url: str, params: Dict) -> bytes:
+        return FakeTransport.fetch(self, url, params)
+
+
+@pytest.fixture
+def isolated(monkeypatch):
+    # No segment cache, no history store: every segment goes to the transport
+    monkeypatch.setattr(unified, "CACHE_ENABLED", False)
+    monkeypatch.setattr(unified, "LAKE_ENABLED", False)
+    previous_cache = unified._segment_cache
+    previous_store = unified.set_history_store(None)
+    unified.set_segment_cache(None)
+    yield
+    unified.set_segment_cache(previous_cache)
+    unified.set_history_store(previous_store)
+
+
+@pytest.fixture
+def fake_transport(isolated):
+    def install(values: Optional[Callable[[str, int], object]] = None) -> FakeTransport:
+        transport = FakeTransport(values)
+        previous.append(unified.set_transport(transport))
+        return transport
+
+    previous: List = []
+    yield install
+    if previous:
+        unified.set_transport(previous[0])
+
+
+@pytest.fixture
+def fake_async_transport(isolated):
+    transport = AsyncFakeTransport()
+    previous = unified.set_async_transport(transport)
+    yield transport
+    unified.set_async_transport(previous)
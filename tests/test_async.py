@@ -0,0 +1,70 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, UTC
+
+import pytest
+import requests
+from tornado.httpclient import HTTPClientError, HTTPRequest, HTTPResponse
+from tornado.simple_httpclient import HTTPTimeoutError
+
+import unified
+
+VARIABLES = "temperature_2m,weather_code,pm2_5,temperature_2m_max"
+LOCATION = "33.7756,-84.3963"
+
+
+def _range():
+    today = datetime.now(UTC)
+    return (today - timedelta(days=3)).strftime("%Y-%m-%d"), (today + timedelta(days=2)).strftime("%Y-%m-%d")
+
+
+def test_matches_fetch_unified(fake_transport, fake_async_transport):
+    fake_transport()
+    start, end = _range()
+    sync = unified.fetch_unified(VARIABLES, LOCATION, "both", start, end)
+    result = asyncio.run(unified.fetch_unified_async(VARIABLES, LOCATION, "both", start, end))
+    assert result["data"] == sync["data"]
+    assert result["units"] == sync["units"]
+
+
+def test_merge_and_build_run_off_the_loop(fake_async_transport, monkeypatch):
+    threads = {}
+    merge, build = unified._merge_results, unified._build_result
+
+    def recording_merge(*args, **kwargs):
+        threads["merge"] = threading.current_thread()
+        return merge(*args, **kwargs)
+
+    def recording_build(*args, **kwargs):
+        threads["build"] = threading.current_thread()
+        return build(*args, **kwargs)
+
+    monkeypatch.setattr(unified, "_merge_results", recording_merge)
+    monkeypatch.setattr(unified, "_build_result", recording_build)
+
+    async def run():
+        loop_thread = threading.current_thread()
+        result = await unified.fetch_unified_async(VARIABLES, LOCATION, "both", *_range())
+        return loop_thread, result
+
+    loop_thread, result = asyncio.run(run())
+    assert "error" not in result
+    assert threads["merge"] is not loop_thread
+    assert threads["build"] is not loop_thread
+
+
+@pytest.mark.parametrize("error, expected", [
+    (HTTPTimeoutError("Timeout while connecting"), requests.Timeout),
+    (HTTPClientError(599, "Connection refused"), requests.ConnectionError),
+])
+def test_599_maps_to_timeout_or_connection_error(monkeypatch, error, expected):
+    transport = unified.AsyncHTTPTransport(max_attempts=1, limits=None)
+
+    class Client:
+        async def fetch(self, url, **kwargs):
+            return HTTPResponse(HTTPRequest(url), 599, error=error)
+
+    monkeypatch.setattr(transport, "client", Client)
+    with pytest.raises(expected) as info:
+        asyncio.run(transport.fetch(unified.OPEN_METEO_WEATHER_FORECAST, {"latitude": "0"}))
+    assert isinstance(info.value, requests.Timeout) == (expected is requests.Timeout)
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+import unified
+from unified import CHUNK_TARGET_VALUES, _adaptive_chunks, _chunks
+
+
+def day(y: int, m: int, d: int, *hms: int) -> datetime:
+    return datetime(y, m, d, *hms, tzinfo=UTC)
+
+
+def assert_tiles(chunks, start: datetime, end: datetime):
+    # inclusive day ranges: contiguous, non-overlapping, covering [start, end]
+    assert chunks[0][0] == start
+    assert chunks[-1][1] == end
+    for s, e in chunks:
+        assert s <= e
+    for (_, prev_end), (next_start, _) in zip(chunks, chunks[1:]):
+        midnight = prev_end.replace(hour=0, minute=0, second=0, microsecond=0)
+        assert next_start == midnight + timedelta(days=1)
+    days = sum((e.date() - s.date()).days + 1 for s, e in chunks)
+    assert days == (end.date() - start.date()).days + 1
+
+
+def chunk_days(chunks):
+    return [(e.date() - s.date()).days + 1 for s, e in chunks]
+
+
+def test_one_day():
+    start = day(2021, 6, 1)
+    chunks = _adaptive_chunks(start, start, 24)
+    assert chunks == [(start, start)]
+
+
+@pytest.mark.parametrize("values_per_day", [1, 24, 48])
+def test_exactly_target_is_one_chunk(values_per_day):
+    days = CHUNK_TARGET_VALUES // values_per_day
+    start = day(2000, 1, 1)
+    end = start + timedelta(days=days - 1)
+    assert days * values_per_day <= CHUNK_TARGET_VALUES
+    chunks = _adaptive_chunks(start, end, values_per_day)
+    assert len(chunks) == 1
+    assert_tiles(chunks, start, end)
+
+
+@pytest.mark.parametrize("values_per_day", [1, 24, 48])
+def test_just_above_target_splits_evenly(values_per_day):
+    days = CHUNK_TARGET_VALUES // values_per_day + 1
+    start = day(2000, 1, 1)
+    end = start + timedelta(days=days - 1)
+    chunks = _adaptive_chunks(start, end, values_per_day)
+    assert len(chunks) == 2
+    sizes = chunk_days(chunks)
+    assert max(sizes) - min(sizes) <= 1
+    assert all(n * values_per_day <= CHUNK_TARGET_VALUES for n in sizes)
+    assert_tiles(chunks, start, end)
+
+
+def test_target_below_one_day_gives_one_day_chunks():
+    start, end = day(2022, 2, 26), day(2022, 3, 3)
+    chunks = _adaptive_chunks(start, end, 24, target=10)
+    assert chunk_days(chunks) == [1] * 6
+    assert_tiles(chunks, start, end)
+
+
+def test_crosses_new_year():
+    start, end = day(2019, 12, 20), day(2020, 1, 10)
+    chunks = _adaptive_chunks(start, end, 24, target=24 * 7)
+    assert chunks == [(start, day(2019, 12, 25)), (day(2019, 12, 26), day(2019, 12, 31)),
+                      (day(2020, 1, 1), day(2020, 1, 5)), (day(2020, 1, 6), end)]
+    assert_tiles(chunks, start, end)
+    # uneven split straddling the year boundary
+    chunks = _adaptive_chunks(day(2019, 12, 29), day(2020, 1, 3), 24, target=24 * 4)
+    assert chunks == [(day(2019, 12, 29), day(2019, 12, 31)), (day(2020, 1, 1), day(2020, 1, 3))]
+    chunks = _adaptive_chunks(day(2019, 12, 30), day(2020, 1, 4), 24, target=24 * 5)
+    assert chunks == [(day(2019, 12, 30), day(2020, 1, 1)), (day(2020, 1, 2), day(2020, 1, 4))]
+
+
+@pytest.mark.parametrize("target", [CHUNK_TARGET_VALUES, 24 * 3, 1])
+def test_bounds_with_time_of_day(target):
+    start, end = day(2021, 12, 30, 15, 30), day(2022, 1, 4, 6)
+    chunks = _adaptive_chunks(start, end, 24, target=target)
+    assert_tiles(chunks, start, end)
+    for s, _ in chunks[1:]:
+        assert (s.hour, s.minute) == (0, 0)
+    for _, e in chunks[:-1]:
+        assert (e.hour, e.minute) == (0, 0) or e == start
+
+
+@pytest.mark.parametrize("years", [1, 3, 10, 45])
+def test_ranges_always_tile(years):
+    start = day(1980, 3, 15)
+    end = start + timedelta(days=365 * years)
+    for values_per_day in (1, 24, 24 * 5 + 2):
+        chunks = _adaptive_chunks(start, end, values_per_day)
+        assert_tiles(chunks, start, end)
+        assert all(n * values_per_day <= CHUNK_TARGET_VALUES or n == 1 for n in chunk_days(chunks))
+
+
+def test_chunks_dispatches_on_strategy(monkeypatch):
+    start, end = day(2019, 12, 20), day(2021, 1, 10)
+    monkeypatch.setattr(unified, "CHUNKING", "adaptive")
+    assert _chunks(start, end, 24) == _adaptive_chunks(start, end, 24)
+    monkeypatch.setattr(unified, "CHUNKING", "year")
+    chunks = _chunks(start, end, 24)
+    assert chunks == [(start, day(2019, 12, 31)), (day(2020, 1, 1), day(2020, 12, 31)),
+                      (day(2021, 1, 1), end)]
+    assert_tiles(chunks, start, end)
+    monkeypatch.setattr(unified, "CHUNKING", "monthly")
+    with pytest.raises(ValueError):
+        _chunks(start, end, 24)
@@ -0,0 +1,82 @@
+from datetime import datetime, UTC
+
+import numpy as np
+import pytest
+
+import unified
+from conftest import synth_payload
+
+pytest.importorskip("pyarrow")
+import lake  # noqa: E402
+
+LAT, LON = 33.7756, -84.3963
+START, END = datetime(2020, 3, 1, tzinfo=UTC), datetime(2020, 3, 3, tzinfo=UTC)
+VARIABLES = ["temperature_2m", "weather_code", "temperature_2m_max"]
+
+
+@pytest.fixture
+def history_lake(fake_transport, monkeypatch, tmp_path):
+    # A lake holding [START, END] for VARIABLES, and a transport that records any request
+    monkeypatch.setattr(unified, "LAKE_ENABLED", True)
+    store = lake.HistoryLake(str(tmp_path / "lake"))
+    specs = [unified.VARIABLES[v] for v in VARIABLES]
+    params = {"latitude": LAT, "longitude": LON, "start_date": "2020-03-01", "end_date": "2020-03-03",
+              "hourly": "temperature_2m,weather_code", "daily": "temperature_2m_max"}
+    store.write(LAT, LON, specs, START, END, synth_payload(params))
+    unified.set_history_store(store)
+    return store, fake_transport()
+
+
+def test_read_reports_the_time_unit(history_lake):
+    store, _ = history_lake
+    parts = store.read(LAT, LON, [unified.VARIABLES[v] for v in VARIABLES], START, END)
+    assert {kind for part in parts for kind in unified.TIME_COLUMNS if kind in part} == {"hourly", "daily"}
+    for part in parts:
+        for kind in unified.TIME_COLUMNS:
+            if kind in part:
+                assert part[f"{kind}_units"]["time"] == "iso8601"
+
+
+def test_lake_only_range_keeps_the_time_unit(history_lake):
+    _, transport = history_lake
+    result = unified.fetch_unified(",".join(VARIABLES), f"{LAT},{LON}", "history", "2020-03-01", "2020-03-03")
+
+    assert transport.calls == []
+    assert result["units"]["time"] == "iso8601"
+    assert len(result["data"]["hourly"]) == 72
+    assert len(result["data"]["daily"]) == 3
+
+
+def test_many_reads_stored_history_before_batching(history_lake):
+    # The stored location is answered from the lake; only the other one goes upstream
+    _, transport = history_lake
+    other = "40.7128,-74.006"
+    results = unified.fetch_unified_many(",".join(VARIABLES), [f"{LAT},{LON}", other], "history",
+                                         "2020-03-01", "2020-03-03")
+
+    assert transport.calls
+    assert all("," not in str(call["latitude"]) for call in transport.calls)
+    assert {str(call["latitude"]) for call in transport.calls} == {str(results[1]["metadata"]["location"]["latitude"])}
+    assert [len(r["data"]["hourly"]) for r in results] == [72, 72]
+    assert results[0]["data"] == unified.fetch_unified(",".join(VARIABLES), f"{LAT},{LON}", "history",
+                                                       "2020-03-01", "2020-03-03")["data"]
+
+
+def test_read_fills_variables_a_file_lacks(history_lake):
+    # Two files of one group holding different variables; each reads as NaN where the other has data
+    store, _ = history_lake
+    later = {"latitude": LAT, "longitude": LON, "start_date": "2020-03-04", "end_date": "2020-03-05",
+             "hourly": "relative_humidity_2m"}
+    store.write(LAT, LON, [unified.VARIABLES["relative_humidity_2m"]], datetime(2020, 3, 4, tzinfo=UTC),
+                datetime(2020, 3, 5, tzinfo=UTC), synth_payload(later))
+    specs = [unified.VARIABLES[v] for v in ("temperature_2m", "relative_humidity_2m")]
+    parts = store.read(LAT, LON, specs, datetime(2020, 3, 2, tzinfo=UTC), datetime(2020, 3, 4, tzinfo=UTC))
+
+    (part,) = parts
+    hourly = part["hourly"]
+    assert len(hourly["time"]) == 72
+    assert str(hourly["time"][0]) == "2020-03-02T00:00:00"
+    assert np.isnan(hourly["relative_humidity_2m"][:48]).all()
+    assert not np.isnan(hourly["relative_humidity_2m"][48:]).any()
+    assert not np.isnan(hourly["temperature_2m"][:48]).any()
+    assert np.isnan(hourly["temperature_2m"][48:]).all()
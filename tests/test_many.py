@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+import segment_cache
+import unified
+
+VARIABLES = "temperature_2m,weather_code"
+STALE, OTHER = "33.7756,-84.3963", "40.7128,-74.006"
+
+
+def _range():
+    today = datetime.now(UTC)
+    return today.strftime("%Y-%m-%d"), (today + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+@pytest.fixture
+def cache(fake_transport, monkeypatch, tmp_path):
+    monkeypatch.setattr(unified, "CACHE_ENABLED", True)
+    cache = segment_cache.SegmentCache(str(tmp_path / "segments.sqlite"))
+    unified.set_segment_cache(cache)
+    return cache, fake_transport()
+
+
+def test_stale_location_is_served_and_refreshed_in_background(cache, monkeypatch):
+    cache, transport = cache
+    start, end = _range()
+    first = unified.fetch_unified_many(VARIABLES, [STALE], "forecast", start, end)[0]
+    # expire every entry the first call stored, within STALE_GRACE
+    for call in transport.calls:
+        params = {k: v for k, v in call.items() if k != "url"}
+        key = segment_cache.make_key(call["url"], params)
+        body, _ = cache.lookup(key)
+        cache.put(key, body, datetime.now(UTC).timestamp() - 60, url=call["url"], params=params)
+    stale_calls = list(transport.calls)
+    transport.calls.clear()
+    refreshed = []
+    monkeypatch.setattr(unified, "_schedule_refresh", lambda key, *args: refreshed.append(key))
+
+    results = unified.fetch_unified_many(VARIABLES, [STALE, OTHER], "forecast", start, end)
+
+    assert len(refreshed) == len(stale_calls)
+    assert {str(call["latitude"]) for call in transport.calls} == {str(results[1]["metadata"]["location"]["latitude"])}
+    assert results[0]["data"] == first["data"]
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import pytest
+
+import segment_cache
+import unified
+from conftest import synth_payload
+
+URL = unified.OPEN_METEO_WEATHER_FORECAST
+PARAMS = {"latitude": "33.7756", "longitude": "-84.3963", "timezone": "UTC",
+          "start_date": "2024-01-01", "end_date": "2024-01-02", "hourly": "temperature_2m,weather_code"}
+
+
+@pytest.fixture
+def cached(fake_transport, monkeypatch, tmp_path):
+    # A fresh segment cache, and counters on the JSON and packed decoders
+    monkeypatch.setattr(unified, "CACHE_ENABLED", True)
+    unified.set_segment_cache(segment_cache.SegmentCache(str(tmp_path / "segments.sqlite")))
+    counts = {"json": 0, "unpack": 0}
+    json_loads, unpack = unified._json_loads, unified._unpack
+
+    def counting_json(body):
+        counts["json"] += 1
+        return json_loads(body)
+
+    def counting_unpack(body):
+        counts["unpack"] += 1
+        return unpack(body)
+
+    monkeypatch.setattr(unified, "_json_loads", counting_json)
+    monkeypatch.setattr(unified, "_unpack", counting_unpack)
+    fake_transport()
+    return counts
+
+
+def _values(payload):
+    return {name: [None if v is None or v != v else float(v) for v in values]
+            for name, values in payload["hourly"].items() if name != "time"}
+
+
+def test_miss_decodes_once_and_caches_packed(cached):
+    payload = unified._request(URL, PARAMS)
+    assert cached == {"json": 1, "unpack": 0}
+    body, _ = unified.get_segment_cache().lookup(segment_cache.make_key(URL, PARAMS))
+    assert body[:4] == unified.PACK_MAGIC
+
+    hit = unified._request(URL, PARAMS)
+    # a hit unpacks the stored columns (whose small header is JSON)
+    assert cached["unpack"] == 1
+    assert _values(hit) == _values(payload) == _values(synth_payload(PARAMS))
+
+
+def test_async_miss_decodes_once(cached, fake_async_transport):
+    payload = asyncio.run(unified._request_async(URL, PARAMS))
+    assert cached == {"json": 1, "unpack": 0}
+    assert _values(payload) == _values(synth_payload(PARAMS))
+
+
+def test_async_decode_and_pack_run_off_the_loop(cached, fake_async_transport, monkeypatch):
+    threads = []
+    decode, encode = unified._decode, unified._encode_for_cache
+
+    def recording_decode(*args):
+        threads.append(("decode", threading.current_thread()))
+        return decode(*args)
+
+    def recording_encode(*args):
+        threads.append(("encode", threading.current_thread()))
+        return encode(*args)
+
+    monkeypatch.setattr(unified, "_decode", recording_decode)
+    monkeypatch.setattr(unified, "_encode_for_cache", recording_encode)
+
+    async def run():
+        # the second call shares the leader's flight (or hits its cache entry) and decodes its own copy
+        parts = await asyncio.gather(unified._request_async(URL, PARAMS), unified._request_async(URL, PARAMS))
+        return threading.current_thread(), parts
+
+    loop_thread, parts = asyncio.run(run())
+    assert _values(parts[0]) == _values(parts[1])
+    assert sorted(name for name, _ in threads) == ["decode", "decode", "encode"]
+    assert all(thread is not loop_thread for _, thread in threads)
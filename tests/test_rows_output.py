@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, UTC
+
+import numpy as np
+
+import unified
+
+# weather_code / relative_humidity_2m arrive as JSON integers, temperature_2m as floats
+# (including whole ones), with gaps in each
+SERIES = {
+    "temperature_2m": lambda i: None if i % 11 == 5 else [12.3, 12.0, -0.5, 7.25][i % 4],
+    "weather_code": lambda i: None if i % 13 == 7 else [0, 3, 61, 95][i % 4],
+    "relative_humidity_2m": lambda i: None if i % 17 == 3 else 40 + i % 60,
+}
+
+
+def _values(name, i):
+    return SERIES[name](i)
+
+
+def test_rows_keep_the_json_types_of_the_response(fake_transport):
+    transport = fake_transport(_values)
+    today = datetime.now(UTC)
+    start, end = today.strftime("%Y-%m-%d"), (today + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    result = unified.fetch_unified(",".join(SERIES), "33.7756,-84.3963", "forecast", start, end)
+
+    assert len(transport.calls) == 1
+    rows = result["data"]["hourly"]
+    # pre-merge-engine shape: one dict per hour with the response's values as they were decoded
+    expected = [{"timestamp_utc": (today.replace(hour=0, minute=0, second=0, microsecond=0)
+                                   + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M"),
+                 **{name: series(i) for name, series in SERIES.items()}}
+                for i in range(48)]
+    assert rows == expected
+    for row, want in zip(rows, expected):
+        for name in SERIES:
+            assert type(row[name]) is type(want[name]), (name, row[name])
+    assert result["data"]["daily"] == []
+
+
+def test_integer_variables_with_fractions_stay_float():
+    spec = unified.VARIABLES["precipitation_probability"]
+    assert spec.is_integer
+    block = {"time": np.array(["2024-01-01T00:00", "2024-01-01T01:00"], dtype="datetime64[s]"),
+             spec.api_var_name: np.array([12.5, np.nan])}
+    rows = unified._to_rows({"hourly": block}, [spec])["hourly"]
+    assert [r[spec.api_var_name] for r in rows] == [12.5, None]
@@ -1,11 +1,33 @@
 import argparse
+import atexit
+import csv
 import json
 import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import ContextVar
 from dataclasses import dataclass
 from datetime import datetime, timedelta, UTC
-from typing import Dict, List, Optional, Tuple, Union
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Tuple, Union
+from urllib.parse import urlencode, urlsplit
+from weakref import WeakKeyDictionary
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import segment_cache
+
+try:
+    import orjson
+except ImportError:  # optional: faster decode when installed
+    orjson = None
 
 
 # ------------------------------------------------------------
@@ -24,12 +46,165 @@ class VariableSpec:
     api_var_name: str
     default_unit: str
 
+    @property
+    def is_integer(self) -> bool:
+        return self.default_unit in INTEGER_UNITS
+
+
+@dataclass(frozen=True)
+class Segment:
+    url: str
+    specs: Tuple[VariableSpec, ...]
+    start: datetime
+    end: datetime
+    is_history: bool
+
+
+@dataclass(frozen=True)
+class DataNeed:
+    variable: str  # comma separated, as for fetch_unified
+    start_date: str
+    end_date: str
+    mode: str = "both"
+
+
+@dataclass
+class SegmentTrace:
+    # One segment (or multi-location batch) request as seen by the fetch pipeline.
+    # Phases in seconds, summed over retries: wait (rate limiter), connect (DNS + TCP,
+    # 0 on a reused connection), tls, ttfb (request sent -> headers), transfer, decode.
+    url: str
+    start: str
+    end: str
+    is_history: bool
+    variables: int
+    locations: int = 1
+    cache: str = "off"  # off | hit | miss | coalesced | stored | lake
+    attempts: int = 0
+    status: Optional[int] = None
+    wait_s: float = 0.0
+    connect_s: float = 0.0
+    tls_s: float = 0.0
+    ttfb_s: float = 0.0
+    transfer_s: float = 0.0
+    decode_s: float = 0.0
+    total_s: float = 0.0
+    bytes: int = 0  # response bytes on the wire (before gzip decoding)
+    rows: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class MergeTrace:
+    parts: int
+    rows: int
+    seconds: float
+
+
+@dataclass(frozen=True)
+class EndpointLimits:
+    rate: float  # sustained requests per second (token refill rate)
+    burst: int  # token bucket capacity
+    max_concurrency: int  # ceiling for the adaptive in-flight limit
+    min_concurrency: int = 1
+
+
+@dataclass(frozen=True)
+class UpdateCadence:
+    period_hours: float  # hours between upstream data updates
+    offset_hours: float = 0.0  # first update of the UTC day, publication lag included
+
 
 # Open-Meteo endpoints
 OPEN_METEO_WEATHER_FORECAST = "https://api.open-meteo.com/v1/forecast"
 OPEN_METEO_WEATHER_ARCHIVE = "https://archive-api.open-meteo.com/v1/archive"
 OPEN_METEO_AIR_QUALITY = "https://air-quality-api.open-meteo.com/v1/air-quality"
 
+# Upper bound on concurrent segment requests per fetch_unified call
+MAX_WORKERS = 8
+# Locations per multi-coordinate request in fetch_unified_many
+BATCH_SIZE = 50
+# Time windows fetched ahead of the one being written in iter_unified
+STREAM_LOOKAHEAD = 1
+
+# History chunking: "adaptive" sizes archive requests by hours x variables toward
+# CHUNK_TARGET_VALUES values per response (~0.5-1 MB of JSON), in evenly sized pieces;
+# "year" splits at calendar years
+CHUNKING = os.environ.get("WEATHERAPP_CHUNKING", "adaptive")
+CHUNK_TARGET_VALUES = 100_000
+CHUNK_STRATEGIES = ("adaptive", "year")
+
+# Request planning (plan_requests): needs whose ranges are at most PLAN_MERGE_GAP_DAYS
+# apart are fetched as one range, and same-endpoint segments spanning at most
+# PLAN_COALESCE_DAYS are sent as one request even across the history/forecast split
+PLAN_MERGE_GAP_DAYS = 31
+PLAN_COALESCE_DAYS = 31
+
+# Client-side rate limits per endpoint host. Open-Meteo's free tier allows
+# 600 calls/min and 5000/hour, and long archive calls count as several.
+ENDPOINT_LIMITS: Dict[str, EndpointLimits] = {
+    urlsplit(OPEN_METEO_WEATHER_FORECAST).netloc: EndpointLimits(rate=1.0, burst=20, max_concurrency=8),
+    urlsplit(OPEN_METEO_WEATHER_ARCHIVE).netloc: EndpointLimits(rate=0.5, burst=10, max_concurrency=4),
+    urlsplit(OPEN_METEO_AIR_QUALITY).netloc: EndpointLimits(rate=1.0, burst=20, max_concurrency=8),
+}
+DEFAULT_LIMITS = EndpointLimits(rate=1.0, burst=20, max_concurrency=8)
+# AIMD: multiply the in-flight limit by this on 429/503, grow by ~1 per window of successes
+CONCURRENCY_BACKOFF = 0.5
+THROTTLE_STATUS = frozenset({429, 503})
+
+# HTTP transport defaults (seconds / attempts)
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 90.0
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Segment cache: archive data older than this is final and cached forever;
+# anything newer (still being backfilled) or forecast data expires at the next
+# expected update of its endpoint (FORECAST_TTL for hosts without a cadence)
+CACHE_ENABLED = os.environ.get("WEATHERAPP_CACHE", "1") != "0"
+ARCHIVE_SETTLE_DAYS = 7
+FORECAST_TTL = 900.0
+UPDATE_CADENCE: Dict[str, UpdateCadence] = {
+    # best_match blends hourly (HRRR, ICON-D2) and 6-hourly (GFS, IFS) runs
+    urlsplit(OPEN_METEO_WEATHER_FORECAST).netloc: UpdateCadence(period_hours=1.0, offset_hours=0.25),
+    # CAMS forecasts, twice a day
+    urlsplit(OPEN_METEO_AIR_QUALITY).netloc: UpdateCadence(period_hours=12.0, offset_hours=1.0),
+    # the last ARCHIVE_SETTLE_DAYS are backfilled once a day
+    urlsplit(OPEN_METEO_WEATHER_ARCHIVE).netloc: UpdateCadence(period_hours=24.0, offset_hours=2.0),
+}
+# Expired entries are served for up to STALE_GRACE seconds past expiry while one
+# background refresh (REFRESH_WORKERS threads in total) replaces them
+STALE_GRACE = 6 * 3600.0
+REFRESH_WORKERS = 2
+
+# Local history store consulted before the archive API; settled archive segments
+# are written to it after they are fetched. HISTORY_STORE picks the backend:
+# "lake" (lake.HistoryLake, Parquet) or "arrays" (arraystore.HistoryArrayStore, memmaps)
+LAKE_ENABLED = os.environ.get("WEATHERAPP_LAKE", "1") != "0"
+HISTORY_STORE = os.environ.get("WEATHERAPP_HISTORY_STORE", "lake")
+HISTORY_STORES = ("lake", "arrays")
+
+# Store cached segments in a packed columnar form (raw float64 buffers) so cache
+# hits decode with np.frombuffer instead of parsing JSON number by number
+COLUMNAR_CACHE = True
+PACK_MAGIC = b"OMC1"
+
+# Location snapping: H3 resolution 7 cells average ~5 km^2, about the size of a
+# high-resolution model grid cell; GRID_DEGREES is the alternative fixed grid
+H3_RESOLUTION = 7
+GRID_DEGREES = 0.05
+SNAP_DECIMALS = 5
+
+# Result shapes accepted by fetch_unified(output=...) and their time column names
+OUTPUT_FORMATS = ("rows", "columns", "arrow")
+TIME_COLUMNS = {"hourly": "timestamp_utc", "daily": "date"}
+TIME_STEPS = {"hourly": np.timedelta64(1, "h"), "daily": np.timedelta64(1, "D")}
+# Units of variables Open-Meteo sends as JSON integers; merged columns are float64
+# (NaN gaps), so rows output turns their values back into ints
+INTEGER_UNITS = frozenset({"%", "\N{DEGREE SIGN}", "WMO code", "USAQI", "ppm"})
+
 
 # Variable map (add more as needed)
 VARIABLES: Dict[str, VariableSpec] = {
@@ -466,10 +641,792 @@ def _parse_location(location: str) -> Tuple[float, float]:
     return float(lat_str.strip()), float(lon_str.strip())
 
 
-def _request(url: str, params: Dict) -> Dict:
-    resp = requests.get(url, params=params, timeout=90.0)
-    resp.raise_for_status()
-    return resp.json()
+def snap_location(lat: float, lon: float, method: Optional[str] = "h3",
+                  resolution: int = H3_RESOLUTION, grid_deg: float = GRID_DEGREES) -> Tuple[float, float]:
+    # Snap a point to the centre of its H3 cell or to a regular lat/lon grid, so nearby
+    # points share cache and coalescing keys. method=None returns the point unchanged.
+    if method is None or method == "none":
+        return lat, lon
+    if method == "h3":
+        import h3
+
+        cell = h3.latlng_to_cell(lat, lon, resolution)
+        snapped_lat, snapped_lon = h3.cell_to_latlng(cell)
+        return round(snapped_lat, SNAP_DECIMALS), round(snapped_lon, SNAP_DECIMALS)
+    if method == "grid":
+        return (round(round(lat / grid_deg) * grid_deg, SNAP_DECIMALS),
+                round(round(lon / grid_deg) * grid_deg, SNAP_DECIMALS))
+    raise ValueError("snap method must be 'h3', 'grid' or None")
+
+
+def normalize_location(location: str, method: Optional[str] = "h3",
+                       resolution: int = H3_RESOLUTION, grid_deg: float = GRID_DEGREES) -> str:
+    lat, lon = snap_location(*_parse_location(location), method=method,
+                             resolution=resolution, grid_deg=grid_deg)
+    return f"{lat},{lon}"
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, requests.HTTPError):
+        return exc.response is not None and exc.response.status_code in RETRY_STATUS
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout))
+
+
+def _retry_after(resp: requests.Response) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+_trace_listeners: List[Callable[[Union[SegmentTrace, MergeTrace]], None]] = []
+# A ContextVar rather than a thread-local so asyncio tasks each see their own trace
+_current_segment_trace: ContextVar[Optional[SegmentTrace]] = ContextVar("segment_trace", default=None)
+
+
+def add_trace_listener(fn: Callable[[Union[SegmentTrace, MergeTrace]], None]):
+    # fn is called with every SegmentTrace and MergeTrace, on the thread that produced it
+    _trace_listeners.append(fn)
+
+
+def remove_trace_listener(fn: Callable[[Union[SegmentTrace, MergeTrace]], None]):
+    _trace_listeners.remove(fn)
+
+
+def _emit(event: Union[SegmentTrace, MergeTrace]):
+    for fn in list(_trace_listeners):
+        fn(event)
+
+
+def _current_trace() -> Optional[SegmentTrace]:
+    return _current_segment_trace.get()
+
+
+def _trace_add(field: str, value: float):
+    trace = _current_trace()
+    if trace is not None:
+        setattr(trace, field, getattr(trace, field) + value)
+
+
+def _payload_rows(payload) -> int:
+    payloads = payload if isinstance(payload, list) else [payload]
+    return sum(len((p.get(kind) or {}).get("time", [])) for p in payloads for kind in TIME_COLUMNS)
+
+
+def _traced(trace: SegmentTrace, fn):
+    # Run fn with trace as the current trace, then emit it
+    token = _current_segment_trace.set(trace)
+    t0 = time.perf_counter()
+    try:
+        result = fn()
+        trace.rows = _payload_rows(result)
+        return result
+    except Exception as exc:
+        trace.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        trace.total_s = time.perf_counter() - t0
+        _current_segment_trace.reset(token)
+        _emit(trace)
+
+
+async def _traced_async(trace: SegmentTrace, coro_fn):
+    token = _current_segment_trace.set(trace)
+    t0 = time.perf_counter()
+    try:
+        result = await coro_fn()
+        trace.rows = _payload_rows(result)
+        return result
+    except BaseException as exc:  # includes cancellation
+        trace.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        trace.total_s = time.perf_counter() - t0
+        _current_segment_trace.reset(token)
+        _emit(trace)
+
+
+# urllib3 connections that report connect (DNS + TCP) and TLS handshake time to the current trace
+class _TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._tcp_s = time.perf_counter() - t0
+            _trace_add("connect_s", self._tcp_s)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self._tcp_s = time.perf_counter() - t0
+            _trace_add("connect_s", self._tcp_s)
+
+    def connect(self):
+        self._tcp_s = 0.0
+        t0 = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _trace_add("tls_s", max(0.0, time.perf_counter() - t0 - self._tcp_s))
+
+
+class _TimedHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPPool, "https": _TimedHTTPSPool}
+
+
+class HostGovernor:
+    # Token bucket (rate, burst) plus an AIMD limit on in-flight requests for one host.
+    # Throttle responses halve the limit and honour Retry-After; healthy ones grow it back.
+    def __init__(self, limits: EndpointLimits):
+        self.limits = limits
+        self._cond = threading.Condition()
+        self._tokens = float(limits.burst)
+        self._refilled = time.monotonic()
+        self._limit = float(limits.max_concurrency)
+        self._in_flight = 0
+        self._blocked_until = 0.0
+
+    @property
+    def concurrency_limit(self) -> int:
+        return int(self._limit)
+
+    def reserve(self) -> float:
+        # Non-blocking: take a slot and a token and return 0, or return seconds to wait
+        with self._cond:
+            now = time.monotonic()
+            self._tokens = min(self.limits.burst, self._tokens + (now - self._refilled) * self.limits.rate)
+            self._refilled = now
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._in_flight >= int(self._limit):
+                return 0.05
+            if self._tokens < 1.0:
+                return (1.0 - self._tokens) / self.limits.rate
+            self._tokens -= 1.0
+            self._in_flight += 1
+            return 0.0
+
+    def acquire(self):
+        while True:
+            wait = self.reserve()
+            if wait <= 0:
+                return
+            with self._cond:
+                self._cond.wait(min(wait, 1.0))
+
+    def release(self, status: Optional[int] = None, retry_after: Optional[float] = None):
+        with self._cond:
+            self._in_flight -= 1
+            if status in THROTTLE_STATUS:
+                self._limit = max(float(self.limits.min_concurrency), self._limit * CONCURRENCY_BACKOFF)
+                self._tokens = min(self._tokens, 0.0)
+                if retry_after is not None:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            elif status is not None and status < 500:
+                self._limit = min(float(self.limits.max_concurrency), self._limit + 1.0 / self._limit)
+            self._cond.notify_all()
+
+
+class HTTPTransport:
+    # Keep-alive session per endpoint host, with retry + jittered exponential backoff
+    # and a HostGovernor per host (limits=None disables client-side rate limiting)
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 max_attempts: int = MAX_ATTEMPTS, backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX, pool_size: int = MAX_WORKERS,
+                 limits: Optional[Dict[str, EndpointLimits]] = ENDPOINT_LIMITS,
+                 default_limits: EndpointLimits = DEFAULT_LIMITS):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.limits = limits
+        self.default_limits = default_limits
+        self._sessions: Dict[str, requests.Session] = {}
+        self._governors: Dict[str, HostGovernor] = {}
+        self._lock = threading.Lock()
+
+    def governor(self, url: str) -> Optional[HostGovernor]:
+        if self.limits is None:
+            return None
+        host = urlsplit(url).netloc
+        with self._lock:
+            gov = self._governors.get(host)
+            if gov is None:
+                gov = HostGovernor(self.limits.get(host, self.default_limits))
+                self._governors[host] = gov
+            return gov
+
+    def session(self, url: str) -> requests.Session:
+        host = urlsplit(url).netloc
+        with self._lock:
+            sess = self._sessions.get(host)
+            if sess is None:
+                sess = requests.Session()
+                adapter = _TimedAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                sess.mount("https://", adapter)
+                sess.mount("http://", adapter)
+                sess.headers["Accept-Encoding"] = "gzip, deflate"
+                self._sessions[host] = sess
+            return sess
+
+    def _retrying(self):
+        # tenacity (which loads asyncio) is imported with the first upstream request
+        from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+        return Retrying(
+            retry=retry_if_exception(_is_retryable),
+            wait=wait_random_exponential(multiplier=self.backoff_base, max=self.backoff_max),
+            stop=stop_after_attempt(self.max_attempts),
+            reraise=True,
+        )
+
+    def _get(self, url: str, params: Dict) -> requests.Response:
+        trace = _current_trace()
+        t0 = time.perf_counter()
+        gov = self.governor(url)
+        if gov is not None:
+            gov.acquire()
+        t1 = time.perf_counter()
+        handshake = (trace.connect_s + trace.tls_s) if trace is not None else 0.0
+        status = retry_after = None
+        try:
+            # stream=True returns at the headers, so time to first byte and transfer split here
+            resp = self.session(url).get(url, params=params, stream=True,
+                                         timeout=(self.connect_timeout, self.read_timeout))
+            t2 = time.perf_counter()
+            resp.content
+            t3 = time.perf_counter()
+            status, retry_after = resp.status_code, _retry_after(resp)
+            if trace is not None:
+                handshake = trace.connect_s + trace.tls_s - handshake
+                trace.attempts += 1
+                trace.status = status
+                trace.wait_s += t1 - t0
+                trace.ttfb_s += max(0.0, t2 - t1 - handshake)
+                trace.transfer_s += t3 - t2
+                trace.bytes += resp.raw.tell() or len(resp.content)
+            resp.raise_for_status()
+            return resp
+        finally:
+            if gov is not None:
+                gov.release(status, retry_after)
+
+    def fetch(self, url: str, params: Dict) -> bytes:
+        for attempt in self._retrying():
+            with attempt:
+                return self._get(url, params).content
+
+    def close(self):
+        with self._lock:
+            for sess in self._sessions.values():
+                sess.close()
+            self._sessions.clear()
+
+
+def _http_error(url: str, status: int, headers: Dict[str, str]) -> requests.HTTPError:
+    # The async transport raises the same error type as HTTPTransport, so callers and
+    # _is_retryable / _retry_after treat both alike
+    resp = requests.Response()
+    resp.status_code = status
+    resp.url = url
+    resp.headers.update(headers)
+    return requests.HTTPError(f"{status} Error for url: {url}", response=resp)
+
+
+class AsyncHTTPTransport:
+    # Non-blocking counterpart of HTTPTransport on tornado's AsyncHTTPClient (one client per
+    # event loop) with the same retry policy and per-host HostGovernor limits.
+    # Tornado's simple client opens a new connection per request (no keep-alive).
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 max_attempts: int = MAX_ATTEMPTS, backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX, max_clients: int = 100,
+                 limits: Optional[Dict[str, EndpointLimits]] = ENDPOINT_LIMITS,
+                 default_limits: EndpointLimits = DEFAULT_LIMITS):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_clients = max_clients
+        self.limits = limits
+        self.default_limits = default_limits
+        self._clients = WeakKeyDictionary()
+        self._governors: Dict[str, HostGovernor] = {}
+        self._lock = threading.Lock()
+
+    def governor(self, url: str) -> Optional[HostGovernor]:
+        if self.limits is None:
+            return None
+        host = urlsplit(url).netloc
+        with self._lock:
+            gov = self._governors.get(host)
+            if gov is None:
+                gov = HostGovernor(self.limits.get(host, self.default_limits))
+                self._governors[host] = gov
+            return gov
+
+    def client(self):
+        import asyncio
+        from tornado.httpclient import AsyncHTTPClient
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = AsyncHTTPClient(force_instance=True, max_clients=self.max_clients)
+            self._clients[loop] = client
+        return client
+
+    async def _get(self, url: str) -> bytes:
+        import asyncio
+        from tornado.simple_httpclient import HTTPTimeoutError
+
+        trace = _current_trace()
+        t0 = time.perf_counter()
+        gov = self.governor(url)
+        if gov is not None:
+            while (wait := gov.reserve()) > 0:
+                await asyncio.sleep(min(wait, 1.0))
+        t1 = time.perf_counter()
+        status = retry_after = None
+        try:
+            try:
+                resp = await self.client().fetch(url, raise_error=False, decompress_response=True,
+                                                 connect_timeout=self.connect_timeout,
+                                                 request_timeout=self.read_timeout)
+            except HTTPTimeoutError as exc:
+                raise requests.Timeout(str(exc)) from exc
+            except OSError as exc:
+                raise requests.ConnectionError(str(exc)) from exc
+            if resp.code == 599:
+                # tornado reports timeouts and connection failures alike as 599
+                if isinstance(resp.error, HTTPTimeoutError):
+                    raise requests.Timeout(str(resp.error))
+                raise requests.ConnectionError(str(resp.error))
+            status = resp.code
+            error = _http_error(url, status, dict(resp.headers)) if status >= 400 else None
+            if error is not None:
+                retry_after = _retry_after(error.response)
+            if trace is not None:
+                # tornado reports no phase split; the whole exchange is booked as ttfb
+                trace.attempts += 1
+                trace.status = status
+                trace.wait_s += t1 - t0
+                trace.ttfb_s += time.perf_counter() - t1
+                trace.bytes += len(resp.body or b"")
+            if error is not None:
+                raise error
+            return resp.body
+        finally:
+            if gov is not None:
+                gov.release(status, retry_after)
+
+    async def fetch(self, url: str, params: Dict) -> bytes:
+        from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+        full = f"{url}?{urlencode(params, doseq=True)}"
+        async for attempt in AsyncRetrying(
+            retry=retry_if_exception(_is_retryable),
+            wait=wait_random_exponential(multiplier=self.backoff_base, max=self.backoff_max),
+            stop=stop_after_attempt(self.max_attempts),
+            reraise=True,
+        ):
+            with attempt:
+                return await self._get(full)
+
+    def close(self):
+        for client in list(self._clients.values()):
+            client.close()
+        self._clients.clear()
+
+
+_transport = HTTPTransport()
+_async_transport: Optional[AsyncHTTPTransport] = None
+
+
+def get_transport() -> HTTPTransport:
+    return _transport
+
+
+def get_async_transport() -> AsyncHTTPTransport:
+    global _async_transport
+    if _async_transport is None:
+        _async_transport = AsyncHTTPTransport()
+    return _async_transport
+
+
+def set_async_transport(transport: Optional[AsyncHTTPTransport]) -> Optional[AsyncHTTPTransport]:
+    global _async_transport
+    previous, _async_transport = _async_transport, transport
+    return previous
+
+
+def set_transport(transport: HTTPTransport) -> HTTPTransport:
+    # Swap the process-wide transport (e.g. for stubs or custom timeouts); returns the old one
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
+
+
+_segment_cache: Optional[segment_cache.SegmentCache] = None
+_segment_cache_lock = threading.Lock()
+
+
+def get_segment_cache() -> Optional[segment_cache.SegmentCache]:
+    global _segment_cache
+    if _segment_cache is None and CACHE_ENABLED:
+        with _segment_cache_lock:
+            if _segment_cache is None:
+                _segment_cache = segment_cache.SegmentCache()
+    return _segment_cache
+
+
+def set_segment_cache(cache: Optional[segment_cache.SegmentCache]):
+    # Pass None together with CACHE_ENABLED = False to disable disk caching
+    global _segment_cache
+    _segment_cache = cache
+
+
+_history_store = None
+_history_store_lock = threading.Lock()
+
+
+def get_history_store():
+    global _history_store
+    if _history_store is None and LAKE_ENABLED:
+        with _history_store_lock:
+            if _history_store is None:
+                if HISTORY_STORE == "arrays":
+                    import arraystore
+
+                    _history_store = arraystore.HistoryArrayStore()
+                elif HISTORY_STORE == "lake":
+                    import lake
+
+                    _history_store = lake.HistoryLake()
+                else:
+                    raise ValueError(f"HISTORY_STORE must be one of: {', '.join(HISTORY_STORES)}")
+    return _history_store
+
+
+def set_history_store(store):
+    # Any object with coverage/read/write like lake.HistoryLake or arraystore.HistoryArrayStore;
+    # None with LAKE_ENABLED = False disables it
+    global _history_store
+    previous, _history_store = _history_store, store
+    return previous
+
+
+def _settled_before(now: datetime) -> datetime:
+    # First day whose archive data may still change
+    cut = now - timedelta(days=ARCHIVE_SETTLE_DAYS)
+    return datetime(cut.year, cut.month, cut.day, tzinfo=UTC)
+
+
+def next_update(url: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    # Next expected data update of url's endpoint after now, per UPDATE_CADENCE
+    cadence = UPDATE_CADENCE.get(urlsplit(url).netloc)
+    if cadence is None:
+        return None
+    now = now or datetime.now(UTC)
+    first = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(hours=cadence.offset_hours)
+    period = timedelta(hours=cadence.period_hours)
+    return first + ((now - first) // period + 1) * period
+
+
+def _segment_expiry(url: str, end: datetime, is_history: bool) -> Optional[float]:
+    now = datetime.now(UTC)
+    if is_history and end < _settled_before(now):
+        return None
+    update = next_update(url, now)
+    return update.timestamp() if update is not None else now.timestamp() + FORECAST_TTL
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution of fn and its result
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn):
+        with self._lock:
+            fut = self._calls.get(key)
+            leader = fut is None
+            if leader:
+                fut = Future()
+                self._calls[key] = fut
+        if not leader:
+            return fut.result()
+        try:
+            result = fn()
+        except BaseException as exc:
+            fut.set_exception(exc)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight:
+    # SingleFlight for coroutines on one event loop. The shared task is cancelled only
+    # when every caller waiting on it has been cancelled.
+    def __init__(self):
+        self._calls: Dict[Tuple, list] = {}
+
+    async def do(self, key: str, fn):
+        import asyncio
+
+        slot = (asyncio.get_running_loop(), key)
+        entry = self._calls.get(slot)
+        if entry is None:
+            task = asyncio.ensure_future(fn())
+            entry = self._calls[slot] = [task, 0]
+            task.add_done_callback(lambda _: self._calls.pop(slot, None))
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+
+_flights = SingleFlight()
+_refresh_pool: Optional[ThreadPoolExecutor] = None
+_refreshing: set = set()
+_refresh_lock = threading.Lock()
+_async_flights = AsyncSingleFlight()
+
+
+def _json_loads(body: bytes):
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def _as_float_array(values) -> Optional[np.ndarray]:
+    # None -> NaN inside numpy; strings (or an all-None column of unknown type) -> None
+    try:
+        arr = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+    if arr.size and not isinstance(values, np.ndarray) and all(v is None for v in values):
+        return None
+    return arr
+
+
+def _pack(payload: Dict) -> bytes:
+    # Columnar cache encoding: magic, header length, JSON header (metadata, units, string
+    # columns, buffer layout) and then raw float64 / datetime64 buffers for each column.
+    header = {k: v for k, v in payload.items() if k not in TIME_COLUMNS}
+    layout: Dict[str, Dict] = {}
+    buffers: List[bytes] = []
+    offset = 0
+    for kind in TIME_COLUMNS:
+        block = payload.get(kind)
+        if not isinstance(block, dict):
+            continue
+        layout[kind] = {}
+        for name, values in block.items():
+            if name == "time":
+                arr = np.asarray(values, dtype="datetime64[s]")
+            else:
+                arr = _as_float_array(values)
+            if arr is None:
+                layout[kind][name] = {"values": list(values)}
+                continue
+            raw = arr.tobytes()
+            layout[kind][name] = {"dtype": arr.dtype.str, "offset": offset, "length": len(arr)}
+            buffers.append(raw)
+            offset += len(raw)
+    header["_layout"] = layout
+    head = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return PACK_MAGIC + len(head).to_bytes(4, "little") + head + b"".join(buffers)
+
+
+def _unpack(body: bytes) -> Dict:
+    size = int.from_bytes(body[4:8], "little")
+    payload = _json_loads(body[8:8 + size])
+    data = memoryview(body)[8 + size:]
+    for kind, columns in payload.pop("_layout").items():
+        block = {}
+        for name, col in columns.items():
+            if "values" in col:
+                block[name] = col["values"]
+            else:
+                # read-only views on the body; the merge copies what it keeps
+                block[name] = np.frombuffer(data, dtype=np.dtype(col["dtype"]),
+                                            count=col["length"], offset=col["offset"])
+        payload[kind] = block
+    return payload
+
+
+def _decode(body: bytes) -> Dict:
+    if body[:4] == PACK_MAGIC:
+        return _unpack(body)
+    return _json_loads(body)
+
+
+def _encode_for_cache(payload: Dict, body: Optional[bytes] = None) -> bytes:
+    if COLUMNAR_CACHE and isinstance(payload, dict):
+        return _pack(payload)
+    return body if body is not None else json.dumps(payload).encode("utf-8")
+
+
+def _set_cache_outcome(outcome: str):
+    trace = _current_trace()
+    if trace is not None:
+        trace.cache = outcome
+
+
+def _timed_decode(body: bytes) -> Dict:
+    t0 = time.perf_counter()
+    try:
+        return _decode(body)
+    finally:
+        _trace_add("decode_s", time.perf_counter() - t0)
+
+
+def _store_fresh(cache: segment_cache.SegmentCache, key: str, url: str, params: Dict,
+                 expires_at: Optional[float], is_history: bool, outcome: str) -> Dict:
+    # Fetch a segment upstream and replace its cache entry, whatever state the entry is in
+    trace = SegmentTrace(url, params["start_date"], params["end_date"], is_history,
+                         len(segment_cache.coverage_variables(params)), cache=outcome)
+
+    def run() -> Dict:
+        body = _transport.fetch(url, params)
+        t0 = time.perf_counter()
+        payload = _json_loads(body)
+        _trace_add("decode_s", time.perf_counter() - t0)
+        cache.put(key, _encode_for_cache(payload, body), expires_at, url=url, params=params)
+        return payload
+
+    return _traced(trace, run)
+
+
+def _refresh(key: str, url: str, params: Dict, expires_at: Optional[float], is_history: bool):
+    try:
+        cache = get_segment_cache()
+        if cache is not None:
+            _flights.do(f"refresh:{key}", lambda: _store_fresh(cache, key, url, params, expires_at,
+                                                               is_history, "refresh"))
+    except Exception:
+        pass  # the stale entry stays; the next request past its expiry tries again
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(key)
+
+
+def _schedule_refresh(key: str, url: str, params: Dict, expires_at: Optional[float], is_history: bool):
+    # At most one queued or running refresh per key
+    global _refresh_pool
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+        if _refresh_pool is None:
+            _refresh_pool = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="segment-refresh")
+        pool = _refresh_pool
+    pool.submit(_refresh, key, url, params, expires_at, is_history)
+
+
+def _cached_body(cache: segment_cache.SegmentCache, key: str, url: str, params: Dict,
+                 expires_at: Optional[float], is_history: bool) -> Optional[bytes]:
+    # Fresh entry, or an expired one within STALE_GRACE (refreshed in the background); else None
+    entry = cache.lookup(key)
+    if entry is None:
+        return None
+    body, stored_expiry = entry
+    now = time.time()
+    if stored_expiry is None or stored_expiry > now:
+        _set_cache_outcome("hit")
+        return body
+    if now - stored_expiry > STALE_GRACE:
+        return None
+    _set_cache_outcome("stale")
+    _schedule_refresh(key, url, params, expires_at, is_history)
+    return body
+
+
+def _request(url: str, params: Dict, expires_at: Optional[float] = None, is_history: bool = False) -> Dict:
+    cache = get_segment_cache()
+    key = segment_cache.make_key(url, params)
+    fetched: List[Dict] = []
+
+    def load() -> bytes:
+        body = _cached_body(cache, key, url, params, expires_at, is_history) if cache is not None else None
+        if body is not None:
+            return body
+        _set_cache_outcome("miss" if cache is not None else "off")
+        body = _transport.fetch(url, params)
+        # the leader keeps the payload it decoded; the cache gets it packed
+        fetched.append(_timed_decode(body))
+        if cache is not None:
+            body = _encode_for_cache(fetched[0], body)
+            cache.put(key, body, expires_at, url=url, params=params)
+        return body
+
+    # Identical in-flight requests (e.g. many sessions missing at once) share one upstream call;
+    # every waiter decodes its own copy of the body. Only the leader runs load().
+    _set_cache_outcome("coalesced")
+    body = _flights.do(key, load)
+    return fetched[0] if fetched else _timed_decode(body)
+
+
+async def _request_async(url: str, params: Dict, expires_at: Optional[float] = None,
+                         is_history: bool = False) -> Dict:
+    # _request on the event loop; cache reads and writes, decoding and packing run in
+    # worker threads so large archive bodies don't stall other fetches
+    import asyncio
+
+    cache = get_segment_cache()
+    key = segment_cache.make_key(url, params)
+    fetched: List[Dict] = []
+
+    async def load() -> bytes:
+        body = None
+        if cache is not None:
+            body = await asyncio.to_thread(_cached_body, cache, key, url, params, expires_at, is_history)
+        if body is not None:
+            return body
+        _set_cache_outcome("miss" if cache is not None else "off")
+        body = await get_async_transport().fetch(url, params)
+        fetched.append(await asyncio.to_thread(_timed_decode, body))
+        if cache is not None:
+            body = await asyncio.to_thread(_encode_for_cache, fetched[0], body)
+            await asyncio.to_thread(cache.put, key, body, expires_at, url=url, params=params)
+        return body
+
+    _set_cache_outcome("coalesced")
+    body = await _async_flights.do(key, load)
+    return fetched[0] if fetched else await asyncio.to_thread(_timed_decode, body)
 
 
 def _year_chunks(start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
@@ -496,12 +1453,43 @@ def _year_chunks(start: datetime, end: datetime) -> List[Tuple[datetime, datetim
     return merged
 
 
-def _fetch_segment(lat: float, lon: float, spec: List[VariableSpec],
-                    start: datetime, end: datetime, is_history: bool, url: str) -> Dict:
+def _values_per_day(spec: List[VariableSpec]) -> int:
+    return sum(24 if s.param_kind == "hourly" else 1 for s in spec)
+
+
+def _adaptive_chunks(start: datetime, end: datetime, values_per_day: int,
+                     target: int = CHUNK_TARGET_VALUES) -> List[Tuple[datetime, datetime]]:
+    # Fewest pieces of at most ~target values each, with day counts differing by at most one.
+    # Inner boundaries fall on midnight; the outer ones keep start's and end's time of day
+    # (a one-day first chunk ends no earlier than it starts).
+    first = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    days = (end.date() - start.date()).days + 1
+    pieces = min(days, max(1, -(-days * values_per_day // max(1, target))))
+    size, extra = divmod(days, pieces)
+    chunks: List[Tuple[datetime, datetime]] = []
+    offset = 0
+    for i in range(pieces):
+        n = size + (i < extra)
+        chunks.append((first + timedelta(days=offset), first + timedelta(days=offset + n - 1)))
+        offset += n
+    chunks[0] = (start, max(start, chunks[0][1]))
+    chunks[-1] = (chunks[-1][0], end)
+    return chunks
+
 
+def _chunks(start: datetime, end: datetime, values_per_day: int) -> List[Tuple[datetime, datetime]]:
+    if CHUNKING == "adaptive":
+        return _adaptive_chunks(start, end, values_per_day)
+    if CHUNKING == "year":
+        return _year_chunks(start, end)
+    raise ValueError(f"CHUNKING must be one of: {', '.join(CHUNK_STRATEGIES)}")
+
+
+def _segment_params(lat: str, lon: str, spec: List[VariableSpec],
+                    start: datetime, end: datetime, is_history: bool) -> Dict:
     params = {
-        "latitude": f"{lat}",
-        "longitude": f"{lon}",
+        "latitude": lat,
+        "longitude": lon,
         "timezone": "UTC",
         "start_date": start.strftime("%Y-%m-%d"),
         "end_date": end.strftime("%Y-%m-%d"),
@@ -520,38 +1508,206 @@ def _fetch_segment(lat: float, lon: float, spec: List[VariableSpec],
         params['hourly'] = hourly_vars
     if len(daily_vars) > 0:
         params['daily'] = daily_vars
-    return _request(url, params)
+    return params
+
+
+def _fetch_segment(lat: float, lon: float, spec: List[VariableSpec],
+                    start: datetime, end: datetime, is_history: bool, url: str) -> Dict:
+    params = _segment_params(f"{lat}", f"{lon}", spec, start, end, is_history)
+    trace = SegmentTrace(url, params["start_date"], params["end_date"], is_history, len(spec))
+    expires_at = _segment_expiry(url, end, is_history)
+    return _traced(trace, lambda: _request(url, params, expires_at=expires_at, is_history=is_history))
 
 
-def _merge_results(spec: List[VariableSpec], parts: List[Dict]) -> Dict:
+async def _fetch_segment_async(lat: float, lon: float, seg: Segment) -> Dict:
+    params = _segment_params(f"{lat}", f"{lon}", list(seg.specs), seg.start, seg.end, seg.is_history)
+    trace = SegmentTrace(seg.url, params["start_date"], params["end_date"], seg.is_history, len(seg.specs))
+    expires_at = _segment_expiry(seg.url, seg.end, seg.is_history)
+    return await _traced_async(trace, lambda: _request_async(seg.url, params, expires_at=expires_at,
+                                                             is_history=seg.is_history))
+
+
+def _fetch_segment_many(coords: List[Tuple[float, float]], seg: Segment) -> List[Dict]:
+    # One multi-coordinate request for the locations not already cached (fresh, or stale
+    # and refreshed in the background as in _request). Responses are cached per location,
+    # so batch and single-location fetches share entries.
+    trace = SegmentTrace(seg.url, seg.start.strftime("%Y-%m-%d"), seg.end.strftime("%Y-%m-%d"),
+                         seg.is_history, len(seg.specs), locations=len(coords))
+    return _traced(trace, lambda: _load_segment_many(coords, seg))
+
+
+def _load_segment_many(coords: List[Tuple[float, float]], seg: Segment) -> List[Dict]:
+    cache = get_segment_cache()
+    expires_at = _segment_expiry(seg.url, seg.end, seg.is_history)
+    results: List[Optional[Dict]] = [None] * len(coords)
+    pending: List[Tuple[int, Dict]] = []
+    for i, (lat, lon) in enumerate(coords):
+        params = _segment_params(f"{lat}", f"{lon}", list(seg.specs), seg.start, seg.end, seg.is_history)
+        body = None
+        if cache is not None:
+            body = _cached_body(cache, segment_cache.make_key(seg.url, params), seg.url, params,
+                                expires_at, seg.is_history)
+        if body is not None:
+            results[i] = _timed_decode(body)
+        else:
+            pending.append((i, params))
+
+    if pending:
+        _set_cache_outcome("miss" if cache is not None else "off")
+        params = dict(pending[0][1])
+        params["latitude"] = ",".join(p["latitude"] for _, p in pending)
+        params["longitude"] = ",".join(p["longitude"] for _, p in pending)
+        key = segment_cache.make_key(seg.url, params)
+        body = _flights.do(key, lambda: _transport.fetch(seg.url, params))
+        t0 = time.perf_counter()
+        payloads = _json_loads(body)
+        _trace_add("decode_s", time.perf_counter() - t0)
+        # Open-Meteo answers a single coordinate with an object, several with a list
+        payloads = payloads if isinstance(payloads, list) else [payloads]
+        if len(payloads) != len(pending):
+            raise RuntimeError(f"Expected {len(pending)} locations from {seg.url}, got {len(payloads)}")
+        for (i, single), item in zip(pending, payloads):
+            results[i] = item
+            if cache is not None:
+                cache.put(segment_cache.make_key(seg.url, single), _encode_for_cache(item),
+                          expires_at, url=seg.url, params=single)
+    return results
+
+
+def _fetch_segments(lat: float, lon: float, segments: List[Segment],
+                    max_workers: Optional[int] = None) -> List[Dict]:
+    workers = MAX_WORKERS if max_workers is None else max_workers
+    workers = min(workers, len(segments))
+
+    def fetch(seg: Segment) -> Dict:
+        return _fetch_segment(lat, lon, list(seg.specs), seg.start, seg.end,
+                              is_history=seg.is_history, url=seg.url)
+
+    if workers <= 1:
+        return [fetch(seg) for seg in segments]
+    # map() yields in submission order, so the merge order matches the plan
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fetch, segments))
+
+
+def _empty_column(spec: VariableSpec, n: int) -> np.ndarray:
+    if spec.default_unit == "iso8601":
+        return np.full(n, None, dtype=object)
+    return np.full(n, np.nan, dtype=np.float64)
+
+
+def _part_values(spec: VariableSpec, values, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Returns (values, present-mask) of exactly n entries for one part's column
+    if spec.default_unit == "iso8601":
+        vals = np.empty(n, dtype=object)
+        m = min(n, len(values))
+        vals[:m] = values[:m]
+        return vals, np.not_equal(vals, None)
+    vals = np.full(n, np.nan, dtype=np.float64)
+    m = min(n, len(values))
+    vals[:m] = np.asarray(values[:m], dtype=np.float64)
+    return vals, ~np.isnan(vals)
+
+
+def _source_ranges(owner: np.ndarray, times: np.ndarray, labels: List[str], kind: str) -> List[Dict]:
+    # Run-length encode the owning part per row, folding adjacent runs from the same source
+    ranges: List[Dict] = []
+    if len(owner) == 0:
+        return ranges
+    unit = "m" if kind == "hourly" else "D"
+    breaks = np.flatnonzero(np.diff(owner)) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(owner)]))
+    for a, b in zip(starts, ends):
+        if owner[a] < 0:
+            continue
+        label = labels[owner[a]]
+        start = str(np.datetime_as_string(times[a], unit=unit))
+        end = str(np.datetime_as_string(times[b - 1], unit=unit))
+        if ranges and ranges[-1]["source"] == label and ranges[-1]["_stop"] == a:
+            ranges[-1].update(end=end, rows=ranges[-1]["rows"] + int(b - a), _stop=b)
+        else:
+            ranges.append({"source": label, "start": start, "end": end, "rows": int(b - a), "_stop": b})
+    for r in ranges:
+        del r["_stop"]
+    return ranges
+
+
+def _merge_results(spec: List[VariableSpec], parts: List[Dict], labels: Optional[List[str]] = None,
+                   window: Optional[Tuple[datetime, datetime]] = None) -> Dict:
+    # Align every part onto one time axis per kind. Hourly/daily data sits on a
+    # regular grid, so a row's slot is (t - t0) // step and the merge is O(total rows).
+    # Earlier parts win where parts overlap; later parts only fill their gaps.
+    # window=(lo, hi) keeps only times in [lo, hi), for parts that span more than was asked.
     if not parts:
         return {}
-    # Initialize with first part
-    base = {k: v for k, v in parts[0].items()}
-    keys = ['hourly', 'daily']
-    units_keys = ['hourly_units', 'daily_units']
-
-    for key in keys:
-        if key not in base:
-            base[key] = {}
-    for units_key in units_keys:
-        if units_key not in base:
-            base[units_key] = {}
-    # Merge others
-    for p in parts[1:]:
-        for key in keys:
-            if key in p:
-                for k, arr in p[key].items():
-                    if k in base[key]:
-                        base[key][k].extend(arr)
-                    else:
-                        base[key][k] = list(arr)
-                    if k == 'time':
-                        base[key][k] = list(dict.fromkeys(base[key][k])) # only keep new unique times, could be faster?
-        for units_key in units_keys:
-            if units_key in p:
-                base[units_key].update(p[units_key])
-    return base
+    started = time.perf_counter()
+    labels = labels or [str(i) for i in range(len(parts))]
+    merged: Dict = {"sources": {}}
+    if window is not None:
+        lo, hi = (np.datetime64(w.replace(tzinfo=None), "s") for w in window)
+
+    for kind in TIME_COLUMNS:
+        kind_spec = [s for s in spec if s.param_kind == kind]
+        names = {"time"} | {s.api_var_name for s in kind_spec}
+        units_key = f"{kind}_units"
+        merged[units_key] = {}
+        for p in parts:
+            merged[units_key].update({k: u for k, u in (p.get(units_key) or {}).items() if k in names})
+
+        # Stored parts may carry other variables; skip blocks with none of ours
+        blocks = [(i, p[kind]) for i, p in enumerate(parts)
+                  if p.get(kind) and any(s.api_var_name in p[kind] for s in kind_spec)]
+        full_times = [np.asarray(b.get("time", []), dtype="datetime64[s]") for _, b in blocks]
+        if window is not None:
+            keep = [(t >= lo) & (t < hi) for t in full_times]
+        else:
+            keep = [np.ones(len(t), dtype=bool) for t in full_times]
+        part_times = [t[k] for t, k in zip(full_times, keep)]
+        if not any(len(t) for t in part_times):
+            merged[kind] = {}
+            merged["sources"][kind] = []
+            continue
+
+        step = TIME_STEPS[kind]
+        t0 = min(t.min() for t in part_times if len(t))
+        t1 = max(t.max() for t in part_times if len(t))
+        if all(((t - t0) % step == np.timedelta64(0, "s")).all() for t in part_times):
+            axis = np.arange(t0, t1 + step, step)
+            slots = [((t - t0) // step).astype(np.int64) for t in part_times]
+        else:
+            axis = np.unique(np.concatenate(part_times))
+            slots = [np.searchsorted(axis, t) for t in part_times]
+
+        n = len(axis)
+        covered = np.zeros(n, dtype=bool)
+        owner = np.full(n, -1, dtype=np.int64)
+        columns = {s.api_var_name: _empty_column(s, n) for s in kind_spec}
+        missing = {s.api_var_name: np.ones(n, dtype=bool) for s in kind_spec}
+
+        for (i, block), idx, k in zip(blocks, slots, keep):
+            covered[idx] = True
+            filled = np.zeros(len(idx), dtype=bool)
+            for s in kind_spec:
+                name = s.api_var_name
+                if name not in block:
+                    continue
+                vals, present = _part_values(s, block[name], len(k))
+                vals, present = vals[k], present[k]
+                take = present & missing[name][idx]
+                columns[name][idx[take]] = vals[take]
+                missing[name][idx[take]] = False
+                filled |= take
+            claim = idx[filled & (owner[idx] < 0)]
+            owner[claim] = i
+
+        times = axis[covered]
+        merged[kind] = {"time": times} | {name: col[covered] for name, col in columns.items()}
+        merged["sources"][kind] = _source_ranges(owner[covered], times, labels, kind)
+    if _trace_listeners:
+        rows = sum(len(merged[kind].get("time", [])) for kind in TIME_COLUMNS)
+        _emit(MergeTrace(parts=len(parts), rows=rows, seconds=time.perf_counter() - started))
+    return merged
 
 def _split_vars_by_urls(vars: List[VariableSpec], is_history: bool):
     split_vars = {}
@@ -563,7 +1719,333 @@ def _split_vars_by_urls(vars: List[VariableSpec], is_history: bool):
             split_vars[url] = [v]
     return split_vars
 
-def fetch_unified(variable: str, location: str, mode: str, start_date: str, end_date: str) -> Dict:
+def _plan_segments(spec: List[VariableSpec], want_history: bool, want_forecast: bool,
+                   s: datetime, e: datetime, today: datetime) -> List[Segment]:
+    segments: List[Segment] = []
+
+    # Historical segment(s)
+    if want_history and s < today:
+        split_vars_hist = _split_vars_by_urls(spec, is_history=True)
+        hist_end = min(e, today - timedelta(days=1))
+        # Split at the settle boundary so the older part is cached permanently
+        settled = _settled_before(today)
+        ranges = [(s, min(hist_end, settled - timedelta(days=1))), (max(s, settled), hist_end)]
+        # Chunks are sized for the heaviest endpoint so every endpoint shares the same
+        # boundaries (iter_unified streams one window per boundary pair)
+        per_day = max(_values_per_day(vars) for vars in split_vars_hist.values())
+        for lo, hi in ranges:
+            if lo > hi:
+                continue
+            for cs, ce in _chunks(lo, hi, per_day):
+                for url, vars in split_vars_hist.items():
+                    segments.append(Segment(url, tuple(vars), cs, ce, is_history=True))
+
+    # Forecast segment
+    if want_forecast and e >= today:
+        split_vars_fc = _split_vars_by_urls(spec, is_history=False)
+        fc_start = max(s, today)
+        if fc_start <= e:
+            for url, vars in split_vars_fc.items():
+                segments.append(Segment(url, tuple(vars), fc_start, e, is_history=False))
+
+    return segments
+
+def _coalesce_segments(segments: List[Segment]) -> List[Segment]:
+    # Join adjacent segments for the same endpoint and variables into one short request.
+    # A joined segment is only history (cached for good) if all of its pieces were.
+    limit = timedelta(days=PLAN_COALESCE_DAYS)
+    out: List[Segment] = []
+    for seg in sorted(segments, key=lambda g: (g.url, g.specs, g.start)):
+        prev = out[-1] if out else None
+        if (prev is not None and prev.url == seg.url and prev.specs == seg.specs
+                and seg.start <= prev.end + timedelta(days=1) and max(prev.end, seg.end) - prev.start <= limit):
+            out[-1] = Segment(seg.url, seg.specs, prev.start, max(prev.end, seg.end),
+                              is_history=prev.is_history and seg.is_history)
+        else:
+            out.append(seg)
+    return out
+
+
+def plan_requests(needs: List[DataNeed], today: Optional[datetime] = None) -> List[Segment]:
+    # Smallest set of segments covering every need: close ranges are merged and
+    # fetched for the union of their variables, one request per endpoint and range.
+    today = today or datetime.now(UTC)
+    resolved = []
+    for need in needs:
+        _, spec = _resolve_spec(need.variable)
+        s, e = _parse_dates(need.start_date, need.end_date)
+        _, want_history, want_forecast = _parse_mode(need.mode)
+        resolved.append((s, e, spec, want_history, want_forecast))
+
+    groups: List[List] = []
+    for s, e, spec, want_history, want_forecast in sorted(resolved, key=lambda r: r[0]):
+        if groups and s <= groups[-1][1] + timedelta(days=PLAN_MERGE_GAP_DAYS):
+            group = groups[-1]
+            group[1] = max(group[1], e)
+            group[2].update(dict.fromkeys(spec))
+            group[3] |= want_history
+            group[4] |= want_forecast
+        else:
+            groups.append([s, e, dict.fromkeys(spec), want_history, want_forecast])
+
+    segments: List[Segment] = []
+    for s, e, specs, want_history, want_forecast in groups:
+        segments += _coalesce_segments(_plan_segments(list(specs), want_history, want_forecast, s, e, today))
+    return segments
+
+
+def refresh_due(location: str, segments: List[Segment], within: float = 0.0,
+                now: Optional[float] = None) -> List[Tuple[float, Segment]]:
+    # (due time, segment) for segments whose cache entry is missing or expires within
+    # `within` seconds; settled history never expires and is skipped
+    cache = get_segment_cache()
+    if cache is None:
+        return []
+    lat, lon = _parse_location(location)
+    now = time.time() if now is None else now
+    due = []
+    for seg in segments:
+        if _segment_expiry(seg.url, seg.end, seg.is_history) is None:
+            continue
+        params = _segment_params(f"{lat}", f"{lon}", list(seg.specs), seg.start, seg.end, seg.is_history)
+        found, expires_at = cache.expiry(segment_cache.make_key(seg.url, params))
+        if not found:
+            due.append((now, seg))
+        elif expires_at is not None and expires_at <= now + within:
+            due.append((expires_at, seg))
+    return due
+
+
+def refresh_segment(location: str, seg: Segment):
+    # Fetch one segment for location into the segment cache now (prefetching);
+    # shares the upstream call with an identical refresh already in flight
+    cache = get_segment_cache()
+    if cache is None:
+        return
+    lat, lon = _parse_location(location)
+    params = _segment_params(f"{lat}", f"{lon}", list(seg.specs), seg.start, seg.end, seg.is_history)
+    key = segment_cache.make_key(seg.url, params)
+    expires_at = _segment_expiry(seg.url, seg.end, seg.is_history)
+    _flights.do(f"refresh:{key}", lambda: _store_fresh(cache, key, seg.url, params, expires_at,
+                                                       seg.is_history, "prefetch"))
+
+
+def _to_python(arr: np.ndarray, integer: bool = False) -> List:
+    if arr.dtype.kind == "f":
+        missing = np.isnan(arr)
+        present = arr[~missing]
+        if integer and np.array_equal(present, np.trunc(present)):
+            out = np.where(missing, 0, arr).astype(np.int64).astype(object)
+        else:
+            out = arr.astype(object)
+        out[missing] = None
+        return out.tolist()
+    return arr.tolist()
+
+
+def _to_rows(merged: Dict, spec: List[VariableSpec]) -> Dict:
+    data = {'hourly': [], 'daily': []}
+    for kind, time_name in TIME_COLUMNS.items():
+        block = merged.get(kind)
+        if not block:
+            continue
+        value_specs = [s for s in spec if s.param_kind == kind]
+        value_fields = [s.api_var_name for s in value_specs]
+        unit = "m" if kind == "hourly" else "D"
+        times = np.datetime_as_string(block["time"], unit=unit).tolist()
+        values = [_to_python(block[s.api_var_name], s.is_integer) for s in value_specs]
+        keys = [time_name] + value_fields
+        data[kind] = [dict(zip(keys, row)) for row in zip(times, *values)]
+    return data
+
+
+def _column_array(spec: VariableSpec, values: np.ndarray) -> np.ndarray:
+    # None -> NaT happens inside numpy's conversion, not per cell in Python
+    if spec.default_unit == "iso8601":
+        return np.asarray(values, dtype="datetime64[s]")
+    return values
+
+
+def _to_columns(merged: Dict, spec: List[VariableSpec], arrow: bool = False) -> Dict:
+    data = {}
+    for kind, time_name in TIME_COLUMNS.items():
+        block = merged.get(kind) or {}
+        columns: Dict[str, np.ndarray] = {}
+        if block:
+            columns[time_name] = block["time"]
+            for s in spec:
+                if s.param_kind == kind:
+                    columns[s.api_var_name] = _column_array(s, block[s.api_var_name])
+        data[kind] = _to_arrow(columns, time_name) if arrow else columns
+    return data
+
+
+def _to_arrow(columns: Dict[str, np.ndarray], time_name: str):
+    import pyarrow as pa
+
+    arrays = {}
+    for name, arr in columns.items():
+        if arr.dtype.kind == "M":
+            arrays[name] = pa.array(arr).cast(pa.timestamp("s", tz="UTC"))
+        else:
+            arrays[name] = pa.array(arr, from_pandas=True)
+    return pa.table(arrays)
+
+
+def _subtract_intervals(lo: datetime, hi: datetime,
+                        covered: List[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    # Inclusive day intervals of [lo, hi] not inside any covered interval
+    missing = []
+    cur = lo
+    for a, b in sorted(covered):
+        if b < cur:
+            continue
+        if a > hi:
+            break
+        if a > cur:
+            missing.append((cur, a - timedelta(days=1)))
+        cur = max(cur, b + timedelta(days=1))
+        if cur > hi:
+            break
+    if cur <= hi:
+        missing.append((cur, hi))
+    return missing
+
+
+def _remaining(seg: Segment, covered: Dict[VariableSpec, List[Tuple[datetime, datetime]]]) -> List[Segment]:
+    # Sub-segments of seg still missing, grouping variables that miss the same ranges
+    groups: Dict[Tuple, List[VariableSpec]] = {}
+    for v in seg.specs:
+        missing = _subtract_intervals(seg.start, seg.end, covered[v])
+        groups.setdefault(tuple(missing), []).append(v)
+    return [Segment(seg.url, tuple(vars), lo, hi, is_history=True)
+            for missing, vars in groups.items() for lo, hi in missing]
+
+
+def _subtract_history_store(lat: float, lon: float,
+                            segments: List[Segment]) -> Tuple[List[Segment], List[Dict]]:
+    # Same as _subtract_stored_history, against the local history store (lake).
+    # Returns (segments still to fetch, decoded parts read from the store).
+    store = get_history_store()
+    history = [seg for seg in segments if seg.is_history]
+    if store is None or not history:
+        return segments, []
+
+    planned: List[Segment] = []
+    wanted: Dict[VariableSpec, Tuple[datetime, datetime]] = {}
+    for seg in segments:
+        if not seg.is_history:
+            planned.append(seg)
+            continue
+        covered = {v: store.coverage(lat, lon, v, seg.start, seg.end) for v in seg.specs}
+        planned.extend(_remaining(seg, covered))
+        for v in seg.specs:
+            if covered[v]:
+                lo, hi = wanted.get(v, (seg.start, seg.end))
+                wanted[v] = (min(lo, seg.start), max(hi, seg.end))
+    if not wanted:
+        return segments, []
+    lo = min(a for a, _ in wanted.values())
+    hi = max(b for _, b in wanted.values())
+    return planned, store.read(lat, lon, list(wanted), lo, hi)
+
+
+def _subtract_stored_history(lat: float, lon: float,
+                             segments: List[Segment]) -> Tuple[List[Segment], List[Tuple[str, bytes]]]:
+    # Shrink history segments to the date ranges not already stored locally, per variable.
+    # Returns (segments still to fetch, [(url, stored body), ...] to splice in).
+    cache = get_segment_cache()
+    if cache is None or not any(seg.is_history for seg in segments):
+        return segments, []
+
+    def day(text: str) -> datetime:
+        return datetime.strptime(text, "%Y-%m-%d").replace(tzinfo=UTC)
+
+    planned: List[Segment] = []
+    stored_keys: Dict[str, str] = {}
+    for seg in segments:
+        if not seg.is_history:
+            planned.append(seg)
+            continue
+        seg_start, seg_end = seg.start.strftime("%Y-%m-%d"), seg.end.strftime("%Y-%m-%d")
+        covered: Dict[VariableSpec, List[Tuple[datetime, datetime]]] = {}
+        for v in seg.specs:
+            rows = cache.coverage(seg.url, f"{lat}", f"{lon}", f"{v.param_kind}:{v.api_var_name}",
+                                  seg_start, seg_end)
+            for _, _, key in rows:
+                stored_keys.setdefault(key, seg.url)
+            covered[v] = [(day(a), day(b)) for a, b, _ in rows]
+        planned.extend(_remaining(seg, covered))
+
+    stored: List[Tuple[str, bytes]] = []
+    for key, url in stored_keys.items():
+        body = cache.get(key)
+        if body is None:
+            # evicted since the coverage lookup; fall back to the full plan
+            return segments, []
+        stored.append((url, body))
+    return planned, stored
+
+
+def _gather_parts(lat: float, lon: float, segments: List[Segment],
+                  max_workers: Optional[int] = None) -> Tuple[List[Dict], List[str]]:
+    # Parts for merging, in priority order: history store, segment cache, network.
+    # Settled archive segments fetched here are added to the history store.
+    segments, lake_parts = _subtract_history_store(lat, lon, segments)
+    segments, stored = _subtract_stored_history(lat, lon, segments)
+    fetched = _fetch_segments(lat, lon, segments, max_workers=max_workers)
+    return _assemble_parts(lat, lon, segments, fetched, lake_parts, stored)
+
+
+async def _gather_parts_async(lat: float, lon: float, segments: List[Segment],
+                              max_concurrency: Optional[int] = None) -> Tuple[List[Dict], List[str]]:
+    # _gather_parts with segments fetched concurrently on the running loop, at most
+    # max_concurrency at a time; local store lookups and writes run in worker threads
+    import asyncio
+
+    segments, lake_parts = await asyncio.to_thread(_subtract_history_store, lat, lon, segments)
+    segments, stored = await asyncio.to_thread(_subtract_stored_history, lat, lon, segments)
+    limit = asyncio.Semaphore(max(1, MAX_WORKERS if max_concurrency is None else max_concurrency))
+
+    async def fetch(seg: Segment) -> Dict:
+        async with limit:
+            return await _fetch_segment_async(lat, lon, seg)
+
+    tasks = [asyncio.ensure_future(fetch(seg)) for seg in segments]
+    try:
+        fetched = await asyncio.gather(*tasks)
+    except BaseException:
+        # the first failure (or a cancellation) stops the other segments too
+        for task in tasks:
+            task.cancel()
+        raise
+    return await asyncio.to_thread(_assemble_parts, lat, lon, segments, fetched, lake_parts, stored)
+
+
+def _assemble_parts(lat: float, lon: float, segments: List[Segment], fetched: List[Dict],
+                    lake_parts: List[Dict], stored: List[Tuple[str, bytes]]) -> Tuple[List[Dict], List[str]]:
+    store = get_history_store()
+    if store is not None:
+        settled = _settled_before(datetime.now(UTC))
+        for seg, payload in zip(segments, fetched):
+            if seg.is_history and seg.end < settled:
+                store.write(lat, lon, list(seg.specs), seg.start, seg.end, payload)
+
+    stored_parts = []
+    for url, body in stored:
+        trace = SegmentTrace(url, "", "", True, 0, cache="stored")
+        stored_parts.append(_traced(trace, lambda: _timed_decode(body)))
+    if _trace_listeners:
+        for part in lake_parts:
+            _emit(SegmentTrace("local history store", "", "", True, 0, cache="lake", rows=_payload_rows(part)))
+
+    parts = lake_parts + stored_parts + fetched
+    labels = (["local history store"] * len(lake_parts) + [f"{url} (stored)" for url, _ in stored]
+              + [seg.url for seg in segments])
+    return parts, labels
+
+
+def _resolve_spec(variable: str) -> Tuple[List[str], List[VariableSpec]]:
     var = variable.strip().split(',')
     spec = []
     for v in var:
@@ -571,73 +2053,44 @@ def fetch_unified(variable: str, location: str, mode: str, start_date: str, end_
             raise ValueError(f"Unknown variable '{v}'. Supported: {', '.join(sorted(VARIABLES.keys()))}")
         else:
             spec.append(VARIABLES[v])
+    return var, spec
 
-    lat, lon = _parse_location(location)
+
+def _parse_dates(start_date: str, end_date: str) -> Tuple[datetime, datetime]:
     s = datetime.strptime(start_date, "%Y-%m-%d").replace(tzinfo=UTC)
     e = datetime.strptime(end_date, "%Y-%m-%d").replace(tzinfo=UTC)
     if e < s:
         raise ValueError("end_date is before start_date")
+    return s, e
 
-    today = datetime.now(UTC)
-    parts: List[Dict] = []
 
+def _parse_mode(mode: str) -> Tuple[str, bool, bool]:
     mode_norm = mode.strip().lower()
     if mode_norm not in ("history", "historical", "forecast", "both"):
         raise ValueError("mode must be 'history', 'historical', 'forecast', or 'both'")
 
     want_history = mode_norm in ("history", "historical", "both")
     want_forecast = mode_norm in ("forecast", "both")
+    return mode_norm, want_history, want_forecast
 
-    # Historical segment(s)
-    if want_history and s < today:
-        split_vars_hist = _split_vars_by_urls(spec, is_history=True)
-        hist_end = min(e, today - timedelta(days=1))
-        if s <= hist_end:
-            for url, vars in split_vars_hist.items():
-                for cs, ce in _year_chunks(s, hist_end):
-                    parts.append(_fetch_segment(lat, lon, vars, cs, ce, is_history=True, url=url))
 
-    # Forecast segment
-    if want_forecast and e >= today:
-        split_vars_fc = _split_vars_by_urls(spec, is_history=False)
-        fc_start = max(s, today)
-        if fc_start <= e:
-            for url, vars in split_vars_fc.items():
-                parts.append(_fetch_segment(lat, lon, vars, fc_start, e, is_history=False, url=url))
-
-    if not parts:
-        return {"error": "Requested time range produced no segments to query."}
+def _check_output(output: str):
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"output must be one of: {', '.join(OUTPUT_FORMATS)}")
 
-    merged = _merge_results(spec, parts)
 
-    data = {'hourly': [], 'daily': []}
+def _build_result(var: List[str], spec: List[VariableSpec], lat: float, lon: float, mode_norm: str,
+                  start_date: str, end_date: str, merged: Dict, output: str) -> Dict:
     units = {}
+    for kind in ('hourly', 'daily'):
+        if merged[kind]:
+            units |= merged.get(f"{kind}_units", {})
 
     # Normalize to unified schema
-    if merged['hourly']:
-        data_key = "hourly"
-        units_key = "hourly_units"
-        time_field = "time"
-        value_fields = [s.api_var_name for s in spec if s.param_kind == 'hourly']
-        times = merged.get(data_key, {}).get(time_field, [])
-        values = {}
-        for value_field in value_fields:
-            values[value_field] = merged.get(data_key, {}).get(value_field, [])
-        for i, t in enumerate(times):
-            data['hourly'].append(dict({"timestamp_utc": t} | {value_field: values[value_field][i] if i < len(values[value_field]) else None for value_field in value_fields}))
-        units |= merged.get(units_key, {})
-    if merged['daily']:
-        data_key = "daily"
-        units_key = "daily_units"
-        time_field = "time"
-        value_fields = [s.api_var_name for s in spec if s.param_kind == 'daily']
-        times = merged.get(data_key, {}).get(time_field, [])
-        values = {}
-        for value_field in value_fields:
-            values[value_field] = merged.get(data_key, {}).get(value_field, [])
-        for i, d in enumerate(times):
-            data['daily'].append(dict({"date": d} | {value_field: values[value_field][i] if i < len(values[value_field]) else None for value_field in value_fields}))
-        units |= merged.get(units_key, {})
+    if output == "rows":
+        data = _to_rows(merged, spec)
+    else:
+        data = _to_columns(merged, spec, arrow=(output == "arrow"))
 
     # clean missing units
     for k, v in units.items():
@@ -654,6 +2107,7 @@ def fetch_unified(variable: str, location: str, mode: str, start_date: str, end_
             "end_date": end_date,
             "generated_at": datetime.now(UTC).isoformat(),
             "source": "open-meteo",
+            "sources": merged["sources"],
         },
         "units": units,
         "data": data,
@@ -661,9 +2115,213 @@ def fetch_unified(variable: str, location: str, mode: str, start_date: str, end_
     return result
 
 
+def fetch_unified(variable: str, location: str, mode: str, start_date: str, end_date: str,
+                  max_workers: Optional[int] = None, output: str = "rows") -> Dict:
+    # output: "rows" (list of dicts per timestamp), "columns" (dict of NumPy arrays,
+    # times as UTC datetime64) or "arrow" (pyarrow.Table per kind, tz-aware UTC times)
+    _check_output(output)
+    var, spec = _resolve_spec(variable)
+    lat, lon = _parse_location(location)
+    s, e = _parse_dates(start_date, end_date)
+    today = datetime.now(UTC)
+    mode_norm, want_history, want_forecast = _parse_mode(mode)
+
+    # Fan out every planned segment at once, bounded by max_workers
+    segments = _plan_segments(spec, want_history, want_forecast, s, e, today)
+    if not segments:
+        return {"error": "Requested time range produced no segments to query."}
+
+    # Only download history that is not already stored, then splice the stored parts back in
+    parts, labels = _gather_parts(lat, lon, segments, max_workers=max_workers)
+
+    merged = _merge_results(spec, parts, labels=labels, window=(s, e + timedelta(days=1)))
+    return _build_result(var, spec, lat, lon, mode_norm, start_date, end_date, merged, output)
+
+
+async def fetch_unified_async(variable: str, location: str, mode: str, start_date: str, end_date: str,
+                              max_concurrency: Optional[int] = None, output: str = "rows",
+                              timeout: Optional[float] = None) -> Dict:
+    # fetch_unified without blocking the event loop. timeout is a deadline in seconds for
+    # the whole call (raises TimeoutError); cancelling the task cancels its requests.
+    import asyncio
+
+    _check_output(output)
+    var, spec = _resolve_spec(variable)
+    lat, lon = _parse_location(location)
+    s, e = _parse_dates(start_date, end_date)
+    today = datetime.now(UTC)
+    mode_norm, want_history, want_forecast = _parse_mode(mode)
+
+    segments = _plan_segments(spec, want_history, want_forecast, s, e, today)
+    if not segments:
+        return {"error": "Requested time range produced no segments to query."}
+
+    def finish(parts: List[Dict], labels: List[str]) -> Dict:
+        merged = _merge_results(spec, parts, labels=labels, window=(s, e + timedelta(days=1)))
+        return _build_result(var, spec, lat, lon, mode_norm, start_date, end_date, merged, output)
+
+    async with asyncio.timeout(timeout):
+        parts, labels = await _gather_parts_async(lat, lon, segments, max_concurrency=max_concurrency)
+        # merging and shaping the result is CPU work; keep it off the loop
+        return await asyncio.to_thread(finish, parts, labels)
+
+
+def fetch_planned(location: str, needs: List[DataNeed], max_workers: Optional[int] = None,
+                  output: str = "rows") -> List[Dict]:
+    # Serve several fetch_unified-style needs for one location from one plan
+    # (see plan_requests). Returns one result per need, in order.
+    _check_output(output)
+    lat, lon = _parse_location(location)
+    today = datetime.now(UTC)
+    midnight = today.replace(hour=0, minute=0, second=0, microsecond=0)
+    segments = plan_requests(needs, today=today)
+    parts, labels = _gather_parts(lat, lon, segments, max_workers=max_workers)
+
+    results = []
+    for need in needs:
+        var, spec = _resolve_spec(need.variable)
+        s, e = _parse_dates(need.start_date, need.end_date)
+        mode_norm, want_history, want_forecast = _parse_mode(need.mode)
+        # Parts can hold more than this need asked for; keep only its range and mode
+        lo, hi = s, e + timedelta(days=1)
+        if not want_forecast:
+            hi = min(hi, midnight)
+        if not want_history:
+            lo = max(lo, midnight)
+        if lo >= hi:
+            results.append({"error": "Requested time range produced no segments to query."})
+            continue
+        merged = _merge_results(spec, parts, labels=labels, window=(lo, hi))
+        if not merged:
+            merged = {"sources": {}} | {kind: {} for kind in TIME_COLUMNS}
+        results.append(_build_result(var, spec, lat, lon, mode_norm, need.start_date, need.end_date,
+                                     merged, output))
+    return results
+
+
+def fetch_unified_many(variable: str, locations: List[str], mode: str, start_date: str, end_date: str,
+                       batch_size: int = BATCH_SIZE, max_workers: Optional[int] = None,
+                       output: str = "rows") -> List[Dict]:
+    # Same as fetch_unified for many locations. Locations are packed into
+    # multi-coordinate requests of up to batch_size, and every (batch, segment)
+    # request runs concurrently. Returns one result per location, in input order.
+    _check_output(output)
+    var, spec = _resolve_spec(variable)
+    coords = [_parse_location(loc) for loc in locations]
+    s, e = _parse_dates(start_date, end_date)
+    today = datetime.now(UTC)
+    mode_norm, want_history, want_forecast = _parse_mode(mode)
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    segments = _plan_segments(spec, want_history, want_forecast, s, e, today)
+    if not segments:
+        return [{"error": "Requested time range produced no segments to query."} for _ in coords]
+
+    # Each location first takes what it has locally, as in _gather_parts; only the
+    # segments still missing are batched, per segment, across the locations missing them
+    def take_local(coord: Tuple[float, float]) -> Tuple[List[Segment], List[Dict], List[Tuple[str, bytes]]]:
+        loc_segments, lake_parts = _subtract_history_store(*coord, segments)
+        loc_segments, stored = _subtract_stored_history(*coord, loc_segments)
+        return loc_segments, lake_parts, stored
+
+    def fetch(job: Tuple[Segment, List[int]]) -> List[Dict]:
+        seg, batch = job
+        return _fetch_segment_many([coords[i] for i in batch], seg)
+
+    def finish(i: int) -> Dict:
+        (lat, lon), (loc_segments, lake_parts, stored) = coords[i], local[i]
+        parts, labels = _assemble_parts(lat, lon, loc_segments, [payloads[i, seg] for seg in loc_segments],
+                                        lake_parts, stored)
+        merged = _merge_results(spec, parts, labels=labels, window=(s, e + timedelta(days=1)))
+        return _build_result(var, spec, lat, lon, mode_norm, start_date, end_date, merged, output)
+
+    with ThreadPoolExecutor(max_workers=max(1, MAX_WORKERS if max_workers is None else max_workers)) as pool:
+        local = list(pool.map(take_local, coords))
+        missing: Dict[Segment, List[int]] = {}
+        for i, (loc_segments, _, _) in enumerate(local):
+            for seg in loc_segments:
+                missing.setdefault(seg, []).append(i)
+        jobs = [(seg, idx[j:j + batch_size]) for seg, idx in missing.items()
+                for j in range(0, len(idx), batch_size)]
+        payloads: Dict[Tuple[int, Segment], Dict] = {}
+        for (seg, batch), batch_payloads in zip(jobs, pool.map(fetch, jobs)):
+            for i, payload in zip(batch, batch_payloads):
+                payloads[i, seg] = payload
+        return list(pool.map(finish, range(len(coords))))
+
+
+def iter_unified(variable: str, location: str, mode: str, start_date: str, end_date: str,
+                 max_workers: Optional[int] = None) -> Iterator[Tuple[Dict, Dict]]:
+    # Streaming form of fetch_unified: yields (units, rows data) once per planned time
+    # window (a history chunk or the forecast range), oldest first. Only the current
+    # window plus STREAM_LOOKAHEAD prefetched ones are held in memory.
+    var, spec = _resolve_spec(variable)
+    lat, lon = _parse_location(location)
+    s, e = _parse_dates(start_date, end_date)
+    today = datetime.now(UTC)
+    mode_norm, want_history, want_forecast = _parse_mode(mode)
+
+    windows: Dict[Tuple[datetime, datetime], List[Segment]] = {}
+    for seg in _plan_segments(spec, want_history, want_forecast, s, e, today):
+        windows.setdefault((seg.start, seg.end), []).append(seg)
+    ordered = sorted(windows.items(), key=lambda item: item[0])
+
+    def fetch(window_segments: List[Segment]) -> Dict:
+        parts, labels = _gather_parts(lat, lon, window_segments, max_workers=max_workers)
+        # Segment bounds can carry the current time of day; windows are whole days
+        lo = min(seg.start for seg in window_segments).replace(hour=0, minute=0, second=0, microsecond=0)
+        hi = max(seg.end for seg in window_segments).replace(hour=0, minute=0, second=0, microsecond=0)
+        return _merge_results(spec, parts, labels=labels,
+                              window=(max(lo, s), min(hi + timedelta(days=1), e + timedelta(days=1))))
+
+    with ThreadPoolExecutor(max_workers=STREAM_LOOKAHEAD + 1) as pool:
+        pending = deque()
+        queue = iter(ordered)
+        for _, window_segments in queue:
+            pending.append(pool.submit(fetch, window_segments))
+            if len(pending) > STREAM_LOOKAHEAD:
+                break
+        while pending:
+            merged = pending.popleft().result()
+            nxt = next(queue, None)
+            if nxt is not None:
+                pending.append(pool.submit(fetch, nxt[1]))
+            result = _build_result(var, spec, lat, lon, mode_norm, start_date, end_date, merged, "rows")
+            yield result["units"], result["data"]
+
+
+def _write_stream(chunks: Iterator[Tuple[Dict, Dict]], out: TextIO, fmt: str, spec: List[VariableSpec]):
+    fields = [s.api_var_name for s in spec]
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=["kind", "time"] + list(dict.fromkeys(fields)),
+                                restval="", extrasaction="ignore")
+        writer.writeheader()
+    first = True
+    for units, data in chunks:
+        if fmt == "ndjson" and first:
+            out.write(json.dumps({"kind": "units", "units": units}) + "\n")
+        first = False
+        for kind, time_name in TIME_COLUMNS.items():
+            for row in data[kind]:
+                if writer is not None:
+                    writer.writerow(row | {"kind": kind, "time": row[time_name]})
+                else:
+                    out.write(json.dumps({"kind": kind} | row) + "\n")
+        out.flush()
+
+
 def main():
+    # 'unified.py bulk ...' runs a job file; anything else is a single request
+    if len(sys.argv) > 1 and sys.argv[1] == "bulk":
+        import bulk
+        bulk.main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
-        description="Unified fetch: variable + location + mode + time range",
+        description="Unified fetch: variable + location + mode + time range\n"
+                    "(use 'unified.py bulk -h' for the bulk job runner)",
         formatter_class=argparse.RawTextHelpFormatter,
     )
     parser.add_argument("variable", type=str, help=f"Variable name. One of: {', '.join(sorted(VARIABLES.keys()))}")
@@ -672,10 +2330,36 @@ def main():
     parser.add_argument("start", type=str, help="Start date YYYY-MM-DD")
     parser.add_argument("end", type=str, help="End date YYYY-MM-DD")
     parser.add_argument("--out", type=str, default=None, help="Optional output JSON file path")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Max concurrent segment requests (1 = sequential)")
+    parser.add_argument("--stream", type=str, choices=["ndjson", "csv"], default=None,
+                        help="Write records chunk by chunk as each segment arrives (bounded memory)")
+    parser.add_argument("--metrics", type=str, default=None,
+                        help="Write per-segment fetch metrics here (.json, otherwise Prometheus text)")
 
     args = parser.parse_args()
 
-    res = fetch_unified(args.variable, args.location, args.mode, args.start, args.end)
+    if args.metrics:
+        import metrics
+        fetch_metrics = metrics.install()
+        atexit.register(fetch_metrics.write, args.metrics)
+
+    if args.stream:
+        _, spec = _resolve_spec(args.variable)
+        chunks = iter_unified(args.variable, args.location, args.mode, args.start, args.end,
+                              max_workers=args.workers)
+        if args.out:
+            outdir = os.path.dirname(args.out)
+            if outdir:
+                os.makedirs(outdir, exist_ok=True)
+            with open(args.out, "w", encoding="utf-8", newline="") as f:
+                _write_stream(chunks, f, args.stream, spec)
+            print(os.path.abspath(args.out))
+        else:
+            _write_stream(chunks, sys.stdout, args.stream, spec)
+        return
+
+    res = fetch_unified(args.variable, args.location, args.mode, args.start, args.end,
+                        max_workers=args.workers)
     if "error" in res:
         print(json.dumps(res, indent=2))
         raise SystemExit(1)
@@ -1,10 +1,13 @@
+import os
+import time
+import cProfile
+from contextlib import contextmanager
 import unified
 import pandas as pd
-import pint
+import functools
+import threading
+import segment_cache
 import streamlit as st
-import plotly.graph_objects as go
-import pint_pandas
-import geocoder
 from types import SimpleNamespace
 import numpy as np
 
@@ -60,22 +63,175 @@ daily_variables = [
     'wind_gusts_10m_max',
     'wind_direction_10m_dominant'
     ]
+
+# unit registry: built on first use and shared by every session of the process;
+# pint's parsed-definition cache sits in the user cache dir, one folder per pint
+# version, so neither depends on the working directory
+unit_definitions_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weather_units.txt')
+_ureg = None
+_ureg_lock = threading.Lock()
+
+def unit_cache_dir():
+    import pint
+    return os.path.join(segment_cache.default_cache_dir(), f"pint-{pint.__version__}")
+
 def get_ureg():
-    ureg = pint.UnitRegistry(cache_folder='./cache/')
-    ureg.load_definitions('weather_units.txt')
-    return ureg
-ureg = get_ureg()
-pint_pandas.PintType.ureg = ureg
+    global _ureg
+    if _ureg is not None:
+        return _ureg
+    with _ureg_lock:
+        if _ureg is None:
+            import pint
+            ureg = pint.UnitRegistry(cache_folder=unit_cache_dir())
+            ureg.load_definitions(unit_definitions_path)
+            _ureg = ureg
+        return _ureg
+
+def __getattr__(name):
+    # utilities.ureg stays available without building the registry at import
+    if name == 'ureg':
+        return get_ureg()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# location snapping for cache keys: 'h3', 'grid' or 'none'
+snap_method = os.environ.get('WEATHERAPP_SNAP', 'h3')
+snap_resolution = int(os.environ.get('WEATHERAPP_H3_RESOLUTION', unified.H3_RESOLUTION))
+
+# weather wrappers only memoize frame building for this long; freshness is decided by
+# unified's segment cache (expiry at the next model update, stale served while refreshing)
+weather_cache_ttl = int(os.environ.get('WEATHERAPP_WEATHER_TTL', 300))
+
+# background warm-up of popular locations (prefetch.PrefetchScheduler) inside the app
+# server process; a separate `python prefetch.py` worker can do the same instead
+prefetch_enabled = os.environ.get('WEATHERAPP_PREFETCH', '0') != '0'
+ss_tracked_key = '_tracked_location'
+
+# render profiling: WEATHERAPP_PROFILE=1 turns it on by default (the sidebar toggle
+# overrides it per session); WEATHERAPP_PROFILE_DIR also writes cProfile stats per rerun
+profile_default = os.environ.get('WEATHERAPP_PROFILE', '0') != '0'
+profile_dir = os.environ.get('WEATHERAPP_PROFILE_DIR')
+
+class RenderProfiler:
+    # times named sections of one script run; disabled profilers cost one branch per section
+    def __init__(self, enabled, pstats_dir=None):
+        self.enabled = enabled
+        self.pstats_dir = pstats_dir
+        self.sections = []
+        self._depth = 0
+        self._start = time.perf_counter()
+        self._profile = None
+        if enabled and pstats_dir:
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError:
+                # another profiler already owns this interpreter
+                self._profile = None
+
+    @contextmanager
+    def section(self, name):
+        if not self.enabled:
+            yield
+            return
+        depth = self._depth
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            self.sections.append((name, depth, started - self._start, time.perf_counter() - started))
+
+    def finish(self):
+        # stop cProfile and write this rerun's stats; returns the file path, if any
+        if self._profile is None:
+            return None
+        self._profile.disable()
+        os.makedirs(self.pstats_dir, exist_ok=True)
+        path = os.path.join(self.pstats_dir, f"render-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.pstats")
+        self._profile.dump_stats(path)
+        self._profile = None
+        return path
+
+    def waterfall(self):
+        rows = sorted(self.sections, key=lambda r: r[2])
+        labels = [f"{i + 1}. {'  ' * depth}{name}" for i, (name, depth, _, _) in enumerate(rows)]
+        import plotly.graph_objects as go
+        fig = go.Figure(go.Bar(
+            y=labels,
+            x=[duration * 1000 for _, _, _, duration in rows],
+            base=[start * 1000 for _, _, start, _ in rows],
+            orientation='h',
+            text=[f"{duration * 1000:.0f} ms" for _, _, _, duration in rows],
+            textposition='auto',
+        ))
+        fig.update_layout(title='Render waterfall',
+                          xaxis_title='ms since rerun start',
+                          yaxis={'autorange': 'reversed'},
+                          height=max(300, 28 * len(rows)),
+                          margin={'l': 10, 'r': 10})
+        return fig
+
+    def render(self, container):
+        if not self.enabled:
+            return
+        total = time.perf_counter() - self._start
+        path = self.finish()
+        with container.expander(f"Render profile ({total * 1000:.0f} ms)", expanded=True):
+            st.plotly_chart(self.waterfall(), key='render_profile_waterfall')
+            st.dataframe(pd.DataFrame([{'section': '  ' * depth + name,
+                                        'start (ms)': round(start * 1000, 1),
+                                        'duration (ms)': round(duration * 1000, 1)}
+                                       for name, depth, start, duration in sorted(self.sections, key=lambda r: r[2])]))
+            if path:
+                st.caption(f"cProfile stats: {path}")
+
+def _arcgis(*args, **kwargs):
+    # geocoder is imported by the first lookup that misses the cache, not at startup
+    import geocoder
+    return geocoder.arcgis(*args, **kwargs)
 
 @st.cache_resource(ttl=86400) # 1 day cache
 def generate_geocoder():
-    return geocoder.arcgis
+    return _arcgis
 
 @st.cache_data(ttl=86400) # 1 day cache
 def get_location(location, _geocoder):
     latlng = _geocoder(location).latlng
     return SimpleNamespace(latitude=latlng[0], longitude=latlng[1])
 
+def track_location(location_string):
+    # count a location once per session towards the prefetch scheduler's popular set
+    if st.session_state.get(ss_tracked_key) != location_string:
+        st.session_state[ss_tracked_key] = location_string
+        get_popularity_tracker().record(location_string)
+
+@st.cache_resource
+def get_timezone_finder():
+    from timezonefinder import TimezoneFinder
+    return TimezoneFinder()
+
+@st.cache_data(ttl=86400) # 1 day cache
+def get_timezone(latitude, longitude):
+    return get_timezone_finder().timezone_at(lng=longitude, lat=latitude)
+
+@st.cache_resource
+def get_popularity_tracker():
+    import prefetch
+    return prefetch.PopularityTracker()
+
+@st.cache_resource
+def start_prefetcher():
+    # one scheduler per server process, sharing the sessions' tracker
+    import prefetch
+    return prefetch.PrefetchScheduler(get_popularity_tracker()).start()
+
+def snap_coordinates(coordinates):
+    # nearby points share one snapped location, so they also share cached weather data
+    lat, lng = unified.snap_location(coordinates.latitude, coordinates.longitude,
+                                     method=snap_method, resolution=snap_resolution)
+    return SimpleNamespace(latitude=lat, longitude=lng)
+
 @st.cache_data(ttl=86400) # 1 day cache
 def reverse_geocode(latlng_nmespce, _geocoder):
     result = _geocoder([latlng_nmespce.latitude, latlng_nmespce.longitude], method='reverse')
@@ -83,6 +239,7 @@ def reverse_geocode(latlng_nmespce, _geocoder):
 
 @st.cache_data(ttl=86400)
 def get_ip_location(ip_addr):
+    import geocoder
     location = geocoder.ip(ip_addr)
     return ', '.join([location.city, location.state, location.country])
 
@@ -101,9 +258,13 @@ def write_left(content, header='span'):
 def write_right(content, header='span'):
     return st.markdown(f"<{header} style='text-align: right'>{content}</{header}>", unsafe_allow_html=True)
 
+@functools.lru_cache(maxsize=None)
+def _pretty_unit(unit):
+    return f"{get_ureg()(unit).units:~#P}"
+
 def pretty_print_unit(quantity):
     if isinstance(quantity, str):
-        quantity = ureg(quantity)
+        return _pretty_unit(quantity)
     return f"{quantity.units:~#P}"
 
 def degree_to_compass(num):
@@ -111,7 +272,36 @@ def degree_to_compass(num):
     arr=["N","NNE","NE","ENE","E","ESE", "SE", "SSE","S","SSW","SW","WSW","W","WNW","NW","NNW"]
     return arr[(val % 16)]
 
-def convert_weather_data(input_weather_data, weather_units, preferred_units, tz=None):    
+@functools.lru_cache(maxsize=None)
+def _unit_conversion(source, target):
+    # (scale, offset) with target = source * scale + offset; every weather unit
+    # conversion is affine, so converting 0 and 1 through ureg pins it down
+    ureg = get_ureg()
+    zero = ureg.Quantity(0.0, source).to(target).magnitude
+    one = ureg.Quantity(1.0, source).to(target).magnitude
+    return one - zero, zero
+
+@functools.lru_cache(maxsize=64)
+def _compile_conversion_plan(weather_units, preferred_units):
+    preferred = dict(preferred_units)
+    columns, scales, offsets, units = [], [], [], {}
+    for column, unit in weather_units:
+        target = preferred.get(column, unit)
+        scale, offset = (1.0, 0.0) if target == unit else _unit_conversion(unit, target)
+        columns.append(column)
+        scales.append(scale)
+        offsets.append(offset)
+        units[column] = target
+    return columns, np.array(scales), np.array(offsets), units
+
+def conversion_plan(weather_units, preferred_units):
+    # (columns, scales, offsets, column -> unit), compiled once per unit profile
+    return _compile_conversion_plan(tuple(sorted(weather_units.items())),
+                                    tuple(sorted(preferred_units.items())))
+
+def convert_weather_data(input_weather_data, weather_units, preferred_units, tz=None):
+    # Plain float64 columns in the preferred units; the unit of each converted
+    # column is carried in weather_data.attrs['units']
     weather_data = input_weather_data.copy()
 
     if tz is not None:
@@ -124,136 +314,65 @@ def convert_weather_data(input_weather_data, weather_units, preferred_units, tz=
             weather_data['date'] = weather_data['date'].dt.tz_convert(tz=tz)
         except KeyError:
             pass
-    
-    # convert all data to pint units
-    for column in weather_data.columns:
-        try:
-            weather_data[column] = weather_data[column].astype(f"pint[{weather_units[column]}]")
-        except KeyError:
-            continue
-    for index, value in preferred_units.items():
-        try:
-            weather_data[index] = weather_data[index].pint.to(value)
-        except KeyError:
-            continue
+
+    columns, scales, offsets, units = conversion_plan(
+        {k: v for k, v in weather_units.items() if k in weather_data.columns}, preferred_units)
+    if columns:
+        block = weather_data[columns].to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+        block *= scales
+        block += offsets
+        weather_data[columns] = block
+    weather_data.attrs['units'] = units
     return weather_data
 
-@st.cache_data(ttl=900) # 15 minute cache
-def get_sunrise_sunset(location: str, start_date: str, end_date: str):
-    # get sunrise data
-    data = unified.fetch_unified('sunrise', 
-                                location,
-                                'both',
-                                start_date,
-                                end_date)
-    api_var = unified.VARIABLES['sunrise'].api_var_name
-    sunrise_data = pd.DataFrame.from_dict(data['data']['daily'])
-    sunrise_data = sunrise_data.rename(columns={api_var: 'sunrise'})
-    sunrise_data['date'] = pd.to_datetime(sunrise_data['date']).dt.tz_localize('UTC')
-    sunrise_data['sunrise'] = pd.to_datetime(sunrise_data['sunrise']).dt.tz_localize('UTC')
-
-    # get sunset data
-    data = unified.fetch_unified('sunset', 
-                                location,
-                                'both',
-                                start_date,
-                                end_date)
-    api_var = unified.VARIABLES['sunset'].api_var_name
-    sunset_data = pd.DataFrame.from_dict(data['data']['daily'])
-    sunset_data = sunset_data.rename(columns={api_var: 'sunset'})
-    sunset_data['date'] = pd.to_datetime(sunset_data['date']).dt.tz_localize('UTC')
-    sunset_data['sunset'] = pd.to_datetime(sunset_data['sunset']).dt.tz_localize('UTC')
-
-    all_data = sunrise_data.merge(sunset_data, how='outer', on='date')
-
-    return all_data
-
-@st.cache_data(ttl=900) # 15 minute cache
-def get_daily_weather_data(location, start_date, end_date):    
-    daily_data = pd.DataFrame()
-    daily_units = {}
-
-    data = unified.fetch_unified(','.join(daily_variables), 
-                                    location,
-                                    'both',
-                                    start_date,
-                                    end_date)
-    
-    for variable in daily_variables:
+def sunrise_sunset_frame(data):
+    sunrise_api_var = unified.VARIABLES['sunrise'].api_var_name
+    sunset_api_var = unified.VARIABLES['sunset'].api_var_name
+    sun_data = pd.DataFrame(data['data']['daily'])
+    sun_data = sun_data.rename(columns={sunrise_api_var: 'sunrise', sunset_api_var: 'sunset'})
+    for column in ('date', 'sunrise', 'sunset'):
+        sun_data[column] = pd.to_datetime(sun_data[column]).dt.tz_localize('UTC')
+    return sun_data[['date', 'sunrise', 'sunset']]
+
+def weather_frame(data, variables, kind):
+    units = {}
+    for variable in variables:
         api_var = unified.VARIABLES[variable].api_var_name
-        units = data['units'][api_var].strip().replace(' ', '_')
-        daily_units[variable] = units
+        units[variable] = data['units'][api_var].strip().replace(' ', '_')
 
-    daily_data = pd.DataFrame.from_dict(data['data']['daily'])
-    daily_data = daily_data.rename(columns={unified.VARIABLES[variable].api_var_name: variable for variable in daily_variables})
-    daily_data['date'] = pd.to_datetime(daily_data['date']).dt.tz_localize('UTC')
-
-    # fill None data to NaN
-    daily_data = daily_data.fillna(value=np.nan)
-    
-    return daily_data, daily_units
-
-@st.cache_data(ttl=900) # 15 minute cache
-def get_hourly_weather_data(location, start_date, end_date):
-    hourly_data = pd.DataFrame()
-    hourly_units = {}
-
-    data = unified.fetch_unified(','.join(hourly_variables), 
-                                    location,
-                                    'both',
-                                    start_date,
-                                    end_date)
-    
-    for variable in hourly_variables:
-        api_var = unified.VARIABLES[variable].api_var_name
-        units = data['units'][api_var].strip().replace(' ', '_')
-        hourly_units[variable] = units
-
-    hourly_data = pd.DataFrame.from_dict(data['data']['hourly'])
-    hourly_data = hourly_data.rename(columns={unified.VARIABLES[variable].api_var_name: variable for variable in hourly_variables})
-    hourly_data['timestamp_utc'] = pd.to_datetime(hourly_data['timestamp_utc']).dt.tz_localize('UTC')
-
-    # change None data to NaN
-    hourly_data = hourly_data.fillna(value=np.nan)
-
-    return hourly_data, hourly_units
-
-@st.cache_data(ttl=900) # 15 minute cache
-def get_all_weather_data(location: str, start_date: str, end_date: str):
-    hourly_data = pd.DataFrame()
-    hourly_units = {}
-    daily_data = pd.DataFrame()
-    daily_units = {}
-
-    data = unified.fetch_unified(','.join(hourly_variables + daily_variables), 
-                                    location,
-                                    'both',
-                                    start_date,
-                                    end_date)
-    
-    for variable in hourly_variables:
-        api_var = unified.VARIABLES[variable].api_var_name
-        units = data['units'][api_var].strip().replace(' ', '_')
-        hourly_units[variable] = units
+    time_column = unified.TIME_COLUMNS[kind]
+    weather_data = pd.DataFrame(data['data'][kind])
+    weather_data = weather_data.rename(columns={unified.VARIABLES[variable].api_var_name: variable for variable in variables})
+    weather_data[time_column] = pd.to_datetime(weather_data[time_column]).dt.tz_localize('UTC')
+    return weather_data, units
 
-    hourly_data = pd.DataFrame.from_dict(data['data']['hourly'])
-    hourly_data = hourly_data.rename(columns={unified.VARIABLES[variable].api_var_name: variable for variable in hourly_variables})
-    hourly_data['timestamp_utc'] = pd.to_datetime(hourly_data['timestamp_utc']).dt.tz_localize('UTC')
-    
-    for variable in daily_variables:
-        api_var = unified.VARIABLES[variable].api_var_name
-        units = data['units'][api_var].strip().replace(' ', '_')
-        daily_units[variable] = units
+def all_weather_frames(data):
+    hourly_data, hourly_units = weather_frame(data, hourly_variables, 'hourly')
+    daily_data, daily_units = weather_frame(data, daily_variables, 'daily')
+    return hourly_data, hourly_units, daily_data, daily_units
 
-    daily_data = pd.DataFrame.from_dict(data['data']['daily'])
-    daily_data = daily_data.rename(columns={unified.VARIABLES[variable].api_var_name: variable for variable in daily_variables})
-    daily_data['date'] = pd.to_datetime(daily_data['date']).dt.tz_localize('UTC')
+def page_needs(now):
+    # data needs of one page render at time now, as name -> (variables, start_date, end_date);
+    # the prefetch scheduler plans the same needs to warm popular locations
+    today = pd.Timestamp(now).tz_convert('UTC').floor('d')
+    yesterday = today - pd.Timedelta(1, 'day')
+    past_limit = today - pd.Timedelta(8, 'days')
+    future_limit = today + pd.Timedelta(5, 'days')
+    return {
+        'sun': ('sunrise,sunset', to_timestamp(yesterday), to_timestamp(future_limit)),
+        'overview': (','.join(hourly_variables + daily_variables), to_timestamp(yesterday), to_timestamp(future_limit)),
+        'time_series': (','.join(hourly_variables), to_timestamp(past_limit), to_timestamp(future_limit)),
+    }
 
-    # change None data to NaN
-    daily_data = daily_data.fillna(value=np.nan)
-    hourly_data = hourly_data.fillna(value=np.nan)
-    
-    return hourly_data, hourly_units, daily_data, daily_units
+@st.cache_data(ttl=weather_cache_ttl)
+def get_page_data(location: str, needs: dict):
+    # needs: name -> (comma separated variables, start_date, end_date) for one render;
+    # all of them are planned together into as few upstream requests as possible
+    names = list(needs)
+    results = unified.fetch_planned(location,
+                                    [unified.DataNeed(*needs[name]) for name in names],
+                                    output='columns')
+    return dict(zip(names, results))
 
 def translate_weather_code(code):
     translator = {
@@ -313,11 +432,11 @@ def translate_aqi(aqi):
 
     return result
 
-def generate_daily_summary(day_data):
-    temperature_unit = pretty_print_unit(day_data['temperature_2m_max'])
-    rain_unit = pretty_print_unit(day_data['rain_sum'])
-    snow_unit = pretty_print_unit(day_data['snowfall_sum'])
-    wind_unit = pretty_print_unit(day_data['wind_speed_10m_max'])
+def generate_daily_summary(day_data, units):
+    temperature_unit = pretty_print_unit(units['temperature_2m_max'])
+    rain_unit = pretty_print_unit(units['rain_sum'])
+    snow_unit = pretty_print_unit(units['snowfall_sum'])
+    wind_unit = pretty_print_unit(units['wind_speed_10m_max'])
 
     container = st.container()
     with container:
@@ -326,21 +445,21 @@ def generate_daily_summary(day_data):
             with c1:
                 st.metric(
                     "High/Low",
-                    f'{day_data["temperature_2m_max"].magnitude:.1f}/{day_data["temperature_2m_min"].magnitude:.1f} {temperature_unit}',
+                    f'{day_data["temperature_2m_max"]:.1f}/{day_data["temperature_2m_min"]:.1f} {temperature_unit}',
                     width='content'
                 )
 
             with c2:
                 st.metric(
                     "Apparent High/Low",
-                    f'{day_data["apparent_temperature_max"].magnitude:.1f}/{day_data["apparent_temperature_min"].magnitude:.1f} {temperature_unit}',
+                    f'{day_data["apparent_temperature_max"]:.1f}/{day_data["apparent_temperature_min"]:.1f} {temperature_unit}',
                     width='content'
                 )
 
             with c3:
                 st.metric(
                     "Precip. Prob. High/Mean/Low",
-                    f'{day_data["precipitation_probability_max"].magnitude:.0f}/{day_data["precipitation_probability_mean"].magnitude:.0f}/{day_data["precipitation_probability_min"].magnitude:.0f} %',
+                    f'{day_data["precipitation_probability_max"]:.0f}/{day_data["precipitation_probability_mean"]:.0f}/{day_data["precipitation_probability_min"]:.0f} %',
                     width='content'
                 )
 
@@ -349,21 +468,21 @@ def generate_daily_summary(day_data):
             with c1:
                 st.metric(
                     "Precipitation",
-                    f"{day_data['precipitation_sum'].magnitude:.2f} {rain_unit}",
+                    f"{day_data['precipitation_sum']:.2f} {rain_unit}",
                     width='content'
                 )  
 
             with c2:
                 st.metric(
                     "Snow",
-                    f"{day_data['snowfall_sum'].magnitude:.2f} {snow_unit}",
+                    f"{day_data['snowfall_sum']:.2f} {snow_unit}",
                     width='content'
                 )     
 
             with c3:
                 st.metric(
                     "UV Index",
-                    f"{day_data['uv_index_max'].magnitude:.1f}",
+                    f"{day_data['uv_index_max']:.1f}",
                     width='content'
                 )   
 
@@ -372,36 +491,36 @@ def generate_daily_summary(day_data):
             with c1:
                 st.metric(
                     "Max Windspeed",
-                    f"{day_data['wind_speed_10m_max'].magnitude:.1f} {wind_unit}",
+                    f"{day_data['wind_speed_10m_max']:.1f} {wind_unit}",
                     width='content'
                 )  
 
             with c2:
                 st.metric(
                     "Max Gust",
-                    f"{day_data['wind_gusts_10m_max'].magnitude:.1f} {wind_unit}",
+                    f"{day_data['wind_gusts_10m_max']:.1f} {wind_unit}",
                     width='content'
                 )     
 
             with c3:
                 st.metric(
                     "Dominant Wind Direction",
-                    f"{degree_to_compass(day_data['wind_direction_10m_dominant'].magnitude)}",
+                    f"{degree_to_compass(day_data['wind_direction_10m_dominant'])}",
                     width='content'
                 )   
 
     return container
 
-def generate_current_summary(current_data):
-    temperature_unit = pretty_print_unit(current_data['temperature_2m'])
-    rain_unit = pretty_print_unit(current_data['precipitation'])
-    snow_unit = pretty_print_unit(current_data['snowfall'])
-    wind_unit = pretty_print_unit(current_data['wind_speed_10m'])
-    visibility_unit = pretty_print_unit(current_data['visibility'])
-    pressure_unit = pretty_print_unit(current_data['pressure_msl'])
-    solar_unit = pretty_print_unit(current_data['direct_radiation'])
-    evapo_unit = pretty_print_unit(current_data['evapotranspiration'])
-    vap_pres_unit = pretty_print_unit(current_data['vapor_pressure_deficit'])
+def generate_current_summary(current_data, units):
+    temperature_unit = pretty_print_unit(units['temperature_2m'])
+    rain_unit = pretty_print_unit(units['precipitation'])
+    snow_unit = pretty_print_unit(units['snowfall'])
+    wind_unit = pretty_print_unit(units['wind_speed_10m'])
+    visibility_unit = pretty_print_unit(units['visibility'])
+    pressure_unit = pretty_print_unit(units['pressure_msl'])
+    solar_unit = pretty_print_unit(units['direct_radiation'])
+    evapo_unit = pretty_print_unit(units['evapotranspiration'])
+    vap_pres_unit = pretty_print_unit(units['vapor_pressure_deficit'])
 
     container = st.container()
     with container:
@@ -410,14 +529,14 @@ def generate_current_summary(current_data):
             with c1:
                 st.metric(
                     "Current Temperature",
-                    f'{current_data["temperature_2m"].magnitude:.1f} {temperature_unit}',
+                    f'{current_data["temperature_2m"]:.1f} {temperature_unit}',
                     width='content'
                 )
 
             with c2:
                 st.metric(
                     "Apparent Temperature",
-                    f'{current_data["apparent_temperature"].magnitude:.1f} {temperature_unit}',
+                    f'{current_data["apparent_temperature"]:.1f} {temperature_unit}',
                     width='content',
                     help="Apparent temperature is the perceived feels-like temperature combining wind chill factor, relative humidity and solar radiation"
                 )
@@ -425,7 +544,7 @@ def generate_current_summary(current_data):
             with c3:
                 st.metric(
                     "Precip. Prob.",
-                    f'{current_data["precipitation_probability"].magnitude:.0f} %',
+                    f'{current_data["precipitation_probability"]:.0f} %',
                     width='content'
                 )
 
@@ -434,21 +553,21 @@ def generate_current_summary(current_data):
             with c1:
                 st.metric(
                     "Precipitation",
-                    f"{current_data['precipitation'].magnitude:.2f} {rain_unit}",
+                    f"{current_data['precipitation']:.2f} {rain_unit}",
                     width='content'
                 )  
 
             with c2:
                 st.metric(
                     "Snow",
-                    f"{current_data['snowfall'].magnitude:.2f} {snow_unit}",
+                    f"{current_data['snowfall']:.2f} {snow_unit}",
                     width='content'
                 )     
 
             with c3:
                 st.metric(
                     "Visibility",
-                    f"{current_data['visibility'].magnitude:.1f} {visibility_unit}",
+                    f"{current_data['visibility']:.1f} {visibility_unit}",
                     width='content'
                 )   
 
@@ -457,14 +576,14 @@ def generate_current_summary(current_data):
             with c1:
                 st.metric(
                     "Windspeed",
-                    f"{current_data['wind_speed_10m'].magnitude:.1f} {wind_unit}",
+                    f"{current_data['wind_speed_10m']:.1f} {wind_unit}",
                     width='content'
                 )  
 
             with c2:
                 st.metric(
                     "Gusts",
-                    f"{current_data['wind_gusts_10m'].magnitude:.1f} {wind_unit}",
+                    f"{current_data['wind_gusts_10m']:.1f} {wind_unit}",
                     width='content',
                     help="Gusts at 10 meters above ground as a maximum of the preceding hour"
                 )     
@@ -472,7 +591,7 @@ def generate_current_summary(current_data):
             with c3:
                 st.metric(
                     "Wind Direction",
-                    f"{degree_to_compass(current_data['wind_direction_10m'].magnitude)}",
+                    f"{degree_to_compass(current_data['wind_direction_10m'])}",
                     width='content'
                 ) 
 
@@ -481,14 +600,14 @@ def generate_current_summary(current_data):
             with c1:
                 st.metric(
                     "Relative Humidity",
-                    f"{current_data['relative_humidity_2m'].magnitude:.1f} %",
+                    f"{current_data['relative_humidity_2m']:.1f} %",
                     width='content'
                 )  
 
             with c2:
                 st.metric(
                     "Pressure",
-                    f"{current_data['pressure_msl'].magnitude:.1f} {pressure_unit}",
+                    f"{current_data['pressure_msl']:.1f} {pressure_unit}",
                     width='content',
                     help="Atmospheric air pressure reduced to mean sea level (msl) or pressure at surface. Typically pressure on mean sea level is used in meteorology."
                 )     
@@ -496,7 +615,7 @@ def generate_current_summary(current_data):
             with c3:
                 st.metric(
                     "Cloud Cover",
-                    f"{current_data['cloud_cover'].magnitude:.1f} %",
+                    f"{current_data['cloud_cover']:.1f} %",
                     width='content'
                 )
 
@@ -505,7 +624,7 @@ def generate_current_summary(current_data):
             with c1:
                 st.metric(
                     "Dew Point",
-                    f"{current_data['dew_point_2m'].magnitude:.1f} {temperature_unit}",
+                    f"{current_data['dew_point_2m']:.1f} {temperature_unit}",
                     width='content',
                     help="Dew point is the temperature at which the air must be cooled to for condensation to occur, meaning the air is holding its maximum amount of water vapor and can't hold any more. A higher dew point means there is more moisture in the air and it will feel more humid and sticky. For example, a dew point above 65\N{DEGREE SIGN}F (18\N{DEGREE SIGN}C) feels very humid, while a dew point of 55\N{DEGREE SIGN}F (13\N{DEGREE SIGN}C) or lower feels dry and comfortable."
                 )  
@@ -513,7 +632,7 @@ def generate_current_summary(current_data):
             with c2:
                 st.metric(
                     "Evapotranspiration",
-                    f"{current_data['evapotranspiration'].magnitude:.1f} {evapo_unit}",
+                    f"{current_data['evapotranspiration']:.1f} {evapo_unit}",
                     width='content',
                     help='Preceeding hour sum of evapotranspiration from land surface and plants that weather models assume for this location. Available soil water is considered. 1 inch of evapotranspiration per hour equals 0.47 gallons of water per square yard. (1mm = 1 litre of water per square meter)'
                 )     
@@ -521,7 +640,7 @@ def generate_current_summary(current_data):
             with c3:
                 st.metric(
                     "Vapor Pressure Deficit",
-                    f"{current_data['vapor_pressure_deficit'].magnitude:.1f} {vap_pres_unit}",
+                    f"{current_data['vapor_pressure_deficit']:.1f} {vap_pres_unit}",
                     width='content',
                     help="For high VPD (> 0.47 inHg, 1.6 kPa), water transpiration of plants increases. For low VPD (< 0.12 inHg, 0.4 kPa), transpiration decreases"
                 )
@@ -531,7 +650,7 @@ def generate_current_summary(current_data):
             with c1:
                 st.metric(
                     "Direct Radiation",
-                    f"{current_data['direct_radiation'].magnitude:.1f} {solar_unit}",
+                    f"{current_data['direct_radiation']:.1f} {solar_unit}",
                     width='content',
                     help="Direct solar radiation as average of the preceding hour on the horizontal plane"
                 )  
@@ -539,7 +658,7 @@ def generate_current_summary(current_data):
             with c2:
                 st.metric(
                     "Direct Normal Irradiance",
-                    f"{current_data['direct_normal_irradiance'].magnitude:.1f} {solar_unit}",
+                    f"{current_data['direct_normal_irradiance']:.1f} {solar_unit}",
                     width='content',
                     help="Direct solar radiation as average of the preceding hour on the normal plane (perpendicular to the sun)"
                 )     
@@ -547,18 +666,19 @@ def generate_current_summary(current_data):
             with c3:
                 st.metric(
                     "Diffuse Radiation",
-                    f"{current_data['diffuse_radiation'].magnitude:.1f} {solar_unit}",
+                    f"{current_data['diffuse_radiation']:.1f} {solar_unit}",
                     width='content',
                     help="Diffuse solar radiation as average of the preceding hour"
                 )    
 
     return container
 
-def generate_hour_short_summary(current_data):
-    temperature_unit = pretty_print_unit(current_data['temperature_2m'])
-    return f'Feels Like: {current_data["apparent_temperature"].magnitude:.1f} {temperature_unit} -- Rain: {current_data["precipitation_probability"].magnitude:.0f} %'
+def generate_hour_short_summary(current_data, units):
+    temperature_unit = pretty_print_unit(units['temperature_2m'])
+    return f'Feels Like: {current_data["apparent_temperature"]:.1f} {temperature_unit} -- Rain: {current_data["precipitation_probability"]:.0f} %'
 
 def create_aqi_plot(aqi_data, title):
+    import plotly.graph_objects as go
 
     fig = go.Figure(go.Indicator(
         mode = "gauge+number",
@@ -583,10 +703,11 @@ def create_aqi_plot(aqi_data, title):
     return fig
 
 def create_forecast_plot(hourly_data, weather_keys, weather_names, unit_name, title, current_time, future_time_limit):
+    import plotly.graph_objects as go
     plot = go.Figure()
     for k, n in zip(weather_keys, weather_names):
         plot.add_trace(go.Scatter(x=hourly_data['timestamp_utc'],
-                                 y=hourly_data[k].pint.magnitude,
+                                 y=hourly_data[k],
                                  name=n,
                                  showlegend=True))
         